@@ -1,47 +1,28 @@
+import json
 import os
-import cv2
-import numpy as np
-from flask import Flask, render_template, Response, jsonify, session, redirect, url_for, request
+import time
+from flask import Flask, Blueprint, render_template, Response, jsonify, session, redirect, url_for, request
 from functools import wraps
-from utils import preprocess_arcface
-from session_options import get_optimized_session
-from core.database import SessionLocal
-from services.face_recognizer import obtener_usuarios
+from core.config import Settings
+from services.recursos import obtener_pipeline, obtener_galeria, galeria_a_modificar, obtener_camara, \
+    obtener_difusor, obtener_trabajos, calentar
+from services.trabajos import ColaLlena
+from services.decision import PoliticaDecision, UMBRAL_RECONOCIDO
 
-app = Flask(__name__)
-app.secret_key = os.urandom(24)  # Clave secreta para sesiones
+# Las rutas se registran sobre un blueprint; create_app() arma la
+# aplicación. Modelos, galería y cámara se cargan al primer uso
+# (services/recursos.py), no al importar este módulo. Por lo mismo la
+# base de datos y OpenCV (también services/subidas.py, que lo usa) se
+# importan dentro de las rutas que los usan.
+rutas = Blueprint('rutas', __name__)
 
-# ==========================
-#       MODELOS
-# ==========================
-
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-YOLO_MODEL = os.path.join(BASE_DIR, "models", "model.onnx")
-ARC_MODEL = os.path.join(BASE_DIR, "models", "arcface_r100.onnx")
+# El login no reutiliza embeddings entre peticiones (CacheIdentidad):
+# sin seguimiento del rostro entre frames no hay forma de saber que la
+# persona frente a la cámara es la misma que la de la petición anterior,
+# así que cada autenticación compara su propio rostro con la galería.
 
-session_yolo = get_optimized_session(YOLO_MODEL)
-input_name_yolo = session_yolo.get_inputs()[0].name
-
-session_arc = get_optimized_session(ARC_MODEL)
-input_name_arc = session_arc.get_inputs()[0].name
-
-# ==========================
-#  CARGAR BASE DE USUARIOS
-# ==========================
-
-def cargar_base():
-    db = SessionLocal()
-    base_usuarios = obtener_usuarios(db)
-    db.close()
-    return base_usuarios
-
-base_usuarios = cargar_base()
-print(f"✔ Usuarios cargados: {list(base_usuarios.keys())}")
-
-def distancia_coseno(a, b):
-    dot = np.dot(a, b)
-    norms = np.linalg.norm(a) * np.linalg.norm(b)
-    return 1 - (dot / norms)
+TRABAJOS_POR_SESION = 10    # ids de trabajos asíncronos que recuerda cada sesión
+PING_SSE = 15               # segundos entre comentarios keep-alive del stream de eventos
 
 # ==========================
 #   DECORADOR DE AUTENTICACIÓN
@@ -51,7 +32,7 @@ def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user' not in session:
-            return redirect(url_for('login'))
+            return redirect(url_for('rutas.login'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -59,45 +40,46 @@ def login_required(f):
 #   RUTAS
 # ==========================
 
-@app.route('/')
+@rutas.route('/')
 def index():
     if 'user' in session:
-        return redirect(url_for('dashboard'))
-    return redirect(url_for('login'))
+        return redirect(url_for('rutas.dashboard'))
+    return redirect(url_for('rutas.login'))
 
-@app.route('/login')
+@rutas.route('/login')
 def login():
     if 'user' in session:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('rutas.dashboard'))
     return render_template('login.html')
 
-@app.route('/register')
+@rutas.route('/register')
 def register():
     if 'user' in session:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('rutas.dashboard'))
     return render_template('register.html')
 
-@app.route('/dashboard')
+@rutas.route('/dashboard')
 @login_required
 def dashboard():
     username = session.get('user')
     return render_template('dashboard.html', username=username)
 
-@app.route('/admin/users')
+@rutas.route('/admin/users')
 @login_required
 def admin_users():
     username = session.get('user')
     return render_template('admin_users.html', username=username)
 
-@app.route('/logout')
+@rutas.route('/logout')
 def logout():
     session.pop('user', None)
-    return redirect(url_for('login'))
+    return redirect(url_for('rutas.login'))
 
-@app.route('/api/users', methods=['GET'])
+@rutas.route('/api/users', methods=['GET'])
 @login_required
 def get_users():
     """Obtener lista de todos los usuarios"""
+    from core.database import SessionLocal
     from core.models import Usuario
     db = SessionLocal()
     try:
@@ -115,11 +97,11 @@ def get_users():
     finally:
         db.close()
 
-@app.route('/api/users/<int:user_id>/toggle_access', methods=['POST'])
+@rutas.route('/api/users/<int:user_id>/toggle_access', methods=['POST'])
 @login_required
 def toggle_user_access(user_id):
     """Aprobar o desaprobar acceso de un usuario"""
-    global base_usuarios
+    from core.database import SessionLocal
     from core.models import Usuario
     db = SessionLocal()
     try:
@@ -131,8 +113,10 @@ def toggle_user_access(user_id):
         usuario.access = not usuario.access
         db.commit()
         
-        # Recargar base de usuarios
-        base_usuarios = cargar_base()
+        # Actualizar la galería (en memoria o la instantánea compartida)
+        galeria_cache = galeria_a_modificar()
+        if galeria_cache is not None:
+            galeria_cache.actualizar_acceso(user_id, usuario.access)
         
         return jsonify({
             'success': True,
@@ -145,11 +129,11 @@ def toggle_user_access(user_id):
     finally:
         db.close()
 
-@app.route('/api/users/<int:user_id>', methods=['DELETE'])
+@rutas.route('/api/users/<int:user_id>', methods=['DELETE'])
 @login_required
 def delete_user(user_id):
     """Eliminar un usuario"""
-    global base_usuarios
+    from core.database import SessionLocal
     from core.models import Usuario
     db = SessionLocal()
     try:
@@ -161,8 +145,10 @@ def delete_user(user_id):
         db.delete(usuario)
         db.commit()
         
-        # Recargar base de usuarios
-        base_usuarios = cargar_base()
+        # Quitar de la galería (en memoria o la instantánea compartida, y del índice ANN)
+        galeria_cache = galeria_a_modificar()
+        if galeria_cache is not None:
+            galeria_cache.eliminar(user_id)
         
         return jsonify({
             'success': True,
@@ -178,284 +164,470 @@ def delete_user(user_id):
 #   API DE RECONOCIMIENTO
 # ==========================
 
-# Variable global para la cámara
-camera = None
-
-def get_camera():
-    global camera
-    if camera is None or not camera.isOpened():
-        for i in range(5):
-            cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            cap.set(cv2.CAP_PROP_FPS, 30)
-            if cap.isOpened():
-                camera = cap
-                return camera
-        return None
-    return camera
-
-@app.route('/video_feed')
+@rutas.route('/video_feed')
 def video_feed():
-    def generate():
-        cap = get_camera()
-        if cap is None:
-            return
-        
-        frame_count = 0
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame_count += 1
-            
-            # Codificar frame como JPEG
-            ret, buffer = cv2.imencode('.jpg', frame)
-            frame_bytes = buffer.tobytes()
-            
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    # Un solo hilo codifica cada frame para todos los clientes (services/transmision.py)
+    difusor = obtener_difusor()
+    if difusor is None:
+        return Response(b'', mimetype='multipart/x-mixed-replace; boundary=frame')
     
-    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(difusor.suscribir(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
-@app.route('/authenticate', methods=['POST'])
+@rutas.route('/authenticate', methods=['POST'])
 def authenticate():
-    cap = get_camera()
+    return atender('authenticate', autenticar_camara)
+
+def autenticar_camara():
+    """
+    Captura frames de la cámara del servidor hasta decidir. Corre en la
+    cola de trabajos; retorna (cuerpo, código HTTP) y, si el login es
+    válido, `cuerpo['user']` es el usuario a guardar en la sesión.
+    """
+    cap = obtener_camara()
     if cap is None:
-        return jsonify({'success': False, 'message': 'No se pudo acceder a la cámara'}), 500
+        return {'success': False, 'message': 'No se pudo acceder a la cámara'}, 500
     
-    # Capturar varios frames para obtener el mejor
-    best_result = None
-    best_distance = 1e9
+    politica = PoliticaDecision()
+    frames = (frame for _, _, frame in cap.flujo(politica.max_frames))
+    return decidir_autenticacion(frames, politica)
+
+def autenticar_subida(partes, recortes):
+    """Como autenticar_camara, con las imágenes enviadas por el navegador"""
+    from services.subidas import decodificar, LADO_FRAME, LADO_ROSTRO
+    politica = PoliticaDecision()
+    lado = LADO_ROSTRO if recortes else LADO_FRAME
     
-    for _ in range(10):
-        ret, frame = cap.read()
-        if not ret:
-            continue
-        
-        H, W = frame.shape[:2]
-        
-        # Preprocesar para YOLO
-        resized = cv2.resize(frame, (640, 640))
-        img = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
-        img = img.astype(np.float32) / 255.0
-        img = np.moveaxis(img, -1, 0)
-        img = img[np.newaxis, :, :, :]
-        
-        # Detectar rostro con YOLO
-        out = session_yolo.run(None, {input_name_yolo: img})[0]
-        out = out.squeeze()
-        
-        xs, ys, ws, hs, confs = out
-        
-        scale_x = W / 640
-        scale_y = H / 640
-        
-        best_conf = 0
-        best_box = None
+    def frames():
+        # Se decodifican a medida que se usan: si se decide antes, el resto no se decodifica
+        for datos in partes:
+            with politica.medir('decodificacion'):
+                imagen = decodificar(datos, lado)
+            if imagen is not None:
+                yield imagen
+    
+    return decidir_autenticacion(frames(), politica, recortes=recortes)
+
+def decidir_autenticacion(frames, politica, recortes=False):
+    """
+    Evalúa frames a medida que llegan y corta en cuanto la decisión está
+    clara (ver services/decision.py). Con `recortes=True` cada imagen ya
+    es un rostro recortado y no se corre YOLO.
+    """
+    pipeline = obtener_pipeline()
+    
+    # Instantánea consistente de la galería para toda la petición
+    galeria = obtener_galeria().galeria
+    
+    pendientes = []     # recortes de rostro aún sin embedding
+    
+    def evaluar(pendientes):
+        # Reconocimiento con ArcFace: los rostros pendientes en un solo lote
+        # y una sola multiplicación matricial contra la galería
+        with politica.medir('embedding'):
+            embeddings = pipeline.embed(pendientes)
+        with politica.medir('matching'):
+            resultados = galeria.identificar_lote(embeddings)
+        for resultado in resultados:
+            politica.agregar(*resultado)
+    
+    for frame in frames:
+        if recortes:
+            pendientes.append(frame)
+        else:
+            # Detectar rostro con YOLO
+            with politica.medir('deteccion'):
+                _, _, best_box, best_conf = pipeline.detect(frame)
+            
+            if best_box is None:
+                politica.agregar_sin_rostro()
+            else:
+                pendientes.append(pipeline.recortar(frame, best_box))
         
-        for i in range(8400):
-            conf = confs[i]
-            if conf > best_conf and conf > 0.55:
-                cx = xs[i] * scale_x
-                cy = ys[i] * scale_y
-                w_box = ws[i] * scale_x
-                h_box = hs[i] * scale_y
-                
-                x1 = int(cx - w_box/2)
-                y1 = int(cy - h_box/2)
-                x2 = int(cx + w_box/2)
-                y2 = int(cy + h_box/2)
-                
-                if w_box < 50 or h_box < 50:
-                    continue
-                if x1 < 0 or y1 < 0 or x2 > W or y2 > H:
-                    continue
-                
-                best_box = (x1, y1, x2, y2)
-                best_conf = conf
+        if len(pendientes) >= politica.lote:
+            evaluar(pendientes)
+            pendientes = []
         
-        if best_box is not None:
-            x1, y1, x2, y2 = best_box
-            face = frame[y1:y2, x1:x2]
-            
-            # Reconocimiento con ArcFace
-            face_pre = preprocess_arcface(face)
-            embedding_live = session_arc.run(None, {input_name_arc: face_pre})[0][0]
-            
-            mejor_usuario = "DESCONOCIDO"
-            mejor_distancia = 1e9
-            tiene_acceso = False
-            
-            for usuario, datos in base_usuarios.items():
-                emb_base = datos['embedding']
-                dist = distancia_coseno(embedding_live, emb_base)
-                if dist < mejor_distancia:
-                    mejor_distancia = dist
-                    mejor_usuario = usuario
-                    tiene_acceso = datos['access']
-            
-            if mejor_distancia < best_distance:
-                best_distance = mejor_distancia
-                best_result = {
-                    'usuario': mejor_usuario,
-                    'distancia': mejor_distancia,
-                    'acceso': tiene_acceso
-                }
+        if politica.decidido:
+            break
+    
+    if pendientes and not politica.decidido:
+        evaluar(pendientes)
     
     # Evaluar resultado
+    best_result = politica.resultado()
+    estadisticas = {
+        'frames_used': politica.frames,
+        'decision': politica.motivo,
+        'timings_ms': politica.tiempos()
+    }
+    
     if best_result is None:
-        return jsonify({
+        return {
             'success': False,
-            'message': 'No se detectó ningún rostro. Por favor, colócate frente a la cámara.'
-        })
+            'message': 'No se detectó ningún rostro. Por favor, colócate frente a la cámara.',
+            **estadisticas
+        }, 200
     
-    if best_result['distancia'] < 0.55 and best_result['acceso']:
-        session['user'] = best_result['usuario']
-        return jsonify({
+    if best_result['distancia'] < UMBRAL_RECONOCIDO and best_result['acceso']:
+        return {
             'success': True,
             'user': best_result['usuario'],
-            'message': f"¡Bienvenido, {best_result['usuario']}!"
-        })
-    elif best_result['distancia'] < 0.55 and not best_result['acceso']:
-        return jsonify({
+            'message': f"¡Bienvenido, {best_result['usuario']}!",
+            **estadisticas
+        }, 200
+    elif best_result['distancia'] < UMBRAL_RECONOCIDO and not best_result['acceso']:
+        return {
             'success': False,
-            'message': f"Usuario {best_result['usuario']} identificado, pero no tiene acceso autorizado."
-        })
+            'message': f"Usuario {best_result['usuario']} identificado, pero no tiene acceso autorizado.",
+            **estadisticas
+        }, 200
     else:
-        return jsonify({
+        return {
             'success': False,
-            'message': 'Rostro no reconocido. Acceso denegado.'
+            'message': 'Rostro no reconocido. Acceso denegado.',
+            **estadisticas
+        }, 200
+
+@rutas.route('/api/recognize_faces', methods=['GET'])
+@login_required
+def recognize_faces():
+    """Todos los rostros del último frame de la cámara (modo lobby)"""
+    cap = obtener_camara()
+    if cap is None:
+        return jsonify({'success': False, 'message': 'No se pudo acceder a la cámara'}), 500
+    
+    dato = cap.esperar(timeout=2.0)
+    if dato is None:
+        return jsonify({'success': False, 'message': 'No se pudo leer de la cámara'}), 500
+    _, timestamp, frame = dato
+    
+    # Todas las detecciones tras NMS, un lote de ArcFace y un GEMM contra la galería
+    rostros = obtener_pipeline().identify(frame, obtener_galeria().galeria, todas=True)
+    
+    faces = []
+    for rostro in rostros:
+        reconocido = rostro['distancia'] < UMBRAL_RECONOCIDO
+        faces.append({
+            'box': list(rostro['caja']),
+            'confidence': round(rostro['conf'], 3),
+            'user': rostro['usuario'] if reconocido else None,
+            'distance': round(float(rostro['distancia']), 4),
+            'access': bool(reconocido and rostro['acceso'])
         })
+    
+    return jsonify({'success': True, 'timestamp': timestamp, 'count': len(faces), 'faces': faces})
 
-@app.route('/check_camera', methods=['GET'])
+@rutas.route('/check_camera', methods=['GET'])
 def check_camera():
-    cap = get_camera()
+    cap = obtener_camara()
     if cap is None:
         return jsonify({'available': False})
     return jsonify({'available': True})
 
-@app.route('/register_user', methods=['POST'])
+@rutas.route('/register_user', methods=['POST'])
 def register_user():
-    global base_usuarios
-    
     data = request.get_json()
     username = data.get('username', '').strip()
     grant_access = True  # Todos los usuarios registrados tienen acceso automáticamente
     
+    error = validar_usuario_nuevo(username)
+    if error is not None:
+        return error
+    
+    return atender('register_user', registrar_camara, username, grant_access)
+
+def validar_usuario_nuevo(username):
+    """Respuesta 400 si el nombre está vacío o ya existe; None si es válido"""
     if not username:
         return jsonify({'success': False, 'message': 'El nombre de usuario es requerido'}), 400
     
     # Verificar si el usuario ya existe
-    if username in base_usuarios:
+    if username in obtener_galeria().galeria:
         return jsonify({'success': False, 'message': f'El usuario "{username}" ya está registrado'}), 400
-    
-    cap = get_camera()
+    return None
+
+def registrar_camara(username, grant_access):
+    """Captura una ráfaga de la cámara del servidor. Corre en la cola de trabajos; retorna (cuerpo, código HTTP)"""
+    cap = obtener_camara()
     if cap is None:
-        return jsonify({'success': False, 'message': 'No se pudo acceder a la cámara'}), 500
+        return {'success': False, 'message': 'No se pudo acceder a la cámara'}, 500
     
-    # Capturar varios frames para obtener el mejor rostro
-    best_embedding = None
-    best_confidence = 0
+    # Capturar varios frames para obtener varias muestras del rostro
     attempts = 15
+    frames = (frame for _, _, frame in cap.rafaga(attempts))
+    return registrar_plantillas(username, grant_access, frames)
+
+def registrar_subida(username, grant_access, partes, recortes):
+    """Como registrar_camara, con las imágenes enviadas por el navegador"""
+    from services.subidas import decodificar_lote, LADO_FRAME, LADO_ROSTRO
+    lado = LADO_ROSTRO if recortes else LADO_FRAME
+    return registrar_plantillas(username, grant_access, decodificar_lote(partes, lado), recortes)
+
+def registrar_plantillas(username, grant_access, frames, recortes=False):
+    """
+    Guarda las plantillas del usuario (services/plantillas.py): de los
+    rostros de la ráfaga se toman los de mejor calidad (tamaño, nitidez,
+    pose, confianza), se calculan sus embeddings en un solo lote y se
+    combinan en la media ponderada más las mejores muestras.
+    """
+    from services.plantillas import seleccionar, combinar
+    galeria_cache = obtener_galeria()
+    pipeline = obtener_pipeline()
     
-    for _ in range(attempts):
-        ret, frame = cap.read()
-        if not ret:
+    muestras = []   # (recorte, confianza de YOLO o None si ya vino recortado)
+    for frame in frames:
+        if recortes:
+            muestras.append((frame, None))
             continue
         
-        H, W = frame.shape[:2]
-        
-        # Preprocesar para YOLO
-        resized = cv2.resize(frame, (640, 640))
-        img = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
-        img = img.astype(np.float32) / 255.0
-        img = np.moveaxis(img, -1, 0)
-        img = img[np.newaxis, :, :, :]
-        
         # Detectar rostro con YOLO
-        out = session_yolo.run(None, {input_name_yolo: img})[0]
-        out = out.squeeze()
-        
-        xs, ys, ws, hs, confs = out
+        _, _, best_box, best_conf = pipeline.detect(frame)
         
-        scale_x = W / 640
-        scale_y = H / 640
-        
-        best_conf = 0
-        best_box = None
-        
-        for i in range(8400):
-            conf = confs[i]
-            if conf > best_conf and conf > 0.55:
-                cx = xs[i] * scale_x
-                cy = ys[i] * scale_y
-                w_box = ws[i] * scale_x
-                h_box = hs[i] * scale_y
-                
-                x1 = int(cx - w_box/2)
-                y1 = int(cy - h_box/2)
-                x2 = int(cx + w_box/2)
-                y2 = int(cy + h_box/2)
-                
-                if w_box < 50 or h_box < 50:
-                    continue
-                if x1 < 0 or y1 < 0 or x2 > W or y2 > H:
-                    continue
-                
-                best_box = (x1, y1, x2, y2)
-                best_conf = conf
-        
-        if best_box is not None and best_conf > best_confidence:
-            x1, y1, x2, y2 = best_box
-            face = frame[y1:y2, x1:x2]
-            
-            # Generar embedding con ArcFace
-            face_pre = preprocess_arcface(face)
-            embedding = session_arc.run(None, {input_name_arc: face_pre})[0][0]
-            
-            best_embedding = embedding
-            best_confidence = best_conf
+        if best_box is not None:
+            muestras.append((pipeline.recortar(frame, best_box), best_conf))
     
     # Verificar si se capturó un rostro válido
-    if best_embedding is None:
-        return jsonify({
+    if not muestras:
+        return {
             'success': False,
             'message': 'No se detectó ningún rostro. Por favor, colócate frente a la cámara con buena iluminación.'
-        })
+        }, 200
+    
+    # ArcFace una sola vez, en lote, para las mejores muestras
+    elegidas, calidades = seleccionar(muestras)
+    embeddings = pipeline.embed([muestras[i][0] for i in elegidas])
+    plantillas = combinar(embeddings, calidades)
     
     # Guardar usuario en la base de datos
     try:
+        from core.database import SessionLocal
         from services.face_recognizer import guardar_usuario
         db = SessionLocal()
         
         # Guardar usuario
-        new_user = guardar_usuario(db, username, best_embedding)
+        new_user = guardar_usuario(db, username, plantillas)
         
         # Actualizar permisos de acceso si se especificaron
         if grant_access:
             new_user.access = False
             db.commit()
         
-        db.close()
+        # Agregar a la galería en memoria (y al índice ANN)
+        galeria_cache.agregar(new_user.id, username, plantillas, new_user.access)
         
-        # Recargar base de usuarios
-        base_usuarios = cargar_base()
+        db.close()
         
-        return jsonify({
+        return {
             'success': True,
             'message': f'Usuario "{username}" registrado exitosamente',
             'username': username,
-            'access_granted': grant_access
-        })
+            'access_granted': grant_access,
+            'samples': len(elegidas),
+            'templates': len(plantillas)
+        }, 200
     
     except Exception as e:
-        return jsonify({
+        return {
             'success': False,
             'message': f'Error al guardar el usuario: {str(e)}'
-        }), 500
+        }, 500
+
+# ==========================
+#   IMÁGENES ENVIADAS POR EL NAVEGADOR
+# ==========================
+
+TIPOS_IMAGEN = ('image/jpeg', 'image/png', 'image/webp')
+
+def imagenes_de_la_peticion():
+    """
+    (imágenes, recortes) de la petición, sin decodificar:
+      - multipart/form-data: archivos `frames` (frames completos) o `faces`
+        (rostros ya recortados)
+      - image/jpeg, image/png o image/webp: una imagen en el cuerpo
+      - application/octet-stream: varias, cada una precedida por su largo
+        (uint32 little-endian)
+    En los dos últimos `?faces=1` indica que son recortes.
+    Lanza SubidaInvalida si no hay imágenes utilizables.
+    """
+    from services.subidas import SubidaInvalida, separar, validar
+    if request.mimetype == 'multipart/form-data':
+        recortes = 'faces' in request.files
+        partes = [archivo.read() for archivo in request.files.getlist('faces' if recortes else 'frames')]
+    elif request.mimetype in TIPOS_IMAGEN:
+        recortes = request.args.get('faces') in ('1', 'true')
+        partes = [request.get_data()]
+    elif request.mimetype == 'application/octet-stream':
+        recortes = request.args.get('faces') in ('1', 'true')
+        partes = separar(request.get_data())
+    else:
+        raise SubidaInvalida('Se esperaba multipart/form-data, una imagen o application/octet-stream')
+    return validar(partes, Settings.SUBIDA_MAX_IMAGENES), recortes
+
+@rutas.route('/authenticate/frames', methods=['POST'])
+def authenticate_frames():
+    """Autenticación con una ráfaga capturada por el navegador (kioscos remotos)"""
+    from services.subidas import SubidaInvalida
+    try:
+        partes, recortes = imagenes_de_la_peticion()
+    except SubidaInvalida as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return atender('authenticate', autenticar_subida, partes, recortes)
+
+@rutas.route('/register_user/frames', methods=['POST'])
+def register_user_frames():
+    """Registro con una ráfaga capturada por el navegador; `username` en el formulario o la URL"""
+    from services.subidas import SubidaInvalida
+    username = (request.form.get('username') or request.args.get('username', '')).strip()
+    grant_access = True  # Todos los usuarios registrados tienen acceso automáticamente
+    
+    error = validar_usuario_nuevo(username)
+    if error is not None:
+        return error
+    
+    try:
+        partes, recortes = imagenes_de_la_peticion()
+    except SubidaInvalida as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return atender('register_user', registrar_subida, username, grant_access, partes, recortes)
+
+# ==========================
+#   COLA DE TRABAJOS
+# ==========================
+
+def atender(tipo, funcion, *args):
+    """
+    Corre funcion(*args) en la cola de trabajos (services/trabajos.py).
+    Por defecto espera el resultado y responde como siempre; con
+    ?async=1 responde 202 al instante con el id del trabajo, que se
+    consulta en /api/jobs/<id> (polling) o /api/jobs/<id>/events (SSE).
+    Si la cola está llena responde 429 con Retry-After.
+    """
+    try:
+        trabajo = obtener_trabajos().enviar(tipo, funcion, *args)
+    except ColaLlena as e:
+        return jsonify({
+            'success': False,
+            'message': 'El servidor está ocupado. Por favor, intenta de nuevo en unos segundos.',
+            'retry_after': e.reintentar
+        }), 429, {'Retry-After': str(e.reintentar)}
+    
+    if request.args.get('async') not in ('1', 'true'):
+        trabajo.esperar()
+        return entregar(trabajo)
+    
+    # Solo la sesión que creó el trabajo puede consultarlo (y quedar logueada con él)
+    session['trabajos'] = session.get('trabajos', [])[-(TRABAJOS_POR_SESION - 1):] + [trabajo.id]
+    estado_url = url_for('rutas.job_status', job_id=trabajo.id)
+    return jsonify({
+        'success': True,
+        'job_id': trabajo.id,
+        'status': trabajo.estado,
+        'status_url': estado_url,
+        'events_url': url_for('rutas.job_events', job_id=trabajo.id)
+    }), 202, {'Location': estado_url}
+
+def entregar(trabajo):
+    """Respuesta de un trabajo terminado; un login exitoso inicia la sesión"""
+    if trabajo.tipo == 'authenticate' and trabajo.resultado.get('success'):
+        session['user'] = trabajo.resultado['user']
+    return jsonify(trabajo.resultado), trabajo.codigo
+
+def trabajo_de_la_sesion(job_id):
+    if job_id not in session.get('trabajos', []):
+        return None
+    return obtener_trabajos().obtener(job_id)
+
+@rutas.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Estado de un trabajo asíncrono; al terminar incluye `result` (el cuerpo de la respuesta síncrona)"""
+    trabajo = trabajo_de_la_sesion(job_id)
+    if trabajo is None:
+        return jsonify({'success': False, 'message': 'Trabajo no encontrado'}), 404
+    
+    if trabajo.listo:
+        entregar(trabajo)
+    return jsonify(trabajo.a_dict())
+
+@rutas.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Server-Sent Events: un evento `estado` por cada cambio y un evento
+    `resultado` al terminar. Un stream no puede modificar la cookie de
+    sesión, así que tras un login exitoso el cliente consulta una vez
+    /api/jobs/<id> para iniciar la sesión.
+    
+    Cada stream ocupa un hilo del servidor: como mucho
+    Settings.TRABAJOS_MAX_EVENTOS abiertos (si no, 429 y el cliente
+    consulta el estado) y cada uno termina con un evento `timeout` a los
+    Settings.TRABAJOS_EVENTOS_TIMEOUT segundos.
+    """
+    trabajo = trabajo_de_la_sesion(job_id)
+    if trabajo is None:
+        return jsonify({'success': False, 'message': 'Trabajo no encontrado'}), 404
+    
+    cola = obtener_trabajos()
+    if not cola.escuchar():
+        return jsonify({
+            'success': False,
+            'message': 'Demasiados streams de eventos abiertos; consulta el estado del trabajo.',
+            'status_url': url_for('rutas.job_status', job_id=job_id)
+        }), 429, {'Retry-After': str(PING_SSE)}
+    
+    def evento(nombre, datos):
+        return f"event: {nombre}\ndata: {json.dumps(datos)}\n\n"
+    
+    def generate():
+        limite = time.monotonic() + Settings.TRABAJOS_EVENTOS_TIMEOUT
+        estado = None
+        while True:
+            if trabajo.estado != estado:
+                estado = trabajo.estado
+                yield evento('estado', {'job_id': trabajo.id, 'status': estado})
+            if trabajo.listo:
+                yield evento('resultado', trabajo.a_dict())
+                return
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                yield evento('timeout', {'job_id': trabajo.id, 'status': estado})
+                return
+            if trabajo.esperar(desde=estado, timeout=min(PING_SSE, restante)) == estado:
+                yield ": ping\n\n"
+    
+    respuesta = Response(generate(), mimetype='text/event-stream',
+                         headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Se libera el lugar al cerrar la respuesta (también si el cliente se desconecta)
+    respuesta.call_on_close(cola.dejar_de_escuchar)
+    return respuesta
+
+# ==========================
+#   FÁBRICA DE LA APLICACIÓN
+# ==========================
+
+def create_app(calentar_modelos=False):
+    """
+    Crea la aplicación Flask. Con `calentar_modelos=True` carga modelos y
+    galería y corre una inferencia de prueba antes de atender peticiones
+    (p.ej. gunicorn 'app:create_app(calentar_modelos=True)').
+    """
+    app = Flask(__name__)
+    app.secret_key = os.urandom(24)  # Clave secreta para sesiones
+    app.config['MAX_CONTENT_LENGTH'] = Settings.SUBIDA_MAX_BYTES  # ráfagas del navegador; más → 413
+    app.register_blueprint(rutas)
+    
+    @app.cli.command('calentar')
+    def calentar_comando():
+        """Carga modelos y galería y mide la inferencia de prueba"""
+        print(f"✔ Calentamiento (ms): {calentar()}")
+    
+    if calentar_modelos:
+        print(f"✔ Calentamiento (ms): {calentar()}")
+    
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
+    app = create_app(calentar_modelos=True)
     app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
@@ -0,0 +1,68 @@
+"""
+Tiempo de creación de las sesiones ONNX al arrancar el proceso:
+
+  - sin cache: optimización de grafo completa en cada arranque (antes)
+  - frío:      primera vez con cache (optimiza y guarda el grafo)
+  - caliente:  arranques siguientes (carga el grafo ya optimizado)
+
+    python benchmarks/bench_arranque.py
+
+Cada medición corre en un subproceso nuevo, como un worker de gunicorn
+recién lanzado. Usa un directorio de cache temporal. Requiere models/*.onnx.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services.pipeline import YOLO_MODEL, ARC_MODEL
+
+REPETICIONES = 3
+
+
+def crear(modelo, cache):
+    """Corre dentro del subproceso: segundos en crear la sesión"""
+    import onnxruntime  # noqa: F401  (la importación no cuenta)
+    from session_options import FabricaSesiones
+
+    fabrica = FabricaSesiones(n_sesiones=1, cache=cache or False)
+    t0 = time.perf_counter()
+    fabrica.crear(modelo)
+    return time.perf_counter() - t0
+
+
+def medir(modelo, cache):
+    salida = subprocess.run([sys.executable, __file__, modelo, cache or ""], capture_output=True, text=True)
+    if salida.returncode != 0:
+        raise RuntimeError(salida.stderr)
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    if len(sys.argv) == 3:
+        print(json.dumps(crear(sys.argv[1], sys.argv[2])))
+        return
+
+    print(f"{'modelo':<22} {'sin cache':>10} {'frío':>10} {'caliente':>10}")
+    for modelo in (YOLO_MODEL, ARC_MODEL):
+        sin_cache = min(medir(modelo, None) for _ in range(REPETICIONES))
+
+        frios, calientes = [], []
+        for _ in range(REPETICIONES):
+            cache = tempfile.mkdtemp(prefix="cache_ort_")
+            try:
+                frios.append(medir(modelo, cache))
+                calientes.append(min(medir(modelo, cache) for _ in range(REPETICIONES)))
+            finally:
+                shutil.rmtree(cache, ignore_errors=True)
+
+        print(f"{os.path.basename(modelo):<22} {sin_cache * 1000:8.0f}ms {min(frios) * 1000:8.0f}ms "
+              f"{min(calientes) * 1000:8.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
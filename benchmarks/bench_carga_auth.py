@@ -0,0 +1,159 @@
+"""
+Prueba de carga de /authenticate: N clientes concurrentes (cada uno con su
+propia sesión) piden autenticaciones seguidas, en modo síncrono y en modo
+asíncrono (?async=1 + SSE). Reporta latencia p50/p95/p99 hasta tener el
+resultado, throughput y respuestas 429 (cola llena; se reintenta tras
+Retry-After, que cuenta dentro de la latencia).
+
+    python benchmarks/bench_carga_auth.py
+    python benchmarks/bench_carga_auth.py --clientes 16 --peticiones 10 --video puerta.mp4
+    python benchmarks/bench_carga_auth.py --url http://10.0.0.2:5000 --modo async
+
+Sin --url levanta la app en este proceso (servidor WSGI con hilos) con una
+base SQLite temporal y un video como cámara, que se reproduce en bucle a su
+FPS nominal. Requiere models/*.onnx.
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def clip_sintetico(n_frames=90, fps=30):
+    ruta = os.path.join(tempfile.gettempdir(), "bench_carga_auth.avi")
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    escritor = cv2.VideoWriter(ruta, cv2.VideoWriter_fourcc(*"MJPG"), fps, (640, 480))
+    for n in range(n_frames):
+        escritor.write(np.roll(base, n * 3, axis=1))
+    escritor.release()
+    return ruta
+
+
+def servidor_local(video):
+    """Levanta la app en un hilo; retorna la URL base"""
+    from core.config import Settings
+    Settings.DATABASE_URL = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "carga.db")
+    Settings.CAMERA_SOURCE = video
+
+    from core.database import init_db
+    from werkzeug.serving import make_server
+    import app as modulo
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)   # sin una línea por petición
+    init_db()
+    flask_app = modulo.create_app(calentar_modelos=True)
+    servidor = make_server("127.0.0.1", 0, flask_app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{servidor.server_port}"
+
+    # Un usuario registrado para que el matching tenga contra qué comparar
+    pedir(cliente(), "POST", url + "/register_user", {'username': 'carga'})
+    return url
+
+
+def cliente():
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+
+def pedir(opener, metodo, url, datos=None):
+    """(código, headers, cuerpo JSON)"""
+    cuerpo = json.dumps(datos).encode() if datos is not None else b""
+    peticion = urllib.request.Request(url, data=cuerpo if metodo == "POST" else None, method=metodo,
+                                      headers={'Content-Type': 'application/json'})
+    try:
+        with opener.open(peticion, timeout=120) as respuesta:
+            return respuesta.status, respuesta.headers, json.loads(respuesta.read())
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, json.loads(e.read() or b"{}")
+
+
+def esperar_sse(opener, url):
+    """Lee el stream de eventos hasta el evento `resultado`"""
+    with opener.open(url, timeout=120) as respuesta:
+        evento = None
+        for linea in respuesta:
+            linea = linea.decode().strip()
+            if linea.startswith("event:"):
+                evento = linea.split(":", 1)[1].strip()
+            elif linea.startswith("data:") and evento == "resultado":
+                return json.loads(linea.split(":", 1)[1])
+
+
+def autenticar(opener, url, modo, rechazos):
+    """Una autenticación completa (con reintentos si hay 429); retorna el cuerpo final"""
+    while True:
+        sufijo = "?async=1" if modo == "async" else ""
+        codigo, headers, cuerpo = pedir(opener, "POST", url + "/authenticate" + sufijo)
+        if codigo == 429:
+            rechazos.append(1)
+            time.sleep(float(headers.get('Retry-After', 1)))
+            continue
+        if modo == "sync" or codigo != 202:
+            return codigo, cuerpo
+
+        esperar_sse(opener, url + cuerpo['events_url'])
+        # La consulta final entrega el resultado (e inicia la sesión)
+        codigo, _, estado = pedir(opener, "GET", url + cuerpo['status_url'])
+        return estado.get('http_status', codigo), estado.get('result', estado)
+
+
+def correr(url, modo, n_clientes, n_peticiones):
+    latencias, errores, rechazos = [], [], []
+    lock = threading.Lock()
+
+    def trabajo():
+        opener = cliente()
+        for _ in range(n_peticiones):
+            t0 = time.perf_counter()
+            try:
+                codigo, _ = autenticar(opener, url, modo, rechazos)
+                ok = codigo == 200
+            except Exception as e:
+                ok = False
+                print(f"  error: {e}")
+            with lock:
+                (latencias if ok else errores).append(time.perf_counter() - t0)
+
+    hilos = [threading.Thread(target=trabajo) for _ in range(n_clientes)]
+    t0 = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    total = time.perf_counter() - t0
+
+    ms = np.array(latencias) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (np.nan,) * 3
+    print(f"{modo:<6} {len(latencias):>5} ok {len(errores):>4} err {len(rechazos):>5} x429 "
+          f"{len(latencias) / total:7.1f} req/s | p50 {p50:7.0f} ms  p95 {p95:7.0f} ms  p99 {p99:7.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="servidor ya levantado (si no, se levanta uno local)")
+    parser.add_argument("--video", help="video usado como cámara del servidor local")
+    parser.add_argument("--clientes", type=int, default=8)
+    parser.add_argument("--peticiones", type=int, default=5, help="autenticaciones por cliente")
+    parser.add_argument("--modo", choices=("sync", "async", "ambos"), default="ambos")
+    args = parser.parse_args()
+
+    url = args.url or servidor_local(args.video or clip_sintetico())
+    print(f"{args.clientes} clientes x {args.peticiones} autenticaciones contra {url}")
+    for modo in (("sync", "async") if args.modo == "ambos" else (args.modo,)):
+        correr(url, modo, args.clientes, args.peticiones)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Carga de la galería desde la base: el cargador original (ORM completo +
+np.frombuffer fila a fila + np.stack) frente a obtener_usuarios (columnas
+sueltas, yield_per y decodificación por lotes en una matriz preasignada),
+con embeddings float32 y float16, y la apertura de la instantánea en
+disco (np.memmap) que comparten los procesos con Settings.GALERIA_INSTANTANEA.
+
+    python benchmarks/bench_carga_galeria.py
+    python benchmarks/bench_carga_galeria.py --usuarios 10000 100000
+
+Usa SQLite en un archivo temporal como sustituto local de Postgres.
+Reporta tiempo y pico de memoria privada (tracemalloc) de cada carga; la
+matriz mapeada no cuenta porque vive en el page cache, compartida.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from core.models import Base, Usuario
+from services.face_recognizer import Galeria, obtener_usuarios, codificar_embedding, exportar_galeria, \
+    abrir_galeria
+
+DIM = 512
+LOTE_INSERT = 5000
+
+
+def cargador_original(db):
+    """Copia de obtener_usuarios antes de este cambio (blobs sin cabecera)"""
+    usuarios = db.query(Usuario).all()
+
+    ids, nombres, embeddings, accesos = [], [], [], []
+    for u in usuarios:
+        ids.append(u.id)
+        nombres.append(u.name)
+        embeddings.append(np.frombuffer(u.embedding, dtype=np.float32))
+        accesos.append(bool(u.access))
+
+    return Galeria(ids, nombres, np.stack(embeddings), accesos)
+
+
+def crear_instantanea(engine, dtype):
+    directorio = tempfile.mkdtemp(prefix="bench_galeria_")
+    exportar_galeria(desde_base(engine, obtener_usuarios)(), directorio, dtype)
+    return directorio
+
+
+def crear_base(n, formato):
+    ruta = os.path.join(tempfile.gettempdir(), f"bench_galeria_{n}_{formato}.db")
+    if os.path.exists(ruta):
+        os.remove(ruta)
+    engine = create_engine(f"sqlite:///{ruta}")
+    Base.metadata.create_all(engine)
+
+    rng = np.random.default_rng(0)
+    with engine.begin() as conn:
+        for inicio in range(0, n, LOTE_INSERT):
+            emb = rng.normal(size=(min(LOTE_INSERT, n - inicio), DIM)).astype(np.float32)
+            filas = [{
+                'name': f"u{inicio + i}",
+                'access': bool(i % 2),
+                'embedding': e.tobytes() if formato == "original" else codificar_embedding(e, formato),
+            } for i, e in enumerate(emb)]
+            conn.execute(insert(Usuario), filas)
+    return engine, ruta
+
+
+def desde_base(engine, cargar):
+    """Carga con una sesión nueva, como lo hace services/recursos.py"""
+    def cargar_galeria():
+        db = sessionmaker(bind=engine)()
+        try:
+            return cargar(db)
+        finally:
+            db.close()
+    return cargar_galeria
+
+
+def medir(cargar):
+    t0 = time.perf_counter()
+    galeria = cargar()
+    segundos = time.perf_counter() - t0
+    n = len(galeria)
+    del galeria
+
+    tracemalloc.start()
+    galeria = cargar()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return n, segundos, pico, galeria.matriz.nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    casos = (
+        ("original", "ORM + frombuffer por fila", cargador_original),
+        ("original", "obtener_usuarios (sin cabecera)", obtener_usuarios),
+        ("float32", "obtener_usuarios float32", obtener_usuarios),
+        ("float16", "obtener_usuarios float16", obtener_usuarios),
+    )
+    instantaneas = (
+        ("float32", "instantánea float32 (memmap)"),
+        ("float16", "instantánea float16 (memmap)"),
+    )
+
+    for n in args.usuarios:
+        print(f"\n== {n} usuarios")
+        print(f"{'cargador':<34} {'tiempo':>8} {'pico memoria':>13} {'matriz':>9} {'base':>9}")
+        bases = {}
+        for formato, nombre, cargar in casos:
+            if formato not in bases:
+                bases[formato] = crear_base(n, formato)
+            engine, ruta = bases[formato]
+            cargados, segundos, pico, final = medir(desde_base(engine, cargar))
+            assert cargados == n
+            print(f"{nombre:<34} {segundos:7.2f}s {pico / 1e6:10.0f} MB {final / 1e6:6.0f} MB "
+                  f"{os.path.getsize(ruta) / 1e6:6.0f} MB")
+        for dtype, nombre in instantaneas:
+            directorio = crear_instantanea(bases[dtype][0], dtype)
+            cargados, segundos, pico, final = medir(lambda: abrir_galeria(directorio)[0])
+            assert cargados == n
+            archivo = max((os.path.join(directorio, a) for a in os.listdir(directorio)), key=os.path.getsize)
+            print(f"{nombre:<34} {segundos:7.2f}s {pico / 1e6:10.0f} MB {final / 1e6:6.0f} MB "
+                  f"{os.path.getsize(archivo) / 1e6:6.0f} MB")
+            shutil.rmtree(directorio)
+
+        for engine, ruta in bases.values():
+            engine.dispose()
+            os.remove(ruta)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Costo de decodificar los frames que envía el navegador
+(/authenticate/frames): cv2.imdecode a resolución completa sobre una
+copia del buffer (np.array) frente a np.frombuffer sin copia y frente a
+la decodificación reducida de services/subidas.py (IMREAD_REDUCED_*).
+
+    python benchmarks/bench_decodificacion.py
+    python benchmarks/bench_decodificacion.py foto.jpg --repeticiones 200
+
+Sin imagen usa un frame sintético con bordes y gradientes (comprime como
+una foto, no como ruido).
+"""
+import argparse
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services.subidas import decodificar, dimensiones_jpeg, LADO_FRAME
+
+
+def frame_sintetico(ancho, alto):
+    x = np.linspace(0, 255, ancho, dtype=np.float32)
+    y = np.linspace(0, 255, alto, dtype=np.float32)[:, None]
+    frame = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=2).astype(np.uint8)
+    for i in range(0, min(ancho, alto), 40):
+        cv2.circle(frame, (ancho // 2, alto // 2), i, (255 - i % 255, i % 255, 128), 2)
+    return frame
+
+
+def medir(funcion, repeticiones):
+    funcion()
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - t0) / repeticiones * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("imagen", nargs="?")
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.imagen:
+        with open(args.imagen, "rb") as f:
+            casos = [(os.path.basename(args.imagen), f.read())]
+    else:
+        casos = [(f"{w}x{h}", cv2.imencode(".jpg", frame_sintetico(w, h), [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes())
+                 for w, h in ((640, 480), (1280, 720), (1920, 1080), (3840, 2160))]
+
+    print(f"{'imagen':<12} {'KB':>6} | {'copia':>8} {'frombuffer':>10} {'reducida':>9}  salida")
+    for nombre, datos in casos:
+        copia = medir(lambda: cv2.imdecode(np.array(bytearray(datos), dtype=np.uint8), cv2.IMREAD_COLOR),
+                      args.repeticiones)
+        sin_copia = medir(lambda: cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), cv2.IMREAD_COLOR),
+                          args.repeticiones)
+        reducida = medir(lambda: decodificar(datos, LADO_FRAME), args.repeticiones)
+        alto, ancho = decodificar(datos, LADO_FRAME).shape[:2]
+        print(f"{nombre:<12} {len(datos) / 1024:6.0f} | {copia:6.2f}ms {sin_copia:8.2f}ms {reducida:7.2f}ms  "
+              f"{dimensiones_jpeg(datos)} → ({ancho}, {alto})")
+
+
+if __name__ == "__main__":
+    main()
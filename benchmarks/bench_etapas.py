@@ -0,0 +1,97 @@
+"""
+FPS de reconocer.py en serie (leer → YOLO → ArcFace → dibujar en un solo
+hilo) frente al modo por etapas (services/etapas.py), sobre el mismo video
+leído sin pausas y detectando en todos los frames.
+
+    python benchmarks/bench_etapas.py
+    python benchmarks/bench_etapas.py video.mp4 --multi
+
+Sin video genera un clip sintético. En serie el tiempo por frame es la
+suma de las etapas; por etapas debería acercarse a la más lenta. Con un
+solo núcleo no hay nada que solapar y ambos modos rinden igual.
+Requiere models/*.onnx.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services.face_recognizer import Galeria
+from services.pipeline import FacePipeline
+from services.etapas import ReconocimientoEtapas
+
+
+def clip_sintetico(n_frames=300, fps=30):
+    ruta = os.path.join(tempfile.gettempdir(), "bench_etapas.avi")
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    escritor = cv2.VideoWriter(ruta, cv2.VideoWriter_fourcc(*"MJPG"), fps, (640, 480))
+    for n in range(n_frames):
+        escritor.write(np.roll(base, n * 3, axis=1))
+    escritor.release()
+    return ruta
+
+
+def dibujar(frame, rostros):
+    for rostro in rostros:
+        x1, y1, x2, y2 = rostro['caja']
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(frame, f"{rostro['usuario']} ({rostro['distancia']:.3f})", (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+
+
+def en_serie(video, pipeline, galeria, todas):
+    cap = cv2.VideoCapture(video)
+    n = 0
+    t0 = time.perf_counter()
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        dibujar(frame, pipeline.identify(frame, galeria, todas=todas))
+        n += 1
+    cap.release()
+    return n / (time.perf_counter() - t0)
+
+
+def por_etapas(video, pipeline, galeria, todas):
+    etapas = ReconocimientoEtapas(video, pipeline, galeria, todas=todas, tiempo_real=False, intervalo=1)
+    etapas.iniciar()
+    for paquete in etapas.resultados():
+        dibujar(paquete.frame, paquete.rostros or [])
+    etapas.detener()
+    return etapas.estadisticas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", nargs="?")
+    parser.add_argument("--multi", action="store_true", help="todos los rostros del frame")
+    args = parser.parse_args()
+
+    video = args.video or clip_sintetico()
+    rng = np.random.default_rng(0)
+    galeria = Galeria(np.arange(1000), [f"u{i}" for i in range(1000)],
+                      rng.normal(size=(1000, 512)).astype(np.float32), np.ones(1000, dtype=bool))
+    pipeline = FacePipeline()
+
+    # Calentamiento: la primera pasada paga asignaciones de ONNX Runtime
+    en_serie(video, pipeline, galeria, args.multi)
+
+    fps_serie = en_serie(video, pipeline, galeria, args.multi)
+    stats = por_etapas(video, pipeline, galeria, args.multi)
+
+    print(f"en serie    : {fps_serie:7.1f} FPS")
+    print(f"por etapas  : {stats['fps']:7.1f} FPS  ({stats['fps'] / fps_serie:.2f}x)")
+    print(f"latencia captura→render: {stats['latencia_total']}")
+    for etapa, datos in stats['etapas'].items():
+        print(f"  {etapa:<10} media {datos['media_ms']} ms, máx {datos['max_ms']} ms, "
+              f"descartados {datos.get('descartados', 0)}")
+
+
+if __name__ == "__main__":
+    main()
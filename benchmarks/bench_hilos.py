@@ -0,0 +1,110 @@
+"""
+Barrido de configuraciones de hilos de ONNX Runtime (session_options.
+FabricaSesiones): latencia de un frame (YOLO + ArcFace de un rostro) con
+un solo cliente y throughput con varios clientes simultáneos, como las
+peticiones concurrentes de Flask.
+
+    python benchmarks/bench_hilos.py
+    python benchmarks/bench_hilos.py --clientes 4 --segundos 5
+
+Cada configuración corre en un subproceso propio: el pool global de
+ONNX Runtime solo puede configurarse una vez por proceso.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from session_options import FabricaSesiones, cpus_disponibles
+
+ITERACIONES = 30
+
+
+def medir(config, clientes, segundos):
+    """Corre dentro del subproceso: retorna dict con latencia y throughput"""
+    from services.pipeline import FacePipeline
+
+    fabrica = FabricaSesiones(concurrencia=clientes, **config)
+    pipeline = FacePipeline(fabrica=fabrica)
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    rostro = rng.integers(0, 255, (160, 140, 3), dtype=np.uint8)
+
+    def paso():
+        pipeline.detect(frame)
+        pipeline.embed([rostro])
+
+    paso()
+    tiempos = []
+    for _ in range(ITERACIONES):
+        t0 = time.perf_counter()
+        paso()
+        tiempos.append(time.perf_counter() - t0)
+
+    hechos = [0] * clientes
+    fin = time.perf_counter() + segundos
+
+    def cliente(i):
+        while time.perf_counter() < fin:
+            paso()
+            hechos[i] += 1
+
+    hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    return {
+        'config': fabrica.describir(),
+        'p50_ms': float(np.percentile(tiempos, 50) * 1000),
+        'p95_ms': float(np.percentile(tiempos, 95) * 1000),
+        'fps': sum(hechos) / segundos,
+    }
+
+
+def configuraciones(cpus):
+    hilos = sorted({1, 2, 4, 8, cpus})
+    for h in hilos:
+        yield {'hilos': h, 'modo': 'secuencial', 'spinning': True}
+        yield {'hilos': h, 'modo': 'secuencial', 'spinning': False}
+        yield {'hilos': h, 'modo': 'paralelo', 'spinning': False}
+        yield {'hilos': h, 'modo': 'secuencial', 'pool_global': True}
+    yield {}    # automático (Settings / núcleos disponibles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clientes", type=int, default=2)
+    parser.add_argument("--segundos", type=float, default=3.0)
+    parser.add_argument("--config", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.config is not None:
+        print(json.dumps(medir(json.loads(args.config), args.clientes, args.segundos)))
+        return
+
+    cpus = cpus_disponibles()
+    print(f"CPUs disponibles (afinidad + cgroup): {cpus} | clientes simultáneos: {args.clientes}\n")
+    print(f"{'p50 ms':>8} {'p95 ms':>8} {'frames/s':>9}  configuración")
+
+    for config in configuraciones(cpus):
+        salida = subprocess.run(
+            [sys.executable, __file__, "--config", json.dumps(config),
+             "--clientes", str(args.clientes), "--segundos", str(args.segundos)],
+            capture_output=True, text=True
+        )
+        if salida.returncode != 0:
+            print(f"{'-':>8} {'-':>8} {'-':>9}  {config}: {salida.stderr.strip().splitlines()[-1]}")
+            continue
+        r = json.loads(salida.stdout.strip().splitlines()[-1])
+        print(f"{r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['fps']:9.1f}  {r['config']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Recall y latencia del índice IVF frente a la búsqueda exacta (coseno)
+con embeddings sintéticos de 512 dimensiones.
+
+    python benchmarks/bench_indice_ann.py
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services.face_recognizer import Galeria
+from services.indice_ann import IndiceIVF
+
+DIM = 512
+N_CONSULTAS = 200
+
+
+def galeria_sintetica(rng, n):
+    """Identidades agrupadas (como embeddings reales) + consultas ruidosas de usuarios conocidos"""
+    grupos = rng.normal(size=(max(1, n // 50), DIM)).astype(np.float32)
+    emb = grupos[rng.integers(0, len(grupos), n)] + rng.normal(size=(n, DIM)).astype(np.float32)
+    galeria = Galeria(np.arange(n), [f"u{i}" for i in range(n)], emb, np.ones(n, dtype=bool))
+
+    objetivo = rng.integers(0, n, N_CONSULTAS)
+    consultas = galeria.matriz[objetivo] + 0.06 * rng.normal(size=(N_CONSULTAS, DIM)).astype(np.float32)
+    return galeria, consultas
+
+
+def medir(fn, consultas):
+    t0 = time.perf_counter()
+    resultados = [fn(q) for q in consultas]
+    return resultados, (time.perf_counter() - t0) / len(consultas) * 1000
+
+
+def main():
+    rng = np.random.default_rng(0)
+
+    for n in (1_000, 10_000, 100_000):
+        galeria, consultas = galeria_sintetica(rng, n)
+
+        exactos, t_exacto = medir(lambda q: galeria.identificar(q)[0], consultas)
+
+        t0 = time.perf_counter()
+        indice = IndiceIVF()
+        indice.entrenar(galeria.matriz, galeria.ids)
+        t_entrenar = time.perf_counter() - t0
+
+        print(f"\n== {n:>7} usuarios | {indice.n_listas} listas | entrenamiento {t_entrenar:.1f} s")
+        print(f"   exacto          : {t_exacto:7.3f} ms/consulta")
+
+        galeria.indice = indice
+        for n_probe in (4, 8, 16, 32):
+            indice.n_probe = n_probe
+            aprox, t_ann = medir(lambda q: galeria.identificar(q)[0], consultas)
+            recall = np.mean([a == e for a, e in zip(aprox, exactos)])
+            print(f"   IVF n_probe={n_probe:<3} : {t_ann:7.3f} ms/consulta  "
+                  f"recall@1={recall:.3f}  ({t_exacto / t_ann:.1f}x)")
+        galeria.indice = None
+
+
+if __name__ == "__main__":
+    main()
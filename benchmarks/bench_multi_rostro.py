@@ -0,0 +1,67 @@
+"""
+Throughput del modo multi-rostro (rostros/segundo) con 1, 4 y 8 rostros
+por frame: embeddings en un solo lote de ArcFace + un GEMM contra la
+galería, frente a procesar rostro por rostro como el modo de un solo
+rostro.
+
+    python benchmarks/bench_multi_rostro.py
+    python benchmarks/bench_multi_rostro.py --usuarios 10000
+
+La detección (YOLO sobre el frame completo) se mide aparte y se suma
+por frame: no depende del número de rostros. Requiere models/*.onnx.
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services.face_recognizer import Galeria
+from services.pipeline import FacePipeline
+
+DIM = 512
+REPETICIONES = 20
+
+
+def medir(fn, repeticiones=REPETICIONES):
+    fn()    # calentamiento
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        fn()
+    return (time.perf_counter() - t0) / repeticiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    pipeline = FacePipeline()
+    emb = rng.normal(size=(args.usuarios, DIM)).astype(np.float32)
+    galeria = Galeria(np.arange(args.usuarios), [f"u{i}" for i in range(args.usuarios)], emb,
+                      np.ones(args.usuarios, dtype=bool))
+
+    frame = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    t_det = medir(lambda: pipeline.detect(frame))
+    print(f"Detección por frame: {t_det * 1000:.1f} ms | galería {args.usuarios} usuarios\n")
+
+    def en_lote(recortes):
+        galeria.identificar_lote(pipeline.embed(recortes))
+
+    def uno_a_uno(recortes):
+        for recorte in recortes:
+            galeria.identificar(pipeline.embed([recorte])[0])
+
+    print(f"{'rostros/frame':>13} | {'modo':<10} | {'ms/frame':>9} | {'rostros/s':>9}")
+    for n in (1, 4, 8):
+        recortes = [rng.integers(0, 255, (int(rng.integers(80, 200)), int(rng.integers(80, 200)), 3),
+                                 dtype=np.uint8) for _ in range(n)]
+        for modo, fn in (("lote", en_lote), ("uno a uno", uno_a_uno)):
+            t = t_det + medir(lambda: fn(recortes))
+            print(f"{n:>13} | {modo:<10} | {t * 1000:9.1f} | {n / t:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
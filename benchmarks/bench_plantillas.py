@@ -0,0 +1,226 @@
+"""
+Frames hasta la decisión con una sola muestra de registro (el rostro de
+mayor confianza de YOLO, como antes) frente a las plantillas de
+services/plantillas.py (media ponderada por calidad + mejores muestras).
+
+    python benchmarks/bench_plantillas.py --simulado
+    python benchmarks/bench_plantillas.py clips/ --registro 15
+
+Con clips: DIR/<usuario>/*.mp4|avi. El primer clip de cada usuario se
+usa para el registro (sus primeros `--registro` frames) y el resto para
+los intentos; si solo hay uno, los intentos usan lo que queda del clip.
+Requiere models/*.onnx.
+
+--simulado no usa imágenes: cada identidad es un vector, y cada muestra
+la suma de la identidad, un desvío de pose (frente, izquierda o
+derecha) y ruido que crece al bajar la calidad. Los impostores son
+identidades que no están en la galería.
+
+Cada intento corre PoliticaDecision frame a frame. Reporta frames
+medios y p95 hasta decidir, rechazos falsos (FRR) de usuarios
+registrados y aceptaciones falsas (FAR) de impostores.
+"""
+import argparse
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services.decision import PoliticaDecision, UMBRAL_RECONOCIDO
+from services.face_recognizer import Galeria
+from services.plantillas import MUESTRAS, seleccionar, combinar
+
+DIM = 512
+VIDEOS = (".mp4", ".avi", ".mov", ".mkv")
+
+# Simulación
+POSE = 0.7              # norma del desvío de un rostro girado respecto del de frente
+RUIDO_MIN = 0.6         # norma del ruido de una muestra de calidad 1
+RUIDO_EXTRA = 1.0       # ruido adicional de una muestra de calidad 0
+FACTOR_GIRADO = 0.5     # lo que resta calidad() a un rostro girado (simetría)
+
+
+# ==========================
+#   INTENTOS
+# ==========================
+
+def intentos(galeria, embeddings):
+    """
+    Corre intentos seguidos sobre `embeddings` (None = frame sin rostro),
+    cada uno con su PoliticaDecision. Retorna [(frames, aceptado_como)]
+    con aceptado_como = nombre o None; el intento que queda a medias al
+    terminar la secuencia no cuenta.
+    """
+    salida = []
+    politica = PoliticaDecision()
+    for emb in embeddings:
+        if emb is None:
+            politica.agregar_sin_rostro()
+        else:
+            politica.agregar(*galeria.identificar(emb))
+        if politica.decidido:
+            mejor = politica.resultado()
+            aceptado = None
+            if politica.motivo in ('coincidencia_segura', 'acuerdo') or (
+                    mejor is not None and mejor['distancia'] < UMBRAL_RECONOCIDO):
+                aceptado = mejor['usuario']
+            salida.append((politica.frames, aceptado))
+            politica = PoliticaDecision()
+    return salida
+
+
+def reportar(nombre, genuinos, impostores):
+    """genuinos = [(usuario, frames, aceptado_como)], impostores = [(frames, aceptado_como)]"""
+    if not genuinos:
+        print(f"{nombre:<12} | sin intentos completos")
+        return
+    frames = np.array([f for _, f, _ in genuinos])
+    frr = np.mean([aceptado != usuario for usuario, _, aceptado in genuinos]) * 100
+    linea = (f"{nombre:<12} | {frames.mean():6.2f} {np.percentile(frames, 95):5.0f} | "
+             f"{frr:6.1f}%")
+    if impostores:
+        frames_imp = np.array([f for f, _ in impostores])
+        far = np.mean([aceptado is not None for _, aceptado in impostores]) * 100
+        linea += f" | {frames_imp.mean():6.2f} {far:6.1f}%"
+    print(linea)
+
+
+def encabezado(impostores):
+    linea = f"{'registro':<12} | {'frames':>6} {'p95':>5} | {'FRR':>7}"
+    if impostores:
+        linea += f" | {'f.imp':>6} {'FAR':>7}"
+    print(linea)
+
+
+# ==========================
+#   SIMULACIÓN
+# ==========================
+
+def simulado(args):
+    rng = np.random.default_rng(args.semilla)
+    total = args.usuarios + args.impostores
+    identidades = rng.normal(size=(total, DIM)) / np.sqrt(DIM)
+    identidades /= np.linalg.norm(identidades, axis=1, keepdims=True)
+    giros = rng.normal(size=(total, 2, DIM)) * (POSE / np.sqrt(DIM))
+
+    def muestras(u, n, frente):
+        calidad = rng.beta(4, 2, size=n)
+        pose = rng.choice(3, size=n, p=[frente, (1 - frente) / 2, (1 - frente) / 2])
+        ruido = (RUIDO_MIN + RUIDO_EXTRA * (1 - calidad))[:, None] * rng.normal(size=(n, DIM)) / np.sqrt(DIM)
+        emb = identidades[u] + ruido
+        emb[pose > 0] += giros[u, pose[pose > 0] - 1]
+        # La confianza de YOLO apenas sigue a la calidad del rostro
+        conf = np.clip(0.6 + 0.3 * calidad + rng.normal(0, 0.1, n), 0, 1)
+        return emb.astype(np.float32), calidad * np.where(pose > 0, FACTOR_GIRADO, 1.0), conf
+
+    una, varias = [], []
+    for u in range(args.usuarios):
+        emb, calidad, conf = muestras(u, args.registro, frente=0.7)
+        una.append(emb[[int(np.argmax(conf))]])
+        elegidas = np.argsort(calidad)[::-1][:MUESTRAS]
+        varias.append(combinar(emb[elegidas], calidad[elegidas]))
+
+    intentos_gen = [(u, muestras(u, PoliticaDecision().max_frames, frente=0.5)[0])
+                    for u in rng.integers(0, args.usuarios, args.intentos)]
+    intentos_imp = [muestras(u, PoliticaDecision().max_frames, frente=0.5)[0]
+                    for u in rng.integers(args.usuarios, total, args.intentos // 2)] if args.impostores else []
+
+    print(f"Simulado: {args.usuarios} usuarios, {args.impostores} impostores, "
+          f"{args.intentos} intentos genuinos\n")
+    encabezado(bool(intentos_imp))
+    for nombre, plantillas in (("una muestra", una), ("plantillas", varias)):
+        galeria = construir(plantillas, [f"u{u}" for u in range(args.usuarios)])
+        genuinos = [(f"u{u}", *intentos(galeria, emb)[0]) for u, emb in intentos_gen]
+        impostores = [intentos(galeria, emb)[0] for emb in intentos_imp]
+        reportar(nombre, genuinos, impostores)
+
+
+def construir(plantillas, nombres):
+    """Galería con las filas de cada usuario seguidas, como la arma obtener_usuarios"""
+    repetir = [len(p) for p in plantillas]
+    ids = np.repeat(np.arange(len(plantillas)), repetir)
+    return Galeria(ids, np.repeat(np.asarray(nombres, dtype=object), repetir), np.vstack(plantillas),
+                   np.ones(len(ids), dtype=bool))
+
+
+# ==========================
+#   CLIPS GRABADOS
+# ==========================
+
+def leer(ruta, desde=0, hasta=None):
+    import cv2
+    captura = cv2.VideoCapture(ruta)
+    frames, n = [], 0
+    while hasta is None or n < hasta:
+        ok, frame = captura.read()
+        if not ok:
+            break
+        if n >= desde:
+            frames.append(frame)
+        n += 1
+    captura.release()
+    return frames
+
+
+def desde_clips(args):
+    from services.pipeline import FacePipeline
+    pipeline = FacePipeline()
+
+    usuarios = sorted(d for d in os.listdir(args.clips) if os.path.isdir(os.path.join(args.clips, d)))
+    una, varias, pruebas = [], [], {}
+    for usuario in usuarios:
+        carpeta = os.path.join(args.clips, usuario)
+        clips = sorted(os.path.join(carpeta, f) for f in os.listdir(carpeta) if f.lower().endswith(VIDEOS))
+        if not clips:
+            continue
+
+        muestras = []   # (recorte, conf) de los frames del registro con rostro
+        for frame in leer(clips[0], hasta=args.registro):
+            _, _, caja, conf = pipeline.detect(frame)
+            if caja is not None:
+                muestras.append((pipeline.recortar(frame, caja), conf))
+        if not muestras:
+            print(f"{usuario}: sin rostro en el registro, se omite")
+            continue
+
+        mejor = max(range(len(muestras)), key=lambda i: muestras[i][1])
+        una.append((usuario, pipeline.embed([muestras[mejor][0]])))
+        elegidas, calidades = seleccionar(muestras)
+        varias.append((usuario, combinar(pipeline.embed([muestras[i][0] for i in elegidas]), calidades)))
+
+        # Embeddings de los intentos una sola vez: son los mismos para los dos registros
+        frames = [f for clip in clips[1:] for f in leer(clip)] or leer(clips[0], desde=args.registro)
+        embeddings = []
+        for frame in frames:
+            _, _, caja, _ = pipeline.detect(frame)
+            embeddings.append(None if caja is None else pipeline.embed([pipeline.recortar(frame, caja)])[0])
+        pruebas[usuario] = embeddings
+
+    print(f"Clips: {len(pruebas)} usuarios, {sum(map(len, pruebas.values()))} frames de prueba\n")
+    encabezado(False)
+    for nombre, registro in (("una muestra", una), ("plantillas", varias)):
+        galeria = construir([p for _, p in registro], [u for u, _ in registro])
+        genuinos = [(usuario, *r) for usuario, embeddings in pruebas.items()
+                    for r in intentos(galeria, embeddings)]
+        reportar(nombre, genuinos, [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("clips", nargs="?", help="carpeta con un subdirectorio de clips por usuario")
+    parser.add_argument("--simulado", action="store_true")
+    parser.add_argument("--registro", type=int, default=15, help="frames de la ráfaga de registro")
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--impostores", type=int, default=100)
+    parser.add_argument("--intentos", type=int, default=1000)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.clips and not args.simulado:
+        desde_clips(args)
+    else:
+        simulado(args)
+
+
+if __name__ == "__main__":
+    main()
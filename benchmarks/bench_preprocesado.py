@@ -0,0 +1,141 @@
+"""
+Preprocesado YOLO original (resize → cvtColor → astype → /255 → moveaxis)
+frente al de FacePipeline (buffers persistentes + IOBinding), sobre un
+video grabado.
+
+    python benchmarks/bench_preprocesado.py                 # clip sintético
+    python benchmarks/bench_preprocesado.py grabacion.mp4
+
+Reporta tiempo por frame, memoria temporal por frame (pico de
+tracemalloc, también expresado en "tensores 640x640x3 float32"
+equivalentes) y asignaciones por frame: cuántos bloques de al menos
+MIN_ASIGNACION bytes se piden en cada frame y cuánto suman. Requiere
+models/model.onnx.
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services.pipeline import FacePipeline
+
+TENSOR_640 = 640 * 640 * 3 * 4
+MIN_ASIGNACION = 4096   # bytes: por debajo son objetos Python chicos, no arrays
+
+
+def preprocess_original(frame):
+    """Copia del preprocesado que tenían app.py / reconocer.py"""
+    resized = cv2.resize(frame, (640, 640))
+    img = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+    img = img.astype(np.float32) / 255.0
+    img = np.moveaxis(img, -1, 0)
+    img = img[np.newaxis, :, :, :]
+    return img
+
+
+def clip_sintetico(n=120):
+    ruta = os.path.join(tempfile.gettempdir(), "bench_preprocesado.avi")
+    rng = np.random.default_rng(0)
+    escritor = cv2.VideoWriter(ruta, cv2.VideoWriter_fourcc(*"MJPG"), 30, (640, 480))
+    base = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    for i in range(n):
+        escritor.write(np.roll(base, i * 4, axis=1))
+    escritor.release()
+    return ruta
+
+
+def leer_frames(ruta):
+    cap = cv2.VideoCapture(ruta)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def contar_asignaciones(fn, frame):
+    """
+    (asignaciones, bytes) de fn(frame). La memoria de tracemalloc se lee
+    después de cada instrucción de Python (sys.settrace con eventos por
+    opcode): cada salto de al menos MIN_ASIGNACION es un array nuevo (la
+    salida de resize, cvtColor, astype, /255...). Lo que se pide y se
+    libera dentro de una misma función de C, o memoria que no pasa por
+    tracemalloc (la de ONNX Runtime), no se cuenta.
+    """
+    cantidad = total = 0
+    previa = tracemalloc.get_traced_memory()[0]
+
+    def traza(marco, _evento, _arg):
+        nonlocal cantidad, total, previa
+        marco.f_trace_opcodes = True
+        actual = tracemalloc.get_traced_memory()[0]
+        if actual - previa >= MIN_ASIGNACION:
+            cantidad += 1
+            total += actual - previa
+        previa = actual
+        return traza
+
+    sys.settrace(traza)
+    try:
+        fn(frame)
+    finally:
+        sys.settrace(None)
+    return cantidad, total
+
+
+def medir(fn, frames):
+    fn(frames[0])   # calentamiento (crea buffers por hilo)
+
+    t0 = time.perf_counter()
+    for frame in frames:
+        fn(frame)
+    ms = (time.perf_counter() - t0) / len(frames) * 1000
+
+    tracemalloc.start()
+    picos = []
+    for frame in frames:
+        actual, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn(frame)
+        _, pico = tracemalloc.get_traced_memory()
+        picos.append(pico - actual)
+
+    asignaciones = [contar_asignaciones(fn, frame) for frame in frames]
+    tracemalloc.stop()
+
+    cantidad, total = np.mean(asignaciones, axis=0)
+    return ms, float(np.mean(picos)), float(cantidad), float(total)
+
+
+def main():
+    ruta = sys.argv[1] if len(sys.argv) > 1 else clip_sintetico()
+    frames = leer_frames(ruta)
+    print(f"Video: {ruta} ({len(frames)} frames {frames[0].shape[1]}x{frames[0].shape[0]})")
+
+    pipeline = FacePipeline(arc_model=None)
+    session = pipeline.session_yolo
+    nombre = pipeline.input_name_yolo
+
+    casos = {
+        "preprocesado original": preprocess_original,
+        "preprocesado FacePipeline": pipeline.preprocess,
+        "YOLO original (run)": lambda f: session.run(None, {nombre: preprocess_original(f)}),
+        "YOLO FacePipeline (IOBinding)": pipeline.detect,
+    }
+
+    for caso, fn in casos.items():
+        ms, pico, cantidad, total = medir(fn, frames)
+        print(f"{caso:<32}: {ms:8.2f} ms/frame   memoria temporal {pico / 1e6:7.2f} MB"
+              f"  (~{pico / TENSOR_640:.1f} tensores 640x640x3 float32)"
+              f"   {cantidad:5.1f} asignaciones/frame ({total / 1e6:6.2f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Costo de YOLO en el frame completo frente a la ROI del track
+(FacePipeline.detect_roi), con el modelo que se le pase.
+
+    python benchmarks/bench_roi.py                          # models/model.onnx
+    python benchmarks/bench_roi.py --yolo models/model-dinamico.onnx
+
+Con un ONNX de entrada fija la ROI está desactivada (se estiraría a
+640x640 y costaría lo mismo que el frame completo): el benchmark lo
+indica y mide ambos caminos igual, para mostrar que no hay ahorro.
+tools/entrada_dinamica.py convierte el modelo cuando es posible.
+
+Reporta ms por detección en cada camino y el promedio por detección de
+un track estable (una pasada completa cada REFRESCO en la ROI).
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services.pipeline import FacePipeline, YOLO_MODEL
+from services.tracking import EstadoTrack, REFRESCO
+
+CAJA = (280, 170, 380, 300)     # rostro típico a ~1 m en 640x480
+
+
+def medir(fn, repeticiones):
+    fn()    # calentamiento (crea buffers por hilo)
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        fn()
+    return (time.perf_counter() - t0) / repeticiones * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--yolo", default=YOLO_MODEL)
+    parser.add_argument("--repeticiones", type=int, default=200)
+    args = parser.parse_args()
+
+    pipeline = FacePipeline(yolo_model=args.yolo, arc_model=None)
+    frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+
+    track = EstadoTrack()
+    track.caja = CAJA
+    roi = track.region(640, 480)
+
+    if pipeline.entrada_roi is None:
+        print(f"⚠ {args.yolo}: entrada fija {pipeline.entrada[0]}x{pipeline.entrada[1]}, "
+              f"la ROI está desactivada (EstadoTrack usa el frame completo)\n")
+        ancho, alto = pipeline.entrada
+    else:
+        ancho, alto = pipeline.entrada_roi
+        print(f"✔ {args.yolo}: entrada dinámica, ROI {roi} → {ancho}x{alto}\n")
+
+    completo = medir(lambda: pipeline.detect(frame), args.repeticiones)
+    # Lo que costaría la ROI (con entrada fija es la misma inferencia que el frame completo)
+    en_roi = medir(lambda: pipeline.detect_roi(frame, roi), args.repeticiones)
+    track_estable = (completo + REFRESCO * en_roi) / (REFRESCO + 1)
+
+    print(f"{'camino':<16} | {'entrada':>9} | {'ms/det':>7}")
+    print(f"{'frame completo':<16} | {pipeline.entrada[0]:>4}x{pipeline.entrada[1]:<4} | {completo:7.2f}")
+    print(f"{'ROI':<16} | {ancho:>4}x{alto:<4} | {en_roi:7.2f}")
+    print(f"{'track estable':<16} | {'':>9} | {track_estable:7.2f}  "
+          f"({(1 - track_estable / completo) * 100:+.0f}% de ahorro)")
+
+
+if __name__ == "__main__":
+    main()
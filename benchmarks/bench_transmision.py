@@ -0,0 +1,117 @@
+"""
+Costo de /video_feed con N clientes: el generador original (cada cliente
+codifica cada frame de la cámara a resolución completa y calidad por
+defecto) frente al Difusor de services/transmision.py (un solo
+codificador con calidad, resolución y FPS máximo configurables).
+
+    python benchmarks/bench_transmision.py
+    python benchmarks/bench_transmision.py --clientes 1 4 16 --calidad 60 --lado 480 --fps 10
+
+Usa una cámara sintética de 1280x720 a 30 FPS. Reporta codificaciones
+por segundo, ms por codificación, CPU del proceso por segundo y CPU por
+frame entregado a cada suscriptor (sin contar la cámara).
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services.camara import CapturaCamara, FuenteSintetica
+from services.transmision import Difusor
+
+
+def frame_sintetico(n, ancho=1280, alto=720):
+    x = np.linspace(0, 255, ancho, dtype=np.float32)
+    y = np.linspace(0, 255, alto, dtype=np.float32)[:, None]
+    frame = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=2).astype(np.uint8)
+    cv2.circle(frame, ((n * 8) % ancho, alto // 2), 80, (255, 255, 255), -1)
+    return frame
+
+
+def por_cliente(camara, n_clientes, segundos):
+    """Generador original de /video_feed, un hilo por cliente"""
+    codificados, tiempos, lock = [0], [0.0], threading.Lock()
+    fin = time.perf_counter() + segundos
+
+    def cliente():
+        seq = -1
+        while time.perf_counter() < fin:
+            dato = camara.esperar(desde=seq)
+            if dato is None:
+                continue
+            seq, _, frame = dato
+            t0 = time.perf_counter()
+            _, buffer = cv2.imencode('.jpg', frame)
+            parte = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n'
+            with lock:
+                codificados[0] += 1
+                tiempos[0] += time.perf_counter() - t0
+
+    cpu = medir_cpu(cliente, n_clientes, segundos)
+    return codificados[0], codificados[0], tiempos[0] / max(codificados[0], 1) * 1000, cpu
+
+
+def difundido(camara, n_clientes, segundos, calidad, lado, fps):
+    difusor = Difusor(camara, calidad=calidad, lado_max=lado, fps_max=fps).iniciar()
+    fin = time.perf_counter() + segundos
+
+    def cliente():
+        suscripcion = difusor.suscribir()
+        for _ in suscripcion:
+            if time.perf_counter() >= fin:
+                break
+        suscripcion.close()
+
+    cpu = medir_cpu(cliente, n_clientes, segundos)
+    stats = difusor.estadisticas()
+    difusor.detener()
+    return stats['frames_codificados'], stats['partes_enviadas'], stats['codificacion_ms'], cpu
+
+
+def medir_cpu(cliente, n_clientes, segundos):
+    """Segundos de CPU del proceso por segundo de pared mientras corren los clientes"""
+    hilos = [threading.Thread(target=cliente) for _ in range(n_clientes)]
+    c0, t0 = time.process_time(), time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return (time.process_time() - c0) / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clientes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--segundos", type=float, default=3.0)
+    parser.add_argument("--calidad", type=int, default=70)
+    parser.add_argument("--lado", type=int, default=640)
+    parser.add_argument("--fps", type=float, default=15)
+    args = parser.parse_args()
+
+    # Frames generados de antemano: la cámara sintética casi no gasta CPU
+    frames = [frame_sintetico(n) for n in range(30)]
+    camara = CapturaCamara(FuenteSintetica(1280, 720, 30, generador=lambda n: frames[n % 30])).iniciar()
+    camara.esperar()
+    base = medir_cpu(lambda: time.sleep(args.segundos), 1, args.segundos)
+    print(f"CPU de la cámara sola: {base * 100:.0f}% (se descuenta)")
+
+    print(f"{'modo':<10} {'clientes':>8} | {'cod/s':>6} {'ms/cod':>7} {'CPU %':>6} {'ms CPU/frame/cliente':>21}")
+    for n in args.clientes:
+        for nombre, medir in (("original", lambda: por_cliente(camara, n, args.segundos)),
+                              ("difusor", lambda: difundido(camara, n, args.segundos, args.calidad,
+                                                            args.lado, args.fps))):
+            codificados, entregados, ms_cod, cpu = medir()
+            cpu = max(cpu - base, 0)
+            por_entrega = cpu * args.segundos / max(entregados, 1) * 1000
+            print(f"{nombre:<10} {n:>8} | {codificados / args.segundos:6.1f} {ms_cod:7.2f} {cpu * 100:6.0f} "
+                  f"{por_entrega:21.2f}")
+
+    camara.detener()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,35 @@
+import argparse
+import sys
 import cv2
-import numpy as np
-import onnxruntime as ort
 import os
-from utils import preprocess_arcface
-from session_options import get_optimized_session
+from core.config import Settings
 from core.database import SessionLocal
-from services.face_recognizer import obtener_usuarios
+from services.face_recognizer import obtener_usuarios, GaleriaCompartida
+from services.pipeline import FacePipeline
+from services.indice_ann import preparar_indice
+from services.tracking import EstadoTrack, CacheIdentidad, INTERVALO
+from services.etapas import ReconocimientoEtapas
+from services.decision import UMBRAL_RECONOCIDO
+
+parser = argparse.ArgumentParser(description="Reconocimiento facial con la cámara local")
+parser.add_argument("--multi", action="store_true",
+                    help="reconocer todos los rostros del frame (lobby) en lugar de solo el principal")
+parser.add_argument("--etapas", action="store_true",
+                    help="captura, detección, embedding y dibujo en hilos separados (services/etapas.py)")
+parser.add_argument("--video", help="archivo de video en lugar de la cámara")
+parser.add_argument("--sin-ventana", action="store_true", help="no mostrar ventana (servidores sin pantalla)")
+parser.add_argument("--sin-pausa", action="store_true",
+                    help="con --etapas y --video: leer el video sin esperar su FPS ni descartar frames")
+args = parser.parse_args()
 
 # ==========================
 #       MODELOS
 # ==========================
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-YOLO_MODEL = os.path.join(BASE_DIR, "models", "model.onnx")
-ARC_MODEL  = os.path.join(BASE_DIR, "models", "arcface_r100.onnx")
+INDICE_ANN = os.path.join(BASE_DIR, "models", "indice_ivf.npz")
 
-session_yolo = get_optimized_session(YOLO_MODEL)
-input_name_yolo = session_yolo.get_inputs()[0].name
-
-session_arc = get_optimized_session(ARC_MODEL)
-input_name_arc = session_arc.get_inputs()[0].name
+pipeline = FacePipeline()
 
 # ==========================
 #  CARGAR BASE DE USUARIOS
@@ -31,20 +41,39 @@ def cargar_base():
     db.close()
     return base_usuarios   # ❗ IMPORTANTE: retornar
 
-base_usuarios = cargar_base()
+if Settings.GALERIA_INSTANTANEA:
+    # Instantánea compartida con app.py: sin copia privada de la matriz
+    # y con los cambios del panel de administración sin reiniciar
+    compartida = GaleriaCompartida(Settings.GALERIA_INSTANTANEA, cargar=cargar_base)
+    base_usuarios = compartida.galeria
+else:
+    compartida = None
+    base_usuarios = cargar_base()
 print(f"✔ Usuarios cargados: {list(base_usuarios.keys())}")
 
+# Índice ANN compartido con app.py (None si la base es pequeña)
+if compartida is not None:
+    compartida.asignar_indice(preparar_indice(base_usuarios, INDICE_ANN))
+else:
+    base_usuarios.indice = preparar_indice(base_usuarios, INDICE_ANN)
+
 
-def distancia_coseno(a, b):
-    dot = np.dot(a, b)
-    norms = np.linalg.norm(a) * np.linalg.norm(b)
-    return 1 - (dot / norms)
+def galeria_actual():
+    """La galería vigente (la última generación de la instantánea, si hay)"""
+    return compartida.galeria if compartida is not None else base_usuarios
 
 # ==========================
 #   DETECTAR CÁMARA
 # ==========================
 
 def abrir_camara():
+    if args.video:
+        cap = cv2.VideoCapture(args.video)
+        if not cap.isOpened():
+            print(f"❌ No se pudo abrir el video {args.video}")
+            exit()
+        return cap
+
     for i in range(5):
         cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
@@ -56,9 +85,126 @@ def abrir_camara():
     print("❌ No se encontró cámara.")
     exit()
 
-cap = abrir_camara()
+def mostrar(frame):
+    """Muestra el frame; False si se pidió salir (ESC)"""
+    if args.sin_ventana:
+        return True
+    cv2.imshow("Reconocimiento Facial", frame)
+    return cv2.waitKey(1) != 27
+
+
+def cerrar_ventanas():
+    if not args.sin_ventana:
+        cv2.destroyAllWindows()
+
+# ==========================
+#     REGLA DE ACCESO
+# ==========================
+
+def regla_acceso(usuario, distancia, tiene_acceso):
+    """Texto, color y mensaje de acceso para un resultado de la galería"""
+    if distancia < UMBRAL_RECONOCIDO:
+        label = f"{usuario} ({distancia:.3f})"
+        if tiene_acceso:
+            return label, (0, 255, 0), "ACCESO PERMITIDO"
+        return label, (0, 165, 255), "ACCESO DENEGADO"  # Naranja
+    return f"DESCONOCIDO ({distancia:.3f})", (0, 0, 255), "ACCESO DENEGADO"
+
+# ==========================
+#    MODO MULTI-ROSTRO
+# ==========================
+
+def dibujar_rostros(frame, rostros):
+    for rostro in rostros:
+        label, color, _ = regla_acceso(rostro['usuario'], rostro['distancia'], rostro['acceso'])
+        x1, y1, x2, y2 = rostro['caja']
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, label, (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+
+
+def bucle_multi():
+    """
+    Todos los rostros tras NMS: un solo lote de ArcFace y una sola
+    multiplicación matricial contra la galería por frame.
+    """
+    ultimos = []
+    frame_count = 0
+
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            if args.video:
+                break
+            continue
+
+        frame_count += 1
+        if frame_count % INTERVALO == 0:
+            ultimos = pipeline.identify(frame, galeria_actual(), todas=True)
+
+        dibujar_rostros(frame, ultimos)
+        cv2.putText(frame, f"Rostros: {len(ultimos)}", (20, 50),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 3)
+
+        if not mostrar(frame):
+            break
+
+# ==========================
+#    MODO POR ETAPAS
+# ==========================
+
+def bucle_etapas():
+    """
+    Captura, detección y embedding en hilos propios con canales cortos
+    entre ellos; este hilo solo dibuja y muestra. El FPS queda limitado
+    por la etapa más lenta en lugar de la suma de todas.
+    """
+    fuente = args.video if args.video else cap
+    etapas = ReconocimientoEtapas(fuente, pipeline, compartida or base_usuarios, todas=args.multi,
+                                  tiempo_real=not args.sin_pausa)
+    ultimos = []
+
+    etapas.iniciar()
+    try:
+        for paquete in etapas.resultados():
+            if paquete.rostros is not None:
+                ultimos = paquete.rostros
+
+            frame = paquete.frame
+            dibujar_rostros(frame, ultimos)
+            if args.multi:
+                cv2.putText(frame, f"Rostros: {len(ultimos)}", (20, 50),
+                            cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 3)
+            elif ultimos:
+                _, color, access = regla_acceso(ultimos[0]['usuario'], ultimos[0]['distancia'],
+                                                ultimos[0]['acceso'])
+                cv2.putText(frame, access, (20, 50),
+                            cv2.FONT_HERSHEY_SIMPLEX, 1.2, color, 3)
+
+            if not mostrar(frame):
+                break
+    finally:
+        etapas.detener()
+
+    stats = etapas.estadisticas()
+    print(f"📊 {stats['fps']} FPS | latencia captura→pantalla: {stats['latencia_total']}")
+    for etapa, datos in stats['etapas'].items():
+        print(f"   {etapa:<10} {datos}")
+
+cap = None if args.etapas and args.video else abrir_camara()
 print("🎥 Iniciando reconocimiento...")
 
+if args.etapas:
+    bucle_etapas()
+    cerrar_ventanas()
+    sys.exit(0)
+
+if args.multi:
+    bucle_multi()
+    cap.release()
+    cerrar_ventanas()
+    sys.exit(0)
+
 # ==========================
 #  CONTROL DE PARPADEO
 # ==========================
@@ -68,10 +214,12 @@ last_label = None
 last_color = (0, 255, 0)
 last_access = None  # PERMITIDO / DENEGADO
 
-frames_sin_det = 0
-MAX_FRAMES_SIN_DET = 6
+# Decide cuándo y dónde correr YOLO (ROI del último rostro o frame completo)
+track = EstadoTrack()
 
-frame_count = 0
+# Embedding del rostro seguido: ArcFace solo si se movió, pasó el tiempo
+# o la coincidencia era dudosa
+identidades = CacheIdentidad()
 
 # ==========================
 #   LOOP PRINCIPAL
@@ -80,13 +228,12 @@ frame_count = 0
 while True:
     ret, frame = cap.read()
     if not ret:
+        if args.video:
+            break
         continue
 
-    H, W = frame.shape[:2]
-
-    # ⚡ SOLO INFERIR YOLO CADA 2 FRAMES
-    frame_count += 1
-    if frame_count % 2 != 0:
+    # ⚡ Entre detecciones se reutiliza la última caja
+    if not track.debe_detectar():
         if last_box is not None and last_label is not None:
             x1, y1, x2, y2 = last_box
             cv2.rectangle(frame, (x1, y1), (x2, y2), last_color, 2)
@@ -98,107 +245,39 @@ while True:
                 cv2.putText(frame, last_access, (20, 50),
                             cv2.FONT_HERSHEY_SIMPLEX, 1.2, last_color, 3)
 
-        cv2.imshow("Reconocimiento Facial", frame)
-        if cv2.waitKey(1) == 27:
+        if not mostrar(frame):
             break
         continue
 
     # ==========================
-    #       PREPROCESO YOLO
+    #   DETECCIÓN YOLO (TRACK)
     # ==========================
 
-    resized = cv2.resize(frame, (640, 640))
-    img = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
-    img = img.astype(np.float32) / 255.0
-    img = np.moveaxis(img, -1, 0)
-    img = img[np.newaxis, :, :, :]
-
-    out = session_yolo.run(None, {input_name_yolo: img})[0]
-    out = out.squeeze()
-
-    xs, ys, ws, hs, confs = out
-
-    scale_x = W / 640
-    scale_y = H / 640
-
-    best_conf = 0
-    best_box = None
-
-    for i in range(8400):
-        conf = confs[i]
-        if conf > best_conf and conf > 0.55:
-            cx = xs[i] * scale_x
-            cy = ys[i] * scale_y
-            w_box = ws[i] * scale_x
-            h_box = hs[i] * scale_y
-
-            x1 = int(cx - w_box/2)
-            y1 = int(cy - h_box/2)
-            x2 = int(cx + w_box/2)
-            y2 = int(cy + h_box/2)
-
-            if w_box < 50 or h_box < 50:
-                continue
-            if x1 < 0 or y1 < 0 or x2 > W or y2 > H:
-                continue
-
-            best_box = (x1, y1, x2, y2)
-            best_conf = conf
+    best_box = track.detectar(pipeline, frame)
+    last_box = best_box
+    if best_box is None:
+        identidades.olvidar(track.id)
+        last_label = None
+        last_access = None
 
     # ==========================
-    #      ANTI-PARPADEO
+    #         RECONOCER
     # ==========================
 
     if best_box is not None:
-        last_box = best_box
-        frames_sin_det = 0
-    else:
-        frames_sin_det += 1
-        if frames_sin_det <= MAX_FRAMES_SIN_DET and last_box is not None:
-            best_box = last_box
+        embedding_live = identidades.obtener(track.id, best_box)
+        if embedding_live is None:
+            face = pipeline.recortar(frame, best_box)
+            embedding_live = pipeline.embed([face])[0]
+            resultado = galeria_actual().identificar(embedding_live)
+            identidades.guardar(track.id, best_box, embedding_live, resultado)
         else:
-            best_box = None
-            last_box = None
-            last_label = None
-            last_access = None
+            resultado = galeria_actual().identificar(embedding_live)
+            identidades.actualizar_resultado(track.id, resultado)
 
-    # ==========================
-    #         RECONOCER
-    # ==========================
+        mejor_usuario, mejor_distancia, tiene_acceso = resultado
 
-    if best_box is not None:
-        x1, y1, x2, y2 = best_box
-
-        face = frame[y1:y2, x1:x2]
-
-        face_pre = preprocess_arcface(face)
-        embedding_live = session_arc.run(None, {input_name_arc: face_pre})[0][0]
-
-        mejor_usuario = "DESCONOCIDO"
-        mejor_distancia = 1e9
-        tiene_acceso = False
-
-        for usuario, datos in base_usuarios.items():
-            emb_base = datos['embedding']
-            dist = distancia_coseno(embedding_live, emb_base)
-            if dist < mejor_distancia:
-                mejor_distancia = dist
-                mejor_usuario = usuario
-                tiene_acceso = datos['access']
-
-        # ------ REGLA DE ACCESO ------
-        if mejor_distancia < 0.55:
-            label = f"{mejor_usuario} ({mejor_distancia:.3f})"
-            if tiene_acceso:
-                color = (0, 255, 0)
-                access = "ACCESO PERMITIDO"
-            else:
-                color = (0, 165, 255)  # Naranja
-                access = "ACCESO DENEGADO"
-        else:
-            label = f"DESCONOCIDO ({mejor_distancia:.3f})"
-            color = (0, 0, 255)
-            access = "ACCESO DENEGADO"
+        label, color, access = regla_acceso(mejor_usuario, mejor_distancia, tiene_acceso)
 
         # guardar para smoothing
         last_label = label
@@ -219,10 +298,8 @@ while True:
         cv2.putText(frame, last_access, (20, 50),
                     cv2.FONT_HERSHEY_SIMPLEX, 1.2, last_color, 3)
 
-    cv2.imshow("Reconocimiento Facial", frame)
-
-    if cv2.waitKey(1) == 27:
+    if not mostrar(frame):
         break
 
 cap.release()
-cv2.destroyAllWindows()
+cerrar_ventanas()
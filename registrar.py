@@ -1,23 +1,13 @@
 import cv2
-import numpy as np
-import onnxruntime as ort
 import os
-from utils import preprocess_arcface
+from core.config import Settings
 from core.database import SessionLocal
-from services.face_recognizer import guardar_usuario
+from services.face_recognizer import guardar_usuario, GaleriaCompartida
+from services.pipeline import FacePipeline
+from services.plantillas import MUESTRAS, seleccionar, combinar
 
-# Rutas de los modelos
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-YOLO_MODEL = os.path.join(BASE_DIR, "models", "model.onnx")
-ARC_MODEL  = os.path.join(BASE_DIR, "models", "arcface_r100.onnx")
-
-# Cargar YOLO FACE (tu modelo)
-session_yolo = ort.InferenceSession(YOLO_MODEL, providers=["CPUExecutionProvider"])
-input_name_yolo = session_yolo.get_inputs()[0].name
-
-# Cargar ARC FACE
-session_arc = ort.InferenceSession(ARC_MODEL, providers=["CPUExecutionProvider"])
-input_name_arc = session_arc.get_inputs()[0].name
+# Cargar YOLO FACE + ARC FACE (mismas sesiones optimizadas que app.py)
+pipeline = FacePipeline()
 
 # Crear carpeta de usuarios si no existe
 os.makedirs("base_rostros", exist_ok=True)
@@ -35,84 +25,61 @@ def abrir_camara():
     exit()
 
 cap = abrir_camara()
-print("🎥 Cámara iniciada. Acércate bien a la cámara.")
+print("🎥 Cámara iniciada. Acércate bien a la cámara y mueve levemente la cabeza.")
+
+# Rostros candidatos de frames distintos; se guardan las plantillas de
+# los de mejor calidad (services/plantillas.py)
+CANDIDATAS = 2 * MUESTRAS
+CADA_FRAMES = 3     # una candidata cada N frames, para que no sean todas iguales
+candidatas = []     # (recorte, confianza)
+n_frame = 0
 
 while True:
     ret, frame = cap.read()
     if not ret:
         continue
+    n_frame += 1
 
-    H, W = frame.shape[:2]
-
-    # --- PREPROCESAR A 640x640 ---
-    resized = cv2.resize(frame, (640, 640))
-    rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
-    img = rgb.astype(np.float32) / 255.0
-    img = np.transpose(img, (2, 0, 1))
-    img = np.expand_dims(img, 0)
-
-    # --- INFERENCIA YOLO ---
-    outputs = session_yolo.run(None, {input_name_yolo: img})[0]  # (1,5,8400)
-    outputs = outputs.squeeze()  # (5,8400)
-
-    xs = outputs[0]  # centros x EN PIXELES DEL 640x640
-    ys = outputs[1]  # centros y
-    ws = outputs[2]
-    hs = outputs[3]
-    confs = outputs[4]
-
-    # ESCALA a tamaño real
-    scale_x = W / 640
-    scale_y = H / 640
-
-    best_conf = 0
-    best_box = None
-
-    # --- TOMAR SOLO LA DETECCIÓN CON MAYOR CONF ---
-    for i in range(8400):
-        conf = confs[i]
-        if conf > best_conf and conf > 0.55:
-            cx = xs[i] * scale_x
-            cy = ys[i] * scale_y
-            w_box = ws[i] * scale_x
-            h_box = hs[i] * scale_y
-
-            x1 = int(cx - w_box / 2)
-            y1 = int(cy - h_box / 2)
-            x2 = int(cx + w_box / 2)
-            y2 = int(cy + h_box / 2)
-
-            # Validación de caja
-            if w_box < 50 or h_box < 50:
-                continue
-            if x1 < 0 or y1 < 0 or x2 > W or y2 > H:
-                continue
-
-            best_conf = conf
-            best_box = (x1, y1, x2, y2)
+    # --- DETECCIÓN: TOMAR SOLO LA DETECCIÓN CON MAYOR CONF ---
+    _, _, best_box, best_conf = pipeline.detect(frame)
 
     # --- SI HAY ROSTRO VÁLIDO ---
     if best_box is not None:
         x1, y1, x2, y2 = best_box
 
+        # Extraer rostro (antes de dibujar sobre el frame)
+        if n_frame % CADA_FRAMES == 0:
+            candidatas.append((pipeline.recortar(frame, best_box).copy(), best_conf))
+
         # Dibujar cuadro
         cv2.rectangle(frame, (x1, y1), (x2, y2), (0,255,0), 2)
         cv2.putText(frame, f"{best_conf:.2f}", (x1, y1-5),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,255,0), 2)
 
-        # Extraer rostro
-        face = frame[y1:y2, x1:x2]
+    cv2.putText(frame, f"Muestras: {len(candidatas)}/{CANDIDATAS}", (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255,255,0), 2)
 
-        # --- ARC FACE EMBEDDING ---
-        face_pre = preprocess_arcface(face)
-        embedding = session_arc.run(None, {input_name_arc: face_pre})[0][0]
+    if len(candidatas) >= CANDIDATAS:
+        # --- ARC FACE EMBEDDING: las mejores muestras en un solo lote ---
+        elegidas, calidades = seleccionar(candidatas)
+        embeddings = pipeline.embed([candidatas[i][0] for i in elegidas])
+        plantillas = combinar(embeddings, calidades)
 
-        # Guardar embedding en base de datos
+        # Guardar plantillas en base de datos
         db = SessionLocal()
-        guardar_usuario(db, nombre, embedding)
+        usuario = guardar_usuario(db, nombre, plantillas)
         db.close()
 
-        print(f"✔ Rostro registrado correctamente: {nombre}")
+        # Publicar el alta en la instantánea que leen app.py y reconocer.py
+        if Settings.GALERIA_INSTANTANEA:
+            try:
+                galeria = GaleriaCompartida(Settings.GALERIA_INSTANTANEA)
+                galeria.agregar(usuario.id, usuario.name, plantillas, usuario.access)
+            except FileNotFoundError:
+                pass    # todavía no existe: el primer proceso que la abra la crea desde la base
+
+        print(f"✔ Rostro registrado correctamente: {nombre} ({len(plantillas)} plantillas, "
+              f"calidad media {sum(calidades) / len(calidades):.2f})")
 
         cap.release()
         cv2.destroyAllWindows()
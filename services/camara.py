@@ -0,0 +1,235 @@
+import threading
+import time
+import cv2
+import numpy as np
+
+# ==========================
+#   PARÁMETROS POR DEFECTO
+# ==========================
+
+CAPACIDAD = 32          # frames guardados en el buffer circular
+ANCHO, ALTO, FPS = 640, 480, 30
+
+
+class FuenteSintetica:
+    """
+    Fuente de frames sin cámara (pruebas y benchmarks).
+    Imita la interfaz read() de cv2.VideoCapture.
+    """
+
+    def __init__(self, ancho=ANCHO, alto=ALTO, fps=FPS, max_frames=None, generador=None):
+        self.ancho = ancho
+        self.alto = alto
+        self.fps = fps
+        self.max_frames = max_frames
+        self.generador = generador
+        self._n = 0
+
+    def isOpened(self):
+        return self.max_frames is None or self._n < self.max_frames
+
+    def read(self):
+        if not self.isOpened():
+            return False, None
+        if self.generador is not None:
+            frame = self.generador(self._n)
+        else:
+            frame = np.full((self.alto, self.ancho, 3), self._n % 256, dtype=np.uint8)
+        self._n += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return 0
+
+    def release(self):
+        pass
+
+
+def abrir_fuente(fuente):
+    """
+    Abre una fuente de video:
+      - int            -> índice de cámara (DirectShow, 640x480@30)
+      - str            -> archivo de video o URL (RTSP/HTTP)
+      - objeto read()  -> se usa tal cual (FuenteSintetica, VideoCapture ya abierto)
+    """
+    if isinstance(fuente, int):
+        cap = cv2.VideoCapture(fuente, cv2.CAP_DSHOW)
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, ANCHO)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, ALTO)
+        cap.set(cv2.CAP_PROP_FPS, FPS)
+        return cap
+    if isinstance(fuente, str):
+        return cv2.VideoCapture(fuente)
+    return fuente
+
+
+def es_archivo(fuente):
+    return isinstance(fuente, str) and "://" not in fuente
+
+
+class CapturaCamara:
+    """
+    Hilo dedicado que es el único que lee del dispositivo.
+
+    Cada frame se publica en un buffer circular con número de secuencia y
+    timestamp. Cualquier número de consumidores puede leer los últimos N
+    frames sin bloquear al resto ni "robarse" frames entre sí.
+
+    Los frames publicados son compartidos: quien quiera dibujar sobre
+    ellos debe hacer frame.copy().
+    """
+
+    def __init__(self, fuente, capacidad=CAPACIDAD, repetir=True):
+        self.fuente = fuente
+        self.capacidad = capacidad
+        self.repetir = repetir      # archivos de video: volver al inicio al terminar
+
+        self._cap = abrir_fuente(fuente)
+        self._slots = [None] * capacidad     # (seq, timestamp, frame)
+        self._seq = -1
+        self._nuevo = threading.Condition()
+        self._activo = False
+        self._hilo = None
+
+        # Archivos y fuentes sintéticas se reproducen a su FPS nominal
+        fps = self._cap.get(cv2.CAP_PROP_FPS) if self._cap is not None else 0
+        self._periodo = 1.0 / fps if fps and not isinstance(fuente, int) else 0
+
+    def isOpened(self):
+        return self._cap is not None and self._cap.isOpened()
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._activo = True
+            self._hilo = threading.Thread(target=self._bucle, daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self):
+        self._activo = False
+        if self._hilo is not None:
+            self._hilo.join(timeout=2)
+            self._hilo = None
+        if self._cap is not None:
+            self._cap.release()
+        with self._nuevo:
+            self._nuevo.notify_all()
+
+    @property
+    def activo(self):
+        return self._activo
+
+    def _bucle(self):
+        siguiente = time.perf_counter()
+        while self._activo:
+            ret, frame = self._cap.read()
+            if not ret:
+                if es_archivo(self.fuente):
+                    if not self.repetir:
+                        break
+                    self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                if not self._cap.isOpened():
+                    break
+                time.sleep(0.005)
+                continue
+
+            self._publicar(frame)
+
+            if self._periodo:
+                siguiente += self._periodo
+                espera = siguiente - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                else:
+                    siguiente = time.perf_counter()
+
+        self._activo = False
+        with self._nuevo:
+            self._nuevo.notify_all()
+
+    def _publicar(self, frame):
+        seq = self._seq + 1
+        # Asignación de una tupla: los lectores ven el slot completo o el anterior
+        self._slots[seq % self.capacidad] = (seq, time.time(), frame)
+        with self._nuevo:
+            self._seq = seq
+            self._nuevo.notify_all()
+
+    # ==========================
+    #   LECTURA (sin bloqueo)
+    # ==========================
+
+    @property
+    def seq(self):
+        """Secuencia del último frame publicado (-1 si aún no hay)"""
+        return self._seq
+
+    def ultimo(self):
+        """(seq, timestamp, frame) más reciente, o None"""
+        ultimos = self.ultimos(1)
+        return ultimos[0] if ultimos else None
+
+    def ultimos(self, n, desde=None):
+        """
+        Hasta n frames más recientes en orden cronológico, opcionalmente
+        solo los posteriores a la secuencia `desde`.
+        """
+        fin = self._seq
+        inicio = max(fin - min(n, self.capacidad) + 1, 0)
+        if desde is not None:
+            inicio = max(inicio, desde + 1)
+
+        frames = []
+        for s in range(inicio, fin + 1):
+            slot = self._slots[s % self.capacidad]
+            # El slot pudo sobrescribirse mientras leíamos
+            if slot is not None and slot[0] == s:
+                frames.append(slot)
+        return frames
+
+    # ==========================
+    #   LECTURA (con espera)
+    # ==========================
+
+    def esperar(self, desde=-1, timeout=1.0):
+        """Espera un frame con seq > desde; retorna (seq, timestamp, frame) o None"""
+        with self._nuevo:
+            self._nuevo.wait_for(lambda: self._seq > desde or not self._activo, timeout)
+        if self._seq <= desde:
+            return None
+        return self.ultimo()
+
+    def siguientes(self, n, timeout=2.0):
+        """Espera y retorna los próximos n frames capturados a partir de ahora"""
+        desde = self._seq
+        limite = time.perf_counter() + timeout
+        with self._nuevo:
+            self._nuevo.wait_for(
+                lambda: self._seq >= desde + n or not self._activo,
+                max(limite - time.perf_counter(), 0)
+            )
+        return self.ultimos(n, desde=desde)
+
+    def rafaga(self, n, timeout=2.0):
+        """Los últimos n frames ya capturados; solo espera si aún no hay n (arranque)"""
+        with self._nuevo:
+            self._nuevo.wait_for(lambda: self._seq >= n - 1 or not self._activo, timeout)
+        return self.ultimos(n)
+
+    def flujo(self, max_frames, timeout=1.0):
+        """
+        Frames a medida que llegan: primero el más reciente y luego el
+        último publicado cada vez (si el consumidor es más lento que la
+        cámara se saltan frames intermedios en lugar de acumular retraso).
+        """
+        # Empezar por el último frame ya publicado (o esperar el primero)
+        seq = max(self._seq, 0) - 1
+        for _ in range(max_frames):
+            dato = self.esperar(desde=seq, timeout=timeout)
+            if dato is None:
+                return
+            seq = dato[0]
+            yield dato
@@ -0,0 +1,132 @@
+import time
+
+# ==========================
+#   PARÁMETROS POR DEFECTO
+# ==========================
+
+UMBRAL_RECONOCIDO = 0.55    # distancia máxima para considerar una coincidencia
+UMBRAL_SEGURO = 0.35        # una sola coincidencia por debajo de esto basta
+UMBRAL_DESCONOCIDO = 0.75   # distancia a partir de la cual el frame es claramente ajeno
+MIN_ACUERDO = 2             # frames que deben coincidir en el mismo usuario
+MIN_RECHAZO = 3             # frames claramente desconocidos para rechazar
+MAX_FRAMES = 10             # presupuesto máximo de frames por autenticación
+LOTE = 1                    # frames por llamada a ArcFace (1 = decidir cuanto antes)
+
+
+class PoliticaDecision:
+    """
+    Decisión incremental de autenticación.
+
+    Recibe los resultados frame a frame y marca `decidido` en cuanto el
+    resultado ya no puede cambiar razonablemente:
+      - una coincidencia muy cercana (< umbral_seguro), o
+      - `min_acuerdo` frames reconocidos como el mismo usuario, o
+      - `min_rechazo` frames claramente desconocidos, o
+      - se agotó el presupuesto de `max_frames`.
+
+    Un frame claramente desconocido descarta los votos y los mejores
+    resultados acumulados hasta ese momento: solo cuenta lo que viene
+    después.
+    """
+
+    def __init__(self, umbral_reconocido=UMBRAL_RECONOCIDO, umbral_seguro=UMBRAL_SEGURO,
+                 umbral_desconocido=UMBRAL_DESCONOCIDO, min_acuerdo=MIN_ACUERDO,
+                 min_rechazo=MIN_RECHAZO, max_frames=MAX_FRAMES, lote=LOTE):
+        self.umbral_reconocido = umbral_reconocido
+        self.umbral_seguro = umbral_seguro
+        self.umbral_desconocido = umbral_desconocido
+        self.min_acuerdo = min_acuerdo
+        self.min_rechazo = min_rechazo
+        self.max_frames = max_frames
+        self.lote = lote
+
+        self.frames = 0
+        self.motivo = None
+        self._votos = {}
+        self._rechazos = 0
+        self._mejor = None          # mejor resultado global
+        self._mejor_de = {}         # mejor resultado por usuario
+        self._elegido = None
+        self._tiempos = {}
+
+    @property
+    def decidido(self):
+        return self.motivo is not None
+
+    def agregar(self, usuario, distancia, acceso):
+        """Registra el resultado de un frame con rostro"""
+        if self.decidido:
+            return
+        self.frames += 1
+        resultado = {'usuario': usuario, 'distancia': float(distancia), 'acceso': bool(acceso)}
+
+        if self._mejor is None or distancia < self._mejor['distancia']:
+            self._mejor = resultado
+        previo = self._mejor_de.get(usuario)
+        if previo is None or distancia < previo['distancia']:
+            self._mejor_de[usuario] = resultado
+
+        if distancia < self.umbral_seguro:
+            self._decidir('coincidencia_segura', usuario)
+        elif distancia < self.umbral_reconocido:
+            self._votos[usuario] = self._votos.get(usuario, 0) + 1
+            if self._votos[usuario] >= self.min_acuerdo:
+                self._decidir('acuerdo', usuario)
+        elif distancia > self.umbral_desconocido:
+            # Un frame claramente ajeno contradice las coincidencias débiles
+            # anteriores: se descartan para no aceptar con evidencia de otro frame
+            self._votos.clear()
+            self._mejor_de = {usuario: resultado}
+            self._mejor = resultado
+            self._rechazos += 1
+            if self._rechazos >= self.min_rechazo:
+                self._decidir('desconocido')
+
+        self._revisar_presupuesto()
+
+    def agregar_sin_rostro(self):
+        """Registra un frame en el que no se detectó rostro"""
+        if self.decidido:
+            return
+        self.frames += 1
+        self._revisar_presupuesto()
+
+    def _revisar_presupuesto(self):
+        if not self.decidido and self.frames >= self.max_frames:
+            self._decidir('presupuesto')
+
+    def _decidir(self, motivo, usuario=None):
+        self.motivo = motivo
+        self._elegido = usuario
+
+    def resultado(self):
+        """Mejor resultado (dict usuario/distancia/acceso) o None si nunca hubo rostro"""
+        if self._elegido is not None:
+            return self._mejor_de[self._elegido]
+        return self._mejor
+
+    # ==========================
+    #   TIEMPOS POR ETAPA
+    # ==========================
+
+    def medir(self, etapa):
+        """Context manager que acumula el tiempo de una etapa (ms)"""
+        return _Cronometro(self._tiempos, etapa)
+
+    def tiempos(self):
+        return {etapa: round(ms, 2) for etapa, ms in self._tiempos.items()}
+
+
+class _Cronometro:
+    def __init__(self, tiempos, etapa):
+        self.tiempos = tiempos
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self.t0) * 1000
+        self.tiempos[self.etapa] = self.tiempos.get(self.etapa, 0.0) + ms
+        return False
@@ -0,0 +1,291 @@
+import collections
+import threading
+import time
+import cv2
+from services.camara import abrir_fuente, es_archivo
+from services.face_recognizer import CacheGaleria, GaleriaCompartida
+from services.tracking import EstadoTrack, CacheIdentidad, INTERVALO
+
+# ==========================
+#   PARÁMETROS POR DEFECTO
+# ==========================
+
+CAPACIDAD = 2       # paquetes en espera entre dos etapas (más = más latencia)
+ETAPAS = ("captura", "deteccion", "embedding", "render")
+
+
+class Canal:
+    """
+    Cola acotada entre dos etapas. Si está llena, `poner` descarta el
+    paquete más viejo (la etapa siguiente siempre recibe lo más reciente)
+    o, con `bloquear=True`, espera a que haya lugar (video procesado sin
+    pérdidas). `tomar` retorna None cuando el canal se cerró y quedó vacío.
+    """
+
+    def __init__(self, capacidad=CAPACIDAD, bloquear=False):
+        self.capacidad = capacidad
+        self.bloquear = bloquear
+        self.descartados = 0
+        self._cola = collections.deque()
+        self._cond = threading.Condition()
+        self._cerrado = False
+
+    def poner(self, paquete):
+        with self._cond:
+            if self.bloquear:
+                self._cond.wait_for(lambda: len(self._cola) < self.capacidad or self._cerrado)
+            elif len(self._cola) >= self.capacidad:
+                self._cola.popleft()
+                self.descartados += 1
+            if self._cerrado:
+                return
+            self._cola.append(paquete)
+            self._cond.notify_all()
+
+    def tomar(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._cola or self._cerrado)
+            if not self._cola:
+                return None
+            paquete = self._cola.popleft()
+            self._cond.notify_all()
+            return paquete
+
+    def cerrar(self):
+        with self._cond:
+            self._cerrado = True
+            self._cond.notify_all()
+
+
+class Paquete:
+    """Un frame y lo que cada etapa le fue agregando"""
+
+    def __init__(self, seq, frame):
+        self.seq = seq
+        self.frame = frame
+        self.t_captura = time.perf_counter()
+        self.detectado = False      # en este frame corrió YOLO
+        self.cajas = []             # [(caja, conf)] detectadas
+        self.track_id = None
+        self.rostros = None         # resultado de identify(); None = sin recalcular
+
+
+class _Contador:
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.maximo = 0.0
+
+    def agregar(self, segundos):
+        self.n += 1
+        self.total += segundos
+        self.maximo = max(self.maximo, segundos)
+
+    def resumen(self):
+        if not self.n:
+            return {'frames': 0, 'media_ms': None, 'max_ms': None}
+        return {'frames': self.n, 'media_ms': round(self.total / self.n * 1000, 2),
+                'max_ms': round(self.maximo * 1000, 2)}
+
+
+class ReconocimientoEtapas:
+    """
+    Reconocimiento de una fuente en etapas que corren a la vez:
+
+        captura → [canal] → detección → [canal] → embedding → [canal] → render
+
+    Captura, detección (YOLO + tracking) y embedding (ArcFace + galería)
+    tienen cada una su hilo; ONNX Runtime suelta el GIL, así que las
+    inferencias de frames distintos se solapan y el FPS queda limitado
+    por la etapa más lenta y no por la suma. El render es quien consume
+    `resultados()` (p.ej. el hilo principal con cv2.imshow).
+
+    Los canales son cortos y descartan el paquete más viejo: bajo carga
+    se pierden frames en lugar de acumular retraso. Con `tiempo_real=False`
+    (solo archivos) el video se lee tan rápido como lo aceptan las etapas
+    y ningún frame se descarta.
+
+    `todas=True` identifica todos los rostros del frame (modo lobby); si
+    no, solo el principal, con ROI de tracking y reutilización del
+    embedding como en el bucle de reconocer.py.
+    """
+
+    def __init__(self, fuente, pipeline, galeria, todas=False, capacidad=CAPACIDAD, tiempo_real=True,
+                 intervalo=INTERVALO):
+        self.fuente = fuente
+        self.pipeline = pipeline
+        self.galeria = galeria      # Galeria, CacheGaleria o GaleriaCompartida
+        self.todas = todas
+        self.tiempo_real = tiempo_real or not es_archivo(fuente)
+
+        bloquear = not self.tiempo_real
+        self._a_deteccion = Canal(capacidad, bloquear)
+        self._a_embedding = Canal(capacidad, bloquear)
+        self._a_render = Canal(capacidad, bloquear)
+
+        self.track = EstadoTrack(intervalo=intervalo)
+        self.identidades = CacheIdentidad()
+        self._contadores = {etapa: _Contador() for etapa in ETAPAS}
+        self._latencia = _Contador()    # captura → fin del render
+        self._activo = False
+        self._hilos = []
+        self._inicio = None
+
+    def iniciar(self):
+        self._activo = True
+        self._inicio = time.perf_counter()
+        for nombre, destino in (("captura", self._capturar), ("deteccion", self._detectar),
+                                ("embedding", self._embeber)):
+            hilo = threading.Thread(target=destino, name=nombre, daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+        return self
+
+    def detener(self):
+        self._activo = False
+        for canal in (self._a_deteccion, self._a_embedding, self._a_render):
+            canal.cerrar()
+        for hilo in self._hilos:
+            hilo.join(timeout=5)
+        self._hilos = []
+
+    def resultados(self):
+        """
+        Paquetes listos para dibujar, en orden. El tiempo que el
+        consumidor tarda con cada uno se cuenta como la etapa de render.
+        Termina cuando se acaba la fuente o se llama a detener().
+        """
+        while True:
+            paquete = self._a_render.tomar()
+            if paquete is None:
+                return
+            t0 = time.perf_counter()
+            yield paquete
+            ahora = time.perf_counter()
+            self._contadores["render"].agregar(ahora - t0)
+            self._latencia.agregar(ahora - paquete.t_captura)
+
+    def estadisticas(self):
+        """Por etapa: frames, latencia media/máxima y descartados a su entrada; más FPS y latencia total"""
+        etapas = {etapa: contador.resumen() for etapa, contador in self._contadores.items()}
+        for etapa, canal in (("deteccion", self._a_deteccion), ("embedding", self._a_embedding),
+                             ("render", self._a_render)):
+            etapas[etapa]['descartados'] = canal.descartados
+
+        renderizados = self._contadores["render"].n
+        segundos = time.perf_counter() - self._inicio if self._inicio else 0
+        return {
+            'etapas': etapas,
+            'fps': round(renderizados / segundos, 1) if segundos else None,
+            'latencia_total': self._latencia.resumen(),
+        }
+
+    # ==========================
+    #   ETAPAS
+    # ==========================
+
+    def _galeria_actual(self):
+        if isinstance(self.galeria, (CacheGaleria, GaleriaCompartida)):
+            return self.galeria.galeria
+        return self.galeria
+
+    def _capturar(self):
+        cap = abrir_fuente(self.fuente)
+        archivo = es_archivo(self.fuente)
+        # Como CapturaCamara: archivos y fuentes sintéticas a su FPS nominal
+        fps = cap.get(cv2.CAP_PROP_FPS) if self.tiempo_real and not isinstance(self.fuente, int) else 0
+        periodo = 1.0 / fps if fps else 0
+        siguiente = time.perf_counter()
+        seq = 0
+
+        try:
+            while self._activo:
+                t0 = time.perf_counter()
+                ret, frame = cap.read()
+                if not ret:
+                    if archivo or not cap.isOpened():
+                        break
+                    time.sleep(0.005)
+                    continue
+                self._contadores["captura"].agregar(time.perf_counter() - t0)
+                self._a_deteccion.poner(Paquete(seq, frame))
+                seq += 1
+
+                if periodo:
+                    siguiente += periodo
+                    espera = siguiente - time.perf_counter()
+                    if espera > 0:
+                        time.sleep(espera)
+                    else:
+                        siguiente = time.perf_counter()
+        finally:
+            cap.release()
+            self._a_deteccion.cerrar()
+
+    def _detectar(self):
+        try:
+            while True:
+                paquete = self._a_deteccion.tomar()
+                if paquete is None:
+                    return
+                t0 = time.perf_counter()
+                if self.track.debe_detectar():
+                    paquete.detectado = True
+                    if self.todas:
+                        cajas, confs, best_box, _ = self.pipeline.detect(paquete.frame)
+                        if best_box is not None:
+                            paquete.cajas = [(tuple(int(v) for v in caja), float(conf))
+                                             for caja, conf in zip(cajas, confs)]
+                    else:
+                        caja = self.track.detectar(self.pipeline, paquete.frame)
+                        paquete.track_id = self.track.id
+                        if caja is not None:
+                            paquete.cajas = [(caja, None)]
+                self._contadores["deteccion"].agregar(time.perf_counter() - t0)
+                self._a_embedding.poner(paquete)
+        finally:
+            self._a_embedding.cerrar()
+
+    def _embeber(self):
+        try:
+            while True:
+                paquete = self._a_embedding.tomar()
+                if paquete is None:
+                    return
+                t0 = time.perf_counter()
+                if paquete.detectado:
+                    paquete.rostros = self._identificar(paquete)
+                self._contadores["embedding"].agregar(time.perf_counter() - t0)
+                self._a_render.poner(paquete)
+        finally:
+            self._a_render.cerrar()
+
+    def _identificar(self, paquete):
+        galeria = self._galeria_actual()
+
+        if not paquete.cajas:
+            if paquete.track_id is not None:
+                self.identidades.olvidar(paquete.track_id)
+            return []
+
+        if self.todas:
+            cajas = [caja for caja, _ in paquete.cajas]
+            embeddings = self.pipeline.embed([self.pipeline.recortar(paquete.frame, caja) for caja in cajas])
+            resultados = galeria.identificar_lote(embeddings)
+        else:
+            # Rostro principal: se reutiliza el embedding si la caja casi no se movió
+            caja = paquete.cajas[0][0]
+            embedding = self.identidades.obtener(paquete.track_id, caja)
+            if embedding is None:
+                embedding = self.pipeline.embed([self.pipeline.recortar(paquete.frame, caja)])[0]
+                resultado = galeria.identificar(embedding)
+                self.identidades.guardar(paquete.track_id, caja, embedding, resultado)
+            else:
+                resultado = galeria.identificar(embedding)
+                self.identidades.actualizar_resultado(paquete.track_id, resultado)
+            resultados = [resultado]
+
+        return [
+            {'caja': caja, 'conf': conf, 'usuario': usuario, 'distancia': distancia, 'acceso': acceso}
+            for (caja, conf), (usuario, distancia, acceso) in zip(paquete.cajas, resultados)
+        ]
@@ -1,11 +1,504 @@
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
 import numpy as np
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
+from core.config import Settings
 from core.models import Usuario
 
+DIM = 512
+LOTE_CARGA = 2000       # filas por lote al leer la base (yield_per)
+BLOQUE_DISTANCIAS = 16384   # filas por bloque al comparar contra una matriz float16
+CANDIDATOS_ANN = 10     # usuarios que se piden al índice ANN para re-ordenar con todas sus plantillas
+
+
+class Galeria:
+    """
+    Base de usuarios en memoria para matching vectorizado.
+
+    Todos los embeddings se guardan L2-normalizados en una sola matriz
+    float32 contigua (N,D), con arrays paralelos de ids, nombres y accesos.
+    La distancia coseno contra toda la base es un único producto matriz-vector,
+    o una búsqueda aproximada si se le asigna un índice ANN.
+
+    Un usuario puede tener varias plantillas (services/plantillas.py): son
+    filas consecutivas con el mismo id, nombre y acceso. Su distancia es la
+    menor entre sus plantillas, reducida por usuario sobre el mismo GEMM.
+    El índice ANN guarda solo la primera (la media ponderada): sus
+    candidatos se re-ordenan con la distancia exacta a todas sus plantillas.
+
+    Las galerías que publica CacheGaleria son vistas de solo lectura sobre
+    un buffer compartido; `vivos` marca las filas dadas de baja. Las que
+    abre GaleriaCompartida son vistas sobre un np.memmap y su matriz puede
+    ser float16.
+
+    Los diccionarios nombre → filas e id → filas guardan el historial de
+    filas de cada clave (una tupla); vale la última que esta galería tiene
+    y sigue viva.
+    """
+
+    def __init__(self, ids, nombres, embeddings, accesos, normalizada=False):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.nombres = np.asarray(nombres, dtype=object)
+        self.accesos = np.asarray(accesos, dtype=bool)
+
+        # normalizada=True: la matriz ya viene float32 L2-normalizada y se usa sin copiar
+        matriz = np.asarray(embeddings, dtype=np.float32)
+        self.matriz = np.ascontiguousarray(matriz if normalizada else normalizar(matriz))
+        self._vivos = None
+
+        self._posicion = {n: (i,) for i, n in enumerate(self.nombres)}
+        self._fila_por_id = {i: (f,) for f, i in enumerate(self.ids.tolist())}
+        self._n_vivos = len(self._fila_por_id)
+        self._inicios = False   # sin calcular (ver _inicios_por_usuario)
+
+        # Índice aproximado opcional (services/indice_ann); None = búsqueda exacta
+        self.indice = None
+
+    @classmethod
+    def _vista(cls, ids, nombres, matriz, accesos, vivos, posicion, fila_por_id, indice,
+               bajas=None, version=0):
+        """
+        Galería sobre arrays ya normalizados, sin copiarlos. Con `bajas`
+        (versión en la que murió cada fila) las filas vivas son las que
+        murieron después de `version`, y se calculan al primer uso.
+        """
+        galeria = cls.__new__(cls)
+        galeria.ids = ids
+        galeria.nombres = nombres
+        galeria.matriz = matriz
+        galeria.accesos = accesos
+        galeria._vivos = vivos if bajas is None else False
+        galeria._bajas = bajas
+        galeria._version = version
+        galeria._posicion = posicion
+        galeria._fila_por_id = fila_por_id
+        galeria._n_vivos = None     # se cuentan al primer uso
+        galeria._inicios = False
+        galeria.indice = indice
+        return galeria
+
+    @property
+    def vivos(self):
+        """Máscara de filas vivas, o None si lo están todas"""
+        if self._vivos is False:
+            vivos = self._bajas > self._version
+            self._vivos = None if vivos.all() else vivos
+        return self._vivos
+
+    def __len__(self):
+        """Usuarios vivos (no filas: un usuario puede tener varias plantillas)"""
+        if self._n_vivos is None:
+            ids = self.ids if self.vivos is None else self.ids[self.vivos]
+            self._n_vivos = len(np.unique(ids))
+        return self._n_vivos
+
+    def _inicios_por_usuario(self):
+        """Primera fila de cada usuario, o None si todos tienen una sola plantilla"""
+        if self._inicios is False:
+            # Filas dadas de baja junto a las nuevas del mismo usuario (baja + alta) van aparte
+            distintas = self.ids[1:] != self.ids[:-1]
+            if self.vivos is not None:
+                distintas |= self.vivos[1:] != self.vivos[:-1]
+            cambios = np.flatnonzero(distintas) + 1
+            self._inicios = None if len(cambios) == len(self.ids) - 1 else \
+                np.concatenate([[0], cambios]).astype(np.intp)
+        return self._inicios
+
+    def __contains__(self, nombre):
+        return self._fila(self._posicion.get(nombre)) is not None
+
+    def _fila(self, filas):
+        """De las `filas` de una clave, la última que pertenece a esta galería y sigue viva (o None)"""
+        if filas is None:
+            return None
+        vivos = self.vivos
+        for fila in reversed(filas):
+            if fila < len(self.ids) and (vivos is None or vivos[fila]):
+                return fila
+        return None
+
+    def keys(self):
+        nombres = self.nombres if self.vivos is None else self.nombres[self.vivos]
+        return list(dict.fromkeys(nombres))
+
+    def distancias(self, embeddings):
+        """Distancia coseno (B,N) de uno o varios embeddings contra toda la base (un GEMM)"""
+        q = normalizar(np.atleast_2d(np.asarray(embeddings, dtype=np.float32)))
+        if self.matriz.dtype == np.float32:
+            dist = 1.0 - q @ self.matriz.T
+        else:
+            # float16 (instantánea compacta): por bloques, sin una copia float32 de toda la matriz
+            dist = np.empty((len(q), len(self.matriz)), dtype=np.float32)
+            for i in range(0, len(self.matriz), BLOQUE_DISTANCIAS):
+                bloque = self.matriz[i:i + BLOQUE_DISTANCIAS].astype(np.float32)
+                dist[:, i:i + BLOQUE_DISTANCIAS] = 1.0 - q @ bloque.T
+        if self.vivos is not None:
+            dist[:, ~self.vivos] = np.inf
+        return dist
+
+    def buscar(self, embedding, k=1):
+        """Top-k usuarios más cercanos: lista de (nombre, distancia, acceso)"""
+        return self.buscar_lote(embedding, k)[0]
+
+    def buscar_lote(self, embeddings, k=1):
+        """Top-k para un lote de embeddings (B,D): una lista de resultados por probe"""
+        embeddings = np.atleast_2d(embeddings)
+        if len(self) == 0:
+            return [[] for _ in range(len(embeddings))]
+
+        if self.indice is not None:
+            filas = [self._buscar_ann(q, k) for q in embeddings]
+        else:
+            filas = self._buscar_exacto(embeddings, k)
+
+        return [
+            [(self.nombres[j], float(d), bool(self.accesos[j])) for j, d in zip(*fila)]
+            for fila in filas
+        ]
+
+    def _buscar_exacto(self, embeddings, k):
+        dist = self.distancias(embeddings)
+        inicios = self._inicios_por_usuario()
+        if inicios is not None:
+            # Varias plantillas: la menor distancia de cada usuario (B,U) y su primera fila
+            dist = np.minimum.reduceat(dist, inicios, axis=1)
+        k = min(k, len(self))
+        n_filas = dist.shape[1]
+
+        if k < n_filas:
+            top = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(n_filas), dist.shape)
+        top_dist = np.take_along_axis(dist, top, axis=1)
+        orden = np.argsort(top_dist, axis=1, kind="stable")
+        top = np.take_along_axis(top, orden, axis=1)
+        top_dist = np.take_along_axis(top_dist, orden, axis=1)
+        if inicios is not None:
+            top = inicios[top]
+
+        return list(zip(top, top_dist))
+
+    def _buscar_ann(self, embedding, k):
+        plantillas = self._inicios_por_usuario() is not None
+        ids, dist = self.indice.buscar(embedding, max(k, CANDIDATOS_ANN) if plantillas else k)
+        filas = [self._fila(self._fila_por_id.get(i)) for i in ids.tolist()]
+        validos = [n for n, f in enumerate(filas) if f is not None]
+
+        # Fallback exacto si las celdas revisadas no aportan candidatos
+        if not validos:
+            return self._buscar_exacto(embedding, k)[0]
+        filas, dist = np.array([filas[n] for n in validos], dtype=np.intp), dist[validos]
+
+        if plantillas:
+            # El índice solo conoce la primera plantilla: distancia exacta a todas las del candidato
+            q = normalizar(np.asarray(embedding, dtype=np.float32).reshape(-1))
+            dist = np.array([1.0 - np.max(self.matriz[self._bloque_de(f)].astype(np.float32) @ q)
+                             for f in filas.tolist()], dtype=np.float32)
+            orden = np.argsort(dist, kind="stable")[:k]
+            filas, dist = filas[orden], dist[orden]
+        return filas, dist
+
+    def _bloque_de(self, fila):
+        """Filas vivas consecutivas del usuario de `fila` (sus plantillas)"""
+        vivos, id_usuario = self.vivos, self.ids[fila]
+
+        def mismo(f):
+            return 0 <= f < len(self.ids) and self.ids[f] == id_usuario and (vivos is None or vivos[f])
+
+        inicio, fin = fila, fila + 1
+        while mismo(inicio - 1):
+            inicio -= 1
+        while mismo(fin):
+            fin += 1
+        return slice(inicio, fin)
+
+    def identificar(self, embedding):
+        """Mejor coincidencia (nombre, distancia, acceso); DESCONOCIDO si la base está vacía"""
+        return self.identificar_lote(embedding)[0]
+
+    def identificar_lote(self, embeddings):
+        resultados = self.buscar_lote(embeddings, k=1)
+        return [r[0] if r else ("DESCONOCIDO", 1e9, False) for r in resultados]
+
+
+VIVA = np.iinfo(np.int64).max   # versión de baja de una fila que sigue viva
+
+
+class CacheGaleria:
+    """
+    Galería en memoria con altas, bajas y cambios de acceso incrementales.
+
+    Los lectores (authenticate, reconocer) toman `cache.galeria`: una
+    instantánea inmutable que se publica con una sola asignación, así que
+    nunca necesitan el lock. Los escritores se serializan con un lock y
+    nunca modifican lo que una instantánea publicada ve:
+
+      - las altas escriben al final de buffers con capacidad de sobra,
+        en filas que ninguna instantánea tiene todavía; al llenarse se
+        compactan y se duplica la capacidad (O(1) amortizado). Un alta
+        con varias plantillas ocupa filas consecutivas
+      - una baja anota la versión en la que murió cada fila; cada
+        instantánea tiene su versión y no ve las bajas posteriores
+      - un cambio de acceso es la baja de las filas del usuario más el
+        alta de sus mismas plantillas (O(plantillas), no O(N))
+      - los diccionarios nombre/id → filas solo agregan filas al
+        historial de cada clave, con una asignación por cambio
+
+    Reemplazar un usuario (agregar un id que ya existe) publica una sola
+    instantánea, con las filas viejas muertas y las nuevas vivas. Las
+    filas muertas se compactan cuando son más de la mitad.
+    """
+
+    def __init__(self, galeria, indice=None):
+        self._lock = threading.Lock()
+        self._indice = indice
+        self._version = 0
+        self._reservar(galeria, capacidad=max(16, 2 * len(galeria.ids)))
+        self._publicar()
+
+    @property
+    def galeria(self):
+        return self._galeria
+
+    def _reservar(self, galeria, capacidad):
+        """Copia las filas vivas de `galeria` a buffers nuevos de `capacidad` filas (sin publicar)"""
+        vivas = np.ones(len(galeria.ids), dtype=bool) if galeria.vivos is None else galeria.vivos
+        n = int(np.count_nonzero(vivas))
+
+        self._matriz = np.zeros((capacidad, galeria.matriz.shape[1]), dtype=np.float32)
+        self._ids = np.zeros(capacidad, dtype=np.int64)
+        self._nombres = np.empty(capacidad, dtype=object)
+        self._accesos = np.zeros(capacidad, dtype=bool)
+        self._bajas = np.full(capacidad, VIVA, dtype=np.int64)
+        self._matriz[:n] = galeria.matriz[vivas]
+        self._ids[:n] = galeria.ids[vivas]
+        self._nombres[:n] = galeria.nombres[vivas]
+        self._accesos[:n] = galeria.accesos[vivas]
+        self._n = n
+        self._vivas = n
+
+        # Filas de cada usuario (solo del escritor) e historiales para los lectores
+        self._bloque = {}
+        for f, i in enumerate(self._ids[:n].tolist()):
+            inicio, k = self._bloque.get(i, (f, 0))
+            self._bloque[i] = (inicio, k + 1)
+        self._fila_por_id = {i: (inicio,) for i, (inicio, _) in self._bloque.items()}
+        self._posicion = {self._nombres[inicio]: (inicio,) for inicio, _ in self._bloque.values()}
+
+    def _publicar(self):
+        n = self._n
+        self._galeria = Galeria._vista(
+            self._ids[:n], self._nombres[:n], self._matriz[:n], self._accesos[:n], None,
+            self._posicion, self._fila_por_id, self._indice,
+            bajas=self._bajas[:n], version=self._version
+        )
+
+    def recargar(self, galeria):
+        """Reemplaza toda la galería (p.ej. tras una importación masiva)"""
+        with self._lock:
+            self._version += 1
+            self._reservar(galeria, capacidad=max(16, 2 * len(galeria.ids)))
+            self._publicar()
+
+    def agregar(self, id_usuario, nombre, embedding, acceso):
+        """`embedding`: un vector (D,) o las plantillas (K,D) del usuario"""
+        embs = normalizar(np.asarray(embedding, dtype=np.float32).reshape(-1, self._matriz.shape[1]))
+        with self._lock:
+            self._version += 1
+            self._matar(id_usuario)
+            self._escribir(id_usuario, nombre, embs, acceso)
+            if self._indice is not None:
+                self._indice.agregar(id_usuario, embs[0])
+            self._publicar()
+
+    def eliminar(self, id_usuario):
+        with self._lock:
+            if id_usuario not in self._bloque:
+                return
+            self._version += 1
+            self._matar(id_usuario)
+            if self._indice is not None:
+                self._indice.eliminar(id_usuario)
+            self._publicar()
+
+            # Compactar cuando más de la mitad de las filas están dadas de baja
+            if self._n > 16 and self._vivas < self._n // 2:
+                self._reservar(self._galeria, capacidad=len(self._matriz))
+                self._publicar()
+
+    def actualizar_acceso(self, id_usuario, acceso):
+        with self._lock:
+            bloque = self._bloque.get(id_usuario)
+            if bloque is None:
+                return
+            inicio, k = bloque
+            if bool(self._accesos[inicio]) == bool(acceso):
+                return
+            # Las filas publicadas no se tocan: mismas plantillas en filas nuevas
+            embs = self._matriz[inicio:inicio + k].copy()
+            self._version += 1
+            self._matar(id_usuario)
+            self._escribir(id_usuario, self._nombres[inicio], embs, acceso)
+            self._publicar()
+
+    def _matar(self, id_usuario):
+        """Marca las filas del usuario como muertas en la versión actual (sin publicar)"""
+        bloque = self._bloque.pop(id_usuario, None)
+        if bloque is not None:
+            inicio, k = bloque
+            self._bajas[inicio:inicio + k] = self._version
+            self._vivas -= k
+
+    def _escribir(self, id_usuario, nombre, embs, acceso):
+        """Escribe las plantillas al final de los buffers (sin publicar)"""
+        k = len(embs)
+        if self._n + k > len(self._matriz):
+            # Sin espacio: compactar (solo las filas vivas de la versión actual) y duplicar capacidad
+            self._reservar(self._estado_actual(), capacidad=2 * (self._vivas + k) + 16)
+
+        f = self._n
+        self._matriz[f:f + k] = embs
+        self._ids[f:f + k] = id_usuario
+        self._nombres[f:f + k] = nombre
+        self._accesos[f:f + k] = bool(acceso)
+        self._n += k
+        self._vivas += k
+        self._bloque[id_usuario] = (f, k)
+        # Tuplas nuevas con una sola asignación: un lector nunca ve un historial a medias
+        self._fila_por_id[id_usuario] = self._fila_por_id.get(id_usuario, ()) + (f,)
+        self._posicion[nombre] = self._posicion.get(nombre, ()) + (f,)
+
+    def _estado_actual(self):
+        """Galería (sin publicar) con las bajas ya anotadas en la versión en curso"""
+        n = self._n
+        return Galeria._vista(self._ids[:n], self._nombres[:n], self._matriz[:n], self._accesos[:n], None,
+                              {}, {}, None, bajas=self._bajas[:n], version=self._version)
+
+
+def normalizar(x):
+    norma = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norma, 1e-12)
+
+
+# ==========================
+#   FORMATO DEL EMBEDDING
+# ==========================
+#
+# Usuario.embedding = cabecera de 8 bytes + vector L2-normalizado:
+#   "FEMB" | versión (u8) | dtype (u8: 1=float32, 2=float16) | dimensión (u16)
+# Con varias plantillas (versión 2) la cabecera ocupa 12 bytes y sigue la
+# matriz (K,D):
+#   "FEMB" | 2 | dtype | dimensión | plantillas (u16) | 2 bytes de relleno
+# Los registros antiguos (solo los bytes float32, sin cabecera ni
+# normalizar) se siguen leyendo; tools/migrar_embeddings.py los convierte.
+
+MAGIA = b"FEMB"
+VERSION_EMBEDDING = 1
+VERSION_PLANTILLAS = 2
+CABECERA = struct.Struct("<4sBBH")
+CABECERA_PLANTILLAS = struct.Struct("<4sBBHH2x")
+DTYPES = {1: np.dtype(np.float32), 2: np.dtype(np.float16)}
+CODIGOS = {dt.name: codigo for codigo, dt in DTYPES.items()}
+
+
+def codificar_embedding(embedding, dtype=None):
+    """
+    Vector (D,) o plantillas (K,D) -> bytes con cabecera, normalizados y en
+    `dtype` (Settings.EMBEDDING_DTYPE). Una sola plantilla usa la versión 1.
+    """
+    dtype = np.dtype(dtype or Settings.EMBEDDING_DTYPE)
+    if dtype.name not in CODIGOS:
+        raise ValueError(f"dtype de embedding no soportado: {dtype}")
+    embedding = np.asarray(embedding, dtype=np.float32)
+    plantillas = normalizar(embedding.reshape(-1, embedding.shape[-1]))
+    cantidad, dimension = plantillas.shape
+    if cantidad == 1:
+        cabecera = CABECERA.pack(MAGIA, VERSION_EMBEDDING, CODIGOS[dtype.name], dimension)
+    else:
+        cabecera = CABECERA_PLANTILLAS.pack(MAGIA, VERSION_PLANTILLAS, CODIGOS[dtype.name], dimension, cantidad)
+    return cabecera + plantillas.astype(dtype).tobytes()
+
+
+def formato_embedding(blob, dim=DIM):
+    """
+    (offset, dtype, dimensión, normalizado, plantillas) de un blob. Lanza
+    ValueError si la cabecera no es válida o la dimensión no coincide con `dim`.
+    """
+    if blob[:4] == MAGIA:
+        _, version, codigo, dimension = CABECERA.unpack_from(blob)
+        if version == VERSION_EMBEDDING and codigo in DTYPES:
+            formato = (CABECERA.size, DTYPES[codigo], dimension, True, 1)
+        elif version == VERSION_PLANTILLAS and codigo in DTYPES:
+            cantidad = CABECERA_PLANTILLAS.unpack_from(blob)[4]
+            formato = (CABECERA_PLANTILLAS.size, DTYPES[codigo], dimension, True, cantidad)
+        else:
+            raise ValueError(f"Embedding con versión {version} / dtype {codigo} desconocidos")
+    elif len(blob) == dim * 4:
+        formato = (0, DTYPES[1], dim, False, 1)    # formato antiguo
+    else:
+        raise ValueError(f"Embedding sin cabecera de {len(blob)} bytes (se esperaban {dim * 4})")
+
+    offset, dtype, dimension, _, cantidad = formato
+    if dimension != dim or cantidad < 1 or len(blob) != offset + cantidad * dimension * dtype.itemsize:
+        raise ValueError(f"Embedding de dimensión {dimension} y {len(blob)} bytes (se esperaba {dim})")
+    return formato
+
+
+def decodificar_embedding(blob, dim=DIM):
+    """bytes -> vector (D,) o plantillas (K,D) float32 normalizados, según cómo se guardó"""
+    offset, dtype, dimension, normalizado, cantidad = formato_embedding(blob, dim)
+    vector = np.frombuffer(blob, dtype=dtype, count=cantidad * dimension, offset=offset).astype(np.float32)
+    if cantidad > 1:
+        vector = vector.reshape(cantidad, dimension)
+    return vector if normalizado else normalizar(vector)
+
+
+def _formato_lote(blobs, dim=DIM):
+    """
+    (formato común o None, plantillas de cada blob). Si todos comparten
+    cabecera y largo (lo normal) el formato se lee una sola vez.
+    """
+    formato = formato_embedding(blobs[0], dim)
+    offset = formato[0]
+    cabecera = bytes(blobs[0][:offset])
+    largo = len(blobs[0])
+    if all(len(b) == largo and b[:offset] == cabecera for b in blobs):
+        return formato, np.full(len(blobs), formato[4], dtype=np.int64)
+    return None, np.array([formato_embedding(b, dim)[4] for b in blobs], dtype=np.int64)
+
+
+def _decodificar_lote(blobs, destino, formato=None):
+    """
+    Escribe las plantillas de `blobs`, en orden, en las filas de `destino`
+    (float32). Con un formato común (ver _formato_lote) se decodifican de
+    una vez con un dtype estructurado sobre los bytes concatenados.
+    """
+    dim = destino.shape[1]
+    if formato is not None:
+        offset, dtype, _, normalizado, cantidad = formato
+        campos = [("emb", dtype, (cantidad, dim))]
+        registro = np.dtype([("cabecera", f"V{offset}")] + campos) if offset else np.dtype(campos)
+        destino[:] = np.frombuffer(b"".join(blobs), dtype=registro)["emb"].reshape(-1, dim)
+        if not normalizado:
+            destino[:] = normalizar(destino)
+        return
+
+    fila = 0
+    for blob in blobs:
+        plantillas = np.atleast_2d(decodificar_embedding(blob, dim))
+        destino[fila:fila + len(plantillas)] = plantillas
+        fila += len(plantillas)
+
+
 def guardar_usuario(db: Session, name: str, embedding: np.ndarray):
+    """`embedding` puede ser un vector (D,) o varias plantillas (K,D)"""
     usuario = Usuario(
         name=name,
-        embedding=embedding.tobytes()  # convertir ndarray → binario
+        embedding=codificar_embedding(embedding)  # ndarray → binario con cabecera
     )
     db.add(usuario)
     db.commit()
@@ -13,15 +506,350 @@ def guardar_usuario(db: Session, name: str, embedding: np.ndarray):
     return usuario
 
 
-def obtener_usuarios(db: Session):
-    usuarios = db.query(Usuario).all()
+def obtener_usuarios(db: Session, dim=DIM, lote=LOTE_CARGA):
+    """
+    Carga toda la base en una Galeria sin pasar por objetos ORM: solo las
+    columnas necesarias, leídas por lotes (yield_per) y decodificadas
+    directamente en una matriz float32 preasignada. Los usuarios con
+    varias plantillas ocupan una fila por plantilla.
+    """
+    total = db.scalar(select(func.count(Usuario.id)))
+    ids = np.empty(total, dtype=np.int64)
+    nombres = np.empty(total, dtype=object)
+    accesos = np.empty(total, dtype=bool)
+    matriz = np.empty((total, dim), dtype=np.float32)
+
+    consulta = (
+        select(Usuario.id, Usuario.name, Usuario.access, Usuario.embedding)
+        .order_by(Usuario.id)
+        .execution_options(yield_per=lote)
+    )
+
+    n = 0
+    for filas in db.execute(consulta).partitions():
+        columnas = list(zip(*filas))
+        formato, plantillas = _formato_lote(columnas[3], dim)
+        k = int(plantillas.sum())
+        if n + k > len(ids):
+            # Altas entre el COUNT y la lectura, o usuarios con varias plantillas: se agranda
+            extra = max(n + k - len(ids), len(ids) // 2)
+            ids = np.concatenate([ids, np.empty(extra, dtype=np.int64)])
+            nombres = np.concatenate([nombres, np.empty(extra, dtype=object)])
+            accesos = np.concatenate([accesos, np.empty(extra, dtype=bool)])
+            matriz = np.concatenate([matriz, np.empty((extra, dim), dtype=np.float32)])
+
+        # Una fila por plantilla: id, nombre y acceso se repiten
+        una = k == len(filas)
+        ids[n:n + k] = columnas[0] if una else np.repeat(columnas[0], plantillas)
+        nombres[n:n + k] = columnas[1] if una else np.repeat(np.array(columnas[1], dtype=object), plantillas)
+        accesos[n:n + k] = [bool(a) for a in (columnas[2] if una else np.repeat(columnas[2], plantillas))]
+        _decodificar_lote(columnas[3], matriz[n:n + k], formato)
+        n += k
+
+    # Bajas entre el COUNT y la lectura, o espacio de sobra tras agrandar
+    if n < len(ids):
+        ids, nombres, accesos, matriz = ids[:n], nombres[:n], accesos[:n], np.ascontiguousarray(matriz[:n])
+
+    return Galeria(ids, nombres, matriz, accesos, normalizada=True)
+
+
+# ==========================
+#   INSTANTÁNEA EN DISCO
+# ==========================
+#
+# La galería completa en un archivo que cada proceso abre con np.memmap
+# de solo lectura: la matriz queda en el page cache del sistema y la
+# comparten todos los workers, en lugar de una copia privada por proceso.
+#
+#   cabecera (64 bytes) | matriz (N,D) float32/float16 | ids int64 |
+#   accesos u8 | offsets de los nombres int64 (N+1) | nombres UTF-8
+#
+# Cada cambio escribe una generación nueva (gen-XXXXXXXX.gal) y después
+# reemplaza ACTUAL, que solo contiene el nombre de esa generación, con
+# os.replace (atómico): un lector ve la generación anterior o la nueva,
+# nunca una a medias, y las que ya tenía mapeadas siguen siendo válidas.
+
+MAGIA_GALERIA = b"FGAL"
+VERSION_GALERIA = 1
+CABECERA_GALERIA = struct.Struct("<4sBBH7Q")
+ARCHIVO_ACTUAL = "ACTUAL"
+GENERACIONES_GUARDADAS = 3      # las anteriores se borran (si nadie las tiene abiertas)
+BLOQUE_EXPORTAR = 8192
+INTERVALO_REVISION = 1.0        # segundos entre revisiones de ACTUAL
+
+
+@contextmanager
+def _bloqueo(directorio):
+    """Lock entre procesos para escribir generaciones"""
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, ".lock"), "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass    # LK_LOCK se rinde tras 10 s; se sigue esperando
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _leer_actual(directorio):
+    """Nombre de la generación publicada, o None si no hay instantánea"""
+    try:
+        with open(os.path.join(directorio, ARCHIVO_ACTUAL)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _publicar_actual(directorio, nombre):
+    tmp = os.path.join(directorio, f"{ARCHIVO_ACTUAL}.tmp{os.getpid()}")
+    with open(tmp, "w") as f:
+        f.write(nombre)
+    for intento in range(50):
+        try:
+            os.replace(tmp, os.path.join(directorio, ARCHIVO_ACTUAL))
+            return
+        except PermissionError:
+            # Windows: un lector tiene ACTUAL abierto en este instante
+            if intento == 49:
+                raise
+            time.sleep(0.01)
+
+
+def _generacion(nombre):
+    return int(nombre[4:-4]) if nombre else 0
+
+
+def _alinear(offset, alineacion=64):
+    return -(-offset // alineacion) * alineacion
+
+
+def _exportar(galeria, directorio, dtype=None):
+    """exportar_galeria sin tomar el lock (el llamador ya lo tiene)"""
+    dtype = np.dtype(dtype or Settings.EMBEDDING_DTYPE)
+    if dtype.name not in CODIGOS:
+        raise ValueError(f"dtype de galería no soportado: {dtype}")
+
+    filas = np.arange(len(galeria.ids)) if galeria.vivos is None else np.flatnonzero(galeria.vivos)
+    n, dim = len(filas), galeria.matriz.shape[1]
+    ids = np.ascontiguousarray(galeria.ids[filas], dtype=np.int64)
+    accesos = np.ascontiguousarray(galeria.accesos[filas], dtype=np.uint8)
+    nombres = [str(nombre).encode("utf-8") for nombre in galeria.nombres[filas]]
+    limites = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in nombres], out=limites[1:])
+
+    off_ids = _alinear(CABECERA_GALERIA.size + n * dim * dtype.itemsize)
+    off_accesos = off_ids + ids.nbytes
+    off_limites = _alinear(off_accesos + n)
+    off_nombres = off_limites + limites.nbytes
+    total = off_nombres + int(limites[-1])
+
+    generacion = _generacion(_leer_actual(directorio)) + 1
+    nombre = f"gen-{generacion:08d}.gal"
+    tmp = os.path.join(directorio, f"{nombre}.tmp{os.getpid()}")
+    with open(tmp, "wb") as f:
+        f.write(CABECERA_GALERIA.pack(MAGIA_GALERIA, VERSION_GALERIA, CODIGOS[dtype.name], dim,
+                                      n, generacion, off_ids, off_accesos, off_limites, off_nombres, total))
+        for i in range(0, n, BLOQUE_EXPORTAR):
+            f.write(np.ascontiguousarray(galeria.matriz[filas[i:i + BLOQUE_EXPORTAR]], dtype=dtype).tobytes())
+        f.write(bytes(off_ids - f.tell()))
+        f.write(ids.tobytes())
+        f.write(accesos.tobytes())
+        f.write(bytes(off_limites - f.tell()))
+        f.write(limites.tobytes())
+        f.write(b"".join(nombres))
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp, os.path.join(directorio, nombre))
+    _publicar_actual(directorio, nombre)
+
+    # Generaciones viejas: en Windows no se pueden borrar mientras algún
+    # proceso las tenga mapeadas; se reintenta en la próxima exportación
+    for archivo in os.listdir(directorio):
+        if archivo.startswith("gen-") and archivo.endswith(".gal") \
+                and _generacion(archivo) <= generacion - GENERACIONES_GUARDADAS:
+            try:
+                os.remove(os.path.join(directorio, archivo))
+            except OSError:
+                pass
+    return generacion
+
+
+def exportar_galeria(galeria, directorio, dtype=None):
+    """
+    Escribe las filas vivas de `galeria` como una generación nueva de la
+    instantánea en `directorio` y la publica. Retorna su número.
+    """
+    with _bloqueo(directorio):
+        return _exportar(galeria, directorio, dtype)
+
+
+def _mapear(ruta):
+    """Galeria de solo lectura sobre un archivo de generación"""
+    datos = np.memmap(ruta, dtype=np.uint8, mode="r")
+    magia, version, codigo, dim, n, _, off_ids, off_accesos, off_limites, off_nombres, total = \
+        CABECERA_GALERIA.unpack_from(datos)
+    if magia != MAGIA_GALERIA or version != VERSION_GALERIA or codigo not in DTYPES or total != len(datos):
+        raise ValueError(f"Instantánea de galería inválida: {ruta}")
+
+    dtype = DTYPES[codigo]
+    inicio = CABECERA_GALERIA.size
+    matriz = datos[inicio:inicio + n * dim * dtype.itemsize].view(dtype).reshape(n, dim)
+    ids = datos[off_ids:off_ids + 8 * n].view(np.int64)
+    accesos = datos[off_accesos:off_accesos + n].view(bool)
+
+    # Los nombres (y los diccionarios de búsqueda) sí son privados del proceso
+    limites = datos[off_limites:off_limites + 8 * (n + 1)].view(np.int64).tolist()
+    texto = bytes(datos[off_nombres:total])
+    nombres = np.empty(n, dtype=object)
+    nombres[:] = [texto[a:b].decode("utf-8") for a, b in zip(limites[:-1], limites[1:])]
+
+    posicion = {nombre: (f,) for f, nombre in enumerate(nombres)}
+    fila_por_id = {i: (f,) for f, i in enumerate(ids.tolist())}
+    return Galeria._vista(ids, nombres, matriz, accesos, None, posicion, fila_por_id, None)
+
+
+def abrir_galeria(directorio):
+    """(Galeria mapeada, nombre de la generación) de la instantánea publicada; (None, None) si no hay"""
+    for intento in range(3):
+        nombre = _leer_actual(directorio)
+        if nombre is None:
+            return None, None
+        try:
+            return _mapear(os.path.join(directorio, nombre)), nombre
+        except FileNotFoundError:
+            # Se publicó otra y se borró esta entre leer ACTUAL y abrirla
+            if intento == 2:
+                raise
+
+
+class GaleriaCompartida:
+    """
+    Galería sobre la instantánea en disco, con la misma interfaz que
+    CacheGaleria. `galeria` revisa ACTUAL (como mucho cada `intervalo`
+    segundos) y mapea la generación nueva si la hay; la anterior se libera
+    cuando la sueltan los lectores que la tenían.
+
+    Las altas, bajas y cambios de acceso escriben una generación nueva
+    bajo un lock entre procesos, partiendo siempre de la última publicada,
+    así que varios workers pueden modificarla sin pisarse. Cada cambio
+    reescribe el archivo completo: pensado para la administración de
+    usuarios, no para cargas masivas (tools/exportar_galeria.py).
+
+    Si todavía no hay instantánea se crea con `cargar()` (p.ej. desde la
+    base de datos); un solo proceso la crea y el resto la espera.
+    """
+
+    def __init__(self, directorio, indice=None, intervalo=INTERVALO_REVISION, cargar=None):
+        self.directorio = directorio
+        self.intervalo = intervalo
+        self._indice = indice
+        self._lock = threading.Lock()
+        self._galeria = None
+        self._actual = None
+        self._revisado = 0.0
+
+        if _leer_actual(directorio) is None:
+            if cargar is None:
+                raise FileNotFoundError(f"No hay instantánea de la galería en {directorio}")
+            with _bloqueo(directorio):
+                if _leer_actual(directorio) is None:
+                    _exportar(cargar(), directorio)
+        self._recargar()
+
+    @property
+    def galeria(self):
+        if time.monotonic() - self._revisado >= self.intervalo:
+            self._recargar(esperar=False)
+        return self._galeria
+
+    @property
+    def generacion(self):
+        return _generacion(self._actual)
+
+    def _recargar(self, esperar=True):
+        # Los lectores no esperan: si otro hilo ya está revisando, usan la actual
+        if not self._lock.acquire(blocking=esperar):
+            return
+        try:
+            self._revisado = time.monotonic()
+            if _leer_actual(self.directorio) == self._actual:
+                return
+            galeria, nombre = abrir_galeria(self.directorio)
+            if self._indice is not None:
+                self._indice.sincronizar(galeria.ids, galeria.matriz)
+                galeria.indice = self._indice
+            self._galeria, self._actual = galeria, nombre
+        finally:
+            self._lock.release()
+
+    def asignar_indice(self, indice):
+        """Usa un índice ANN (services/indice_ann) en esta y las próximas generaciones"""
+        with self._lock:
+            if indice is not None:
+                indice.sincronizar(self._galeria.ids, self._galeria.matriz)
+            self._indice = indice
+            self._galeria.indice = indice
+
+    def _modificar(self, cambio):
+        """Aplica `cambio(galeria)` a la última generación y publica el resultado (None = sin cambios)"""
+        with _bloqueo(self.directorio):
+            galeria, _ = abrir_galeria(self.directorio)
+            nueva = cambio(galeria)
+            if nueva is not None:
+                _exportar(nueva, self.directorio, dtype=galeria.matriz.dtype)
+        self._recargar()
+
+    def recargar(self, galeria):
+        """Reemplaza toda la galería (p.ej. tras una importación masiva)"""
+        self._modificar(lambda _: galeria)
+
+    def agregar(self, id_usuario, nombre, embedding, acceso):
+        """`embedding`: un vector (D,) o las plantillas (K,D) del usuario"""
+        embs = np.asarray(embedding, dtype=np.float32)
+        embs = normalizar(embs.reshape(-1, embs.shape[-1]))
+        k = len(embs)
+
+        def cambio(g):
+            otros = g.ids != id_usuario
+            return Galeria(
+                np.append(g.ids[otros], np.full(k, id_usuario, dtype=np.int64)),
+                np.append(g.nombres[otros], np.full(k, nombre, dtype=object)),
+                np.concatenate([g.matriz[otros].astype(np.float32), embs]),
+                np.append(g.accesos[otros], np.full(k, bool(acceso))),
+                normalizada=True
+            )
+        self._modificar(cambio)
 
-    result = {}
-    for u in usuarios:
-        emb = np.frombuffer(u.embedding, dtype=np.float32)
-        result[u.name] = {
-            'embedding': emb,
-            'access': u.access
-        }
+    def eliminar(self, id_usuario):
+        def cambio(g):
+            vivos = g.ids != id_usuario
+            if vivos.all():
+                return None
+            return Galeria._vista(g.ids, g.nombres, g.matriz, g.accesos, vivos, {}, {}, None)
+        self._modificar(cambio)
 
-    return result
\ No newline at end of file
+    def actualizar_acceso(self, id_usuario, acceso):
+        def cambio(g):
+            filas = np.flatnonzero(g.ids == id_usuario)
+            if len(filas) == 0:
+                return None
+            accesos = np.array(g.accesos)
+            accesos[filas] = bool(acceso)
+            return Galeria._vista(g.ids, g.nombres, g.matriz, accesos, None, {}, {}, None)
+        self._modificar(cambio)
@@ -0,0 +1,234 @@
+import os
+import threading
+import numpy as np
+
+# ==========================
+#   PARÁMETROS POR DEFECTO
+# ==========================
+
+UMBRAL_ANN = 5000      # por debajo de este tamaño la búsqueda exacta es más rápida
+N_PROBE = 16           # listas invertidas revisadas por consulta
+ITER_KMEANS = 10
+MUESTRAS_POR_LISTA = 64
+
+
+class IndiceIVF:
+    """
+    Índice aproximado tipo IVF (inverted file) en NumPy puro.
+
+    Los embeddings (ya normalizados) se reparten en `n_listas` celdas
+    mediante k-means esférico; cada consulta solo compara contra las
+    `n_probe` celdas cuyo centroide es más cercano. Inserciones y
+    eliminaciones son incrementales: no requieren re-entrenar.
+
+    Guarda un solo vector por id: de un usuario con varias plantillas
+    (filas consecutivas con el mismo id) solo la primera, la media
+    ponderada.
+    """
+
+    def __init__(self, n_listas=None, n_probe=N_PROBE):
+        self.n_listas = n_listas
+        self.n_probe = n_probe
+        self.centroides = None
+        self._listas = []               # por celda: tupla (ids, vecs)
+        self._lista_de = {}             # id -> celda donde está guardado
+        self._lock = threading.Lock()   # solo para escrituras
+
+    @property
+    def entrenado(self):
+        return self.centroides is not None
+
+    def __len__(self):
+        return len(self._lista_de)
+
+    def __contains__(self, id_usuario):
+        return id_usuario in self._lista_de
+
+    # ==========================
+    #   ENTRENAMIENTO
+    # ==========================
+
+    def entrenar(self, matriz, ids, semilla=0):
+        """Calcula los centroides con k-means esférico y reparte la primera fila de cada id"""
+        ids = np.asarray(ids, dtype=np.int64)
+        primeras = primeras_filas(ids)
+        matriz = np.ascontiguousarray(np.asarray(matriz)[primeras], dtype=np.float32)
+        ids = ids[primeras]
+        n = len(matriz)
+
+        n_listas = self.n_listas or max(1, int(np.sqrt(n)))
+        n_listas = min(n_listas, n)
+        rng = np.random.default_rng(semilla)
+
+        # Entrenar con una submuestra: los centroides no necesitan toda la base
+        n_muestras = min(n, n_listas * MUESTRAS_POR_LISTA)
+        muestra = matriz[rng.choice(n, n_muestras, replace=False)]
+        centroides = muestra[rng.choice(n_muestras, n_listas, replace=False)].copy()
+
+        for _ in range(ITER_KMEANS):
+            asignacion = _asignar(muestra, centroides)
+            sumas = np.zeros_like(centroides)
+            np.add.at(sumas, asignacion, muestra)
+            conteo = np.bincount(asignacion, minlength=n_listas)
+
+            # Celdas vacías: re-sembrar con puntos al azar
+            vacias = np.flatnonzero(conteo == 0)
+            sumas[vacias] = muestra[rng.choice(n_muestras, len(vacias), replace=False)]
+            centroides = _normalizar(sumas)
+
+        with self._lock:
+            self.n_listas = n_listas
+            self.centroides = centroides
+            self._repartir(matriz, ids)
+
+    def _repartir(self, matriz, ids):
+        asignacion = _asignar(matriz, self.centroides)
+        orden = np.argsort(asignacion, kind="stable")
+        limites = np.searchsorted(asignacion[orden], np.arange(self.n_listas + 1))
+
+        self._listas = []
+        for l in range(self.n_listas):
+            sel = orden[limites[l]:limites[l + 1]]
+            self._listas.append((ids[sel], matriz[sel]))
+
+        self._lista_de = dict(zip(ids.tolist(), asignacion.tolist()))
+
+    # ==========================
+    #   ALTAS / BAJAS
+    # ==========================
+
+    def agregar(self, id_usuario, embedding):
+        """Inserta (o reemplaza) un embedding normalizado sin re-entrenar"""
+        vec = _normalizar(np.asarray(embedding, dtype=np.float32).reshape(1, -1))
+        with self._lock:
+            if id_usuario in self._lista_de:
+                self._quitar(id_usuario)
+            l = int(np.argmax(self.centroides @ vec[0]))
+            # Se reemplaza la tupla completa: los lectores nunca ven una celda a medias
+            ids, vecs = self._listas[l]
+            self._listas[l] = (np.append(ids, np.int64(id_usuario)), np.concatenate([vecs, vec]))
+            self._lista_de[id_usuario] = l
+
+    def eliminar(self, id_usuario):
+        with self._lock:
+            if id_usuario in self._lista_de:
+                self._quitar(id_usuario)
+
+    def _quitar(self, id_usuario):
+        l = self._lista_de.pop(id_usuario)
+        ids, vecs = self._listas[l]
+        mantener = ids != id_usuario
+        self._listas[l] = (ids[mantener], vecs[mantener])
+
+    def sincronizar(self, ids, matriz):
+        """Altas/bajas incrementales para que el índice refleje (ids, matriz)"""
+        ids = np.asarray(ids)
+        primeras = primeras_filas(ids)
+        actuales = set(ids[primeras].tolist())
+        for id_usuario in set(self._lista_de) - actuales:
+            self.eliminar(id_usuario)
+        for fila in primeras.tolist():
+            id_usuario = int(ids[fila])
+            if id_usuario not in self._lista_de:
+                self.agregar(id_usuario, matriz[fila])
+
+    # ==========================
+    #   BÚSQUEDA
+    # ==========================
+
+    def buscar(self, embedding, k=1):
+        """Retorna (ids, distancias coseno) de los k vecinos aproximados"""
+        q = _normalizar(np.asarray(embedding, dtype=np.float32).reshape(1, -1))[0]
+
+        n_probe = min(self.n_probe, self.n_listas)
+        celdas = np.argpartition(-(self.centroides @ q), n_probe - 1)[:n_probe]
+
+        listas = [self._listas[l] for l in celdas]
+        ids = np.concatenate([ids for ids, _ in listas])
+        if len(ids) == 0:
+            return ids, np.empty(0, dtype=np.float32)
+
+        dist = 1.0 - np.concatenate([vecs @ q for _, vecs in listas])
+        k = min(k, len(ids))
+        top = np.argpartition(dist, k - 1)[:k]
+        top = top[np.argsort(dist[top], kind="stable")]
+        return ids[top], dist[top]
+
+    def buscar_lote(self, embeddings, k=1):
+        return [self.buscar(q, k) for q in np.atleast_2d(embeddings)]
+
+    # ==========================
+    #   PERSISTENCIA
+    # ==========================
+
+    def guardar(self, ruta):
+        """Guarda el índice en un .npz (escritura atómica)"""
+        with self._lock:
+            ids = np.concatenate([ids for ids, _ in self._listas])
+            vecs = np.concatenate([vecs for _, vecs in self._listas])
+            tamanos = np.array([len(ids) for ids, _ in self._listas], dtype=np.int64)
+            centroides = self.centroides
+
+        tmp = ruta + ".tmp.npz"
+        np.savez(tmp, centroides=centroides, ids=ids, vecs=vecs, tamanos=tamanos,
+                 n_probe=self.n_probe)
+        os.replace(tmp, ruta)
+
+    @classmethod
+    def cargar(cls, ruta):
+        datos = np.load(ruta)
+        indice = cls(n_listas=len(datos["centroides"]), n_probe=int(datos["n_probe"]))
+        indice.centroides = datos["centroides"]
+
+        limites = np.concatenate([[0], np.cumsum(datos["tamanos"])])
+        ids, vecs = datos["ids"], datos["vecs"]
+        # Los índices guardados antes de indexar una fila por id pueden tener repetidos
+        unica = np.zeros(len(ids), dtype=bool)
+        unica[primeras_filas(ids)] = True
+        for l in range(indice.n_listas):
+            sel = np.arange(limites[l], limites[l + 1])
+            sel = sel[unica[sel]]
+            indice._listas.append((ids[sel], vecs[sel]))
+            for i in ids[sel].tolist():
+                indice._lista_de[i] = l
+        return indice
+
+
+def primeras_filas(ids):
+    """Posición (en orden) de la primera fila de cada id distinto"""
+    return np.sort(np.unique(np.asarray(ids), return_index=True)[1])
+
+
+def _normalizar(x):
+    return x / np.maximum(np.linalg.norm(x, axis=-1, keepdims=True), 1e-12)
+
+
+def _asignar(matriz, centroides, bloque=16384):
+    """Celda más cercana de cada fila, por bloques para acotar la memoria"""
+    asignacion = np.empty(len(matriz), dtype=np.int64)
+    for i in range(0, len(matriz), bloque):
+        asignacion[i:i + bloque] = np.argmax(matriz[i:i + bloque] @ centroides.T, axis=1)
+    return asignacion
+
+
+def preparar_indice(galeria, ruta, umbral=UMBRAL_ANN):
+    """
+    Carga el índice guardado junto a los modelos (o lo entrena si la base
+    es grande) y lo sincroniza con la galería. Retorna None si no hace falta:
+    una base que quedó por debajo de `umbral` vuelve a la búsqueda exacta y
+    el índice guardado se borra.
+    """
+    if len(galeria) < umbral:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        return None
+
+    if os.path.exists(ruta):
+        indice = IndiceIVF.cargar(ruta)
+    else:
+        indice = IndiceIVF()
+        indice.entrenar(galeria.matriz, galeria.ids)
+
+    indice.sincronizar(galeria.ids, galeria.matriz)
+    indice.guardar(ruta)
+    return indice
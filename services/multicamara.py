@@ -0,0 +1,187 @@
+import queue
+import threading
+import time
+from services.camara import CapturaCamara
+from services.face_recognizer import CacheGaleria, GaleriaCompartida
+
+# ==========================
+#   PARÁMETROS POR DEFECTO
+# ==========================
+
+WORKERS = 2                 # hilos de inferencia compartidos por todas las fuentes
+CAPACIDAD_RESULTADOS = 64   # resultados pendientes por fuente (se descartan los más viejos)
+ESPERA = 0.005              # segundos entre revisiones cuando ninguna fuente tiene frame nuevo
+
+
+class Flujo:
+    """
+    Una fuente de video del servidor: su hilo de captura, su canal de
+    resultados y sus contadores.
+    """
+
+    def __init__(self, nombre, fuente, repetir=True, capacidad_resultados=CAPACIDAD_RESULTADOS):
+        self.nombre = nombre
+        self.fuente = fuente
+        self.captura = CapturaCamara(fuente, repetir=repetir)
+        self.resultados = queue.Queue(maxsize=capacidad_resultados)
+
+        self.ultimo_seq = -1        # último frame entregado a un worker
+        self.ocupado = False        # hay un frame de esta fuente en proceso
+        self.procesados = 0
+        self.descartados = 0        # frames que nunca llegaron a un worker
+        self.latencia_total = 0.0
+
+    def pendiente(self):
+        return not self.ocupado and self.captura.seq > self.ultimo_seq
+
+    @property
+    def terminado(self):
+        """La captura acabó (archivo sin repetir) y ya se procesó todo"""
+        return not self.captura.activo and not self.ocupado and self.captura.seq <= self.ultimo_seq
+
+    def publicar(self, resultado):
+        """Pone un resultado en el canal; si está lleno descarta el más viejo"""
+        while True:
+            try:
+                self.resultados.put_nowait(resultado)
+                return
+            except queue.Full:
+                try:
+                    self.resultados.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def estadisticas(self):
+        return {
+            'procesados': self.procesados,
+            'descartados': self.descartados,
+            'latencia_ms': round(self.latencia_total / self.procesados * 1000, 2) if self.procesados else None
+        }
+
+
+class ServidorMultiCamara:
+    """
+    Reconocimiento sobre N fuentes (índices de cámara, URLs RTSP o
+    archivos de video) con un único FacePipeline y un pool de workers.
+
+    Planificación: round-robin entre las fuentes que tienen un frame nuevo
+    y como máximo un frame en proceso por fuente, así una cámara rápida no
+    acapara a los workers. Cada fuente entrega siempre su frame más
+    reciente: si los workers no dan abasto los frames intermedios se
+    descartan (y se cuentan) en lugar de acumular retraso.
+
+    Cada resultado va al canal de su fuente (`canal(nombre)`, una
+    queue.Queue) como dict {fuente, seq, timestamp, latencia_ms, rostros}.
+    """
+
+    def __init__(self, fuentes, pipeline, galeria, workers=WORKERS, todas=True, repetir=True,
+                 capacidad_resultados=CAPACIDAD_RESULTADOS):
+        self.pipeline = pipeline
+        self.galeria = galeria          # Galeria, CacheGaleria o GaleriaCompartida (se lee su instantánea)
+        self.n_workers = workers
+        self.todas = todas
+
+        if not isinstance(fuentes, dict):
+            fuentes = {str(f): f for f in fuentes}
+        self.flujos = [Flujo(nombre, fuente, repetir, capacidad_resultados) for nombre, fuente in fuentes.items()]
+        self._por_nombre = {f.nombre: f for f in self.flujos}
+
+        self._turno = 0
+        self._lock = threading.Condition()
+        self._activo = False
+        self._hilos = []
+
+    def canal(self, nombre):
+        return self._por_nombre[nombre].resultados
+
+    def iniciar(self):
+        self._activo = True
+        for flujo in self.flujos:
+            if not flujo.captura.isOpened():
+                print(f"❌ No se pudo abrir la fuente {flujo.nombre}")
+            flujo.captura.iniciar()
+        for i in range(self.n_workers):
+            hilo = threading.Thread(target=self._worker, name=f"worker-{i}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+        return self
+
+    def detener(self):
+        self._activo = False
+        with self._lock:
+            self._lock.notify_all()
+        for hilo in self._hilos:
+            hilo.join(timeout=5)
+        self._hilos = []
+        for flujo in self.flujos:
+            flujo.captura.detener()
+
+    def esperar_fin(self, timeout=None):
+        """Espera a que todas las fuentes terminen (solo archivos sin repetir)"""
+        limite = None if timeout is None else time.perf_counter() + timeout
+        while not all(f.terminado for f in self.flujos):
+            if limite is not None and time.perf_counter() > limite:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def estadisticas(self):
+        return {f.nombre: f.estadisticas() for f in self.flujos}
+
+    # ==========================
+    #   PLANIFICADOR
+    # ==========================
+
+    def _siguiente(self):
+        """Próximo (flujo, frame) en round-robin, o None si el servidor se detuvo"""
+        with self._lock:
+            while self._activo:
+                n = len(self.flujos)
+                for i in range(n):
+                    flujo = self.flujos[(self._turno + i) % n]
+                    if not flujo.pendiente():
+                        continue
+                    dato = flujo.captura.ultimo()
+                    if dato is None:
+                        continue
+
+                    seq = dato[0]
+                    if flujo.ultimo_seq >= 0:
+                        flujo.descartados += seq - flujo.ultimo_seq - 1
+                    flujo.ultimo_seq = seq
+                    flujo.ocupado = True
+                    self._turno = (self._turno + i + 1) % n
+                    return flujo, dato
+                # Las cámaras no avisan a este lock: se revisa periódicamente
+                self._lock.wait(ESPERA)
+        return None
+
+    def _worker(self):
+        while True:
+            siguiente = self._siguiente()
+            if siguiente is None:
+                return
+            flujo, (seq, timestamp, frame) = siguiente
+
+            try:
+                t0 = time.perf_counter()
+                galeria = self.galeria.galeria if isinstance(self.galeria, (CacheGaleria, GaleriaCompartida)) else self.galeria
+                rostros = self.pipeline.identify(frame, galeria, todas=self.todas)
+                latencia = time.perf_counter() - t0
+
+                flujo.publicar({
+                    'fuente': flujo.nombre,
+                    'seq': seq,
+                    'timestamp': timestamp,
+                    'latencia_ms': round(latencia * 1000, 2),
+                    'rostros': rostros
+                })
+                with self._lock:
+                    flujo.procesados += 1
+                    flujo.latencia_total += latencia
+            except Exception as e:
+                print(f"❌ Error procesando {flujo.nombre} (frame {seq}): {e}")
+            finally:
+                with self._lock:
+                    flujo.ocupado = False
+                    self._lock.notify_all()
@@ -0,0 +1,269 @@
+import os
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+from core.config import Settings
+from session_options import FabricaSesiones
+from services.yolo_decoder import decodificar_yolo, CONF_UMBRAL, TAM_MINIMO, IOU_UMBRAL
+from utils import run_arcface_batch
+
+# ==========================
+#       MODELOS
+# ==========================
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+YOLO_MODEL = os.path.join(BASE_DIR, "models", "model.onnx")
+ARC_MODEL = os.path.join(BASE_DIR, "models", "arcface_r100.onnx")
+
+ESCALA = np.float32(1 / 255.0)
+RELLENO = 114 / 255.0   # gris del letterbox (el mismo que usa YOLO al entrenar)
+STRIDE = 32             # la entrada rectangular debe ser múltiplo del stride máximo
+MODOS = ("stretch", "letterbox", "rect")
+TAM_ROI = 320           # entrada de YOLO al detectar solo en la región del track
+MAX_BUFFERS = 4         # juegos de buffers YOLO por hilo (uno por tamaño de frame, LRU)
+
+
+class FacePipeline:
+    """
+    Camino único detectar → recortar → embedding → identificar.
+
+    Es dueño de las dos sesiones ONNX, de los buffers de entrada
+    (preasignados por hilo, así varias peticiones Flask pueden usarlo a
+    la vez) y del decodificador de YOLO. app.py, reconocer.py,
+    registrar.py y tests/test-yolo.py usan esta misma clase.
+
+    Modos de entrada de YOLO (`modo`):
+      - "stretch":   estira el frame a la entrada del modelo (640x640)
+      - "letterbox": escala manteniendo la proporción y rellena con gris
+      - "rect":      como letterbox pero la entrada es rectangular, con el
+                     lado corto redondeado a múltiplo de 32 (640x480 para
+                     una cámara 4:3). Requiere un ONNX con H/W dinámicos;
+                     si no los tiene se usa letterbox.
+    """
+
+    def __init__(self, yolo_model=YOLO_MODEL, arc_model=ARC_MODEL, conf_umbral=CONF_UMBRAL,
+                 tam_minimo=TAM_MINIMO, iou_umbral=IOU_UMBRAL, modo=None, fabrica=None,
+                 yolo_variante=None, arc_variante=None):
+        self.conf_umbral = conf_umbral
+        self.tam_minimo = tam_minimo
+        self.iou_umbral = iou_umbral
+
+        # Antes de cargar modelos: un modo mal escrito falla enseguida
+        self.modo = modo or Settings.YOLO_INPUT_MODE
+        if self.modo not in MODOS:
+            raise ValueError(f"Modo de entrada YOLO desconocido: {self.modo!r} "
+                             f"(Settings.YOLO_INPUT_MODE debe ser uno de: {', '.join(MODOS)})")
+
+        # Una sola fábrica reparte los hilos entre las dos sesiones
+        fabrica = fabrica or FabricaSesiones(n_sesiones=2 if arc_model else 1)
+        self.session_yolo = fabrica.crear(yolo_model, yolo_variante or Settings.YOLO_VARIANTE)
+        self.input_name_yolo = self.session_yolo.get_inputs()[0].name
+        _, _, alto, ancho = self.session_yolo.get_inputs()[0].shape
+        dinamica = not (isinstance(alto, int) and isinstance(ancho, int))
+        # Con H/W dinámicos el tamaño de referencia es el de entrenamiento
+        self.entrada = (640, 640) if dinamica else (ancho, alto)
+        # La detección en ROI solo ahorra con H/W dinámicos: con entrada fija
+        # el recorte se estiraría a 640x640 y costaría lo mismo que el frame
+        # completo (None = sin ROI; tools/entrada_dinamica.py)
+        self.entrada_roi = (TAM_ROI, TAM_ROI) if dinamica else None
+
+        if self.modo == "rect" and not dinamica:
+            print("⚠ El modelo YOLO tiene entrada fija: se usa letterbox en lugar de rect")
+            self.modo = "letterbox"
+
+        # ArcFace es opcional (p.ej. tests/test-yolo.py solo detecta)
+        self.session_arc = (fabrica.crear(arc_model, arc_variante or Settings.ARC_VARIANTE)
+                            if arc_model else None)
+
+        self._local = threading.local()
+
+    # ==========================
+    #   DETECCIÓN
+    # ==========================
+
+    def geometria(self, W, H):
+        """
+        Tamaño de la entrada del modelo, tamaño del frame re-escalado,
+        padding y escala inversa para un frame de W x H.
+        """
+        ancho, alto = self.entrada
+        if self.modo == "stretch":
+            return _Geometria((ancho, alto), (ancho, alto), (0, 0), (W / ancho, H / alto))
+
+        r = min(ancho / W, alto / H)
+        nw, nh = int(round(W * r)), int(round(H * r))
+        if self.modo == "rect":
+            ancho = -(-nw // STRIDE) * STRIDE
+            alto = -(-nh // STRIDE) * STRIDE
+
+        px, py = (ancho - nw) // 2, (alto - nh) // 2
+        return _Geometria((ancho, alto), (nw, nh), (px, py), (W / nw, H / nh))
+
+    def _buffers(self, clave, geometria):
+        """
+        Buffers de YOLO del hilo actual para `clave`. Se guardan los
+        MAX_BUFFERS usados más recientemente: la cámara siempre da el mismo
+        tamaño, pero los frames subidos por el navegador pueden traer
+        cualquiera y no deben acumular buffers sin límite.
+        """
+        buffers = getattr(self._local, "yolo", None)
+        if buffers is None:
+            buffers = self._local.yolo = OrderedDict()
+        buf = buffers.get(clave)
+        if buf is None:
+            buf = buffers[clave] = _BuffersYolo(self.session_yolo, geometria())
+            if len(buffers) > MAX_BUFFERS:
+                buffers.popitem(last=False)
+        else:
+            buffers.move_to_end(clave)
+        return buf
+
+    def _preparar(self, frame, buf):
+        """
+        Frame BGR -> tensor (1,3,H,W) RGB en [0,1] sin asignar memoria nueva:
+        resize escribe en un buffer uint8 fijo y cada canal se convierte a
+        float32 directamente en su plano del tensor NCHW (el cambio BGR->RGB
+        se hace al elegir el canal, sin cvtColor). El padding del letterbox
+        se rellena una sola vez al crear el buffer.
+        """
+        geo = buf.geometria
+        (nw, nh), (px, py) = geo.redimensionado, geo.padding
+
+        cv2.resize(frame, (nw, nh), dst=buf.resized)
+        for c in range(3):
+            np.multiply(buf.resized[:, :, 2 - c], ESCALA, out=buf.entrada[0, c, py:py + nh, px:px + nw],
+                        casting="unsafe")
+        return buf
+
+    def _buffers_frame(self, frame):
+        H, W = frame.shape[:2]
+        return self._buffers((W, H), lambda: self.geometria(W, H))
+
+    def preprocess(self, frame):
+        return self._preparar(frame, self._buffers_frame(frame)).entrada
+
+    def detect(self, frame):
+        """Retorna (cajas, confs, best_box, best_conf) en coordenadas del frame"""
+        H, W = frame.shape[:2]
+        buf = self._preparar(frame, self._buffers_frame(frame))
+        out = buf.ejecutar()
+        geo = buf.geometria
+        return decodificar_yolo(out, W, H, conf_umbral=self.conf_umbral, tam_minimo=self.tam_minimo,
+                                iou_umbral=self.iou_umbral, escala=geo.escala, padding=geo.padding)
+
+    def detect_roi(self, frame, roi):
+        """
+        Como detect() pero solo dentro de roi=(x1,y1,x2,y2), estirada a
+        `entrada_roi` (320x320). Las cajas se devuelven en coordenadas del
+        frame completo. Con un ONNX de entrada fija detecta en todo el frame.
+        """
+        if self.entrada_roi is None:
+            return self.detect(frame)
+        x1, y1, x2, y2 = roi
+        recorte = frame[y1:y2, x1:x2]
+        H, W = recorte.shape[:2]
+        ancho, alto = self.entrada_roi
+
+        buf = self._buffers("roi", lambda: _Geometria((ancho, alto), (ancho, alto), (0, 0), None))
+        out = self._preparar(recorte, buf).ejecutar()
+        cajas, confs, best_box, best_conf = decodificar_yolo(
+            out, W, H, conf_umbral=self.conf_umbral, tam_minimo=self.tam_minimo,
+            iou_umbral=self.iou_umbral, escala=(W / ancho, H / alto)
+        )
+
+        cajas += np.array([x1, y1, x1, y1], dtype=np.int32)
+        if best_box is not None:
+            best_box = (best_box[0] + x1, best_box[1] + y1, best_box[2] + x1, best_box[3] + y1)
+        return cajas, confs, best_box, best_conf
+
+    @staticmethod
+    def recortar(frame, caja):
+        x1, y1, x2, y2 = caja
+        return frame[y1:y2, x1:x2]
+
+    # ==========================
+    #   EMBEDDING
+    # ==========================
+
+    def embed(self, crops):
+        """Embeddings (N,512) de varios recortes en una sola llamada a ArcFace"""
+        return run_arcface_batch(self.session_arc, crops)
+
+    # ==========================
+    #   IDENTIFICACIÓN
+    # ==========================
+
+    def identify(self, frame, galeria, todas=False):
+        """
+        Detecta, recorta, calcula embeddings y compara con la galería.
+        Por defecto solo el rostro de mayor confianza; `todas=True` usa
+        todas las detecciones tras NMS.
+
+        Retorna una lista de dicts {caja, conf, usuario, distancia, acceso}.
+        """
+        cajas, confs, best_box, best_conf = self.detect(frame)
+        if best_box is None:
+            return []
+
+        if not todas:
+            cajas, confs = [best_box], [best_conf]
+        else:
+            cajas = [tuple(int(v) for v in caja) for caja in cajas]
+
+        embeddings = self.embed([self.recortar(frame, caja) for caja in cajas])
+        resultados = galeria.identificar_lote(embeddings)
+
+        return [
+            {'caja': caja, 'conf': float(conf), 'usuario': usuario,
+             'distancia': distancia, 'acceso': acceso}
+            for caja, conf, (usuario, distancia, acceso) in zip(cajas, confs, resultados)
+        ]
+
+
+class _Geometria:
+    def __init__(self, entrada, redimensionado, padding, escala):
+        self.entrada = entrada                  # (ancho, alto) del tensor
+        self.redimensionado = redimensionado    # (ancho, alto) del frame escalado
+        self.padding = padding                  # (x, y) del frame dentro del tensor
+        self.escala = escala                    # px del frame por px del modelo
+
+
+class _BuffersYolo:
+    """
+    Tensores persistentes de un hilo enlazados a la sesión con IOBinding:
+    ONNX Runtime lee la entrada y escribe la salida directamente en estos
+    arrays, sin copias por llamada.
+    """
+
+    def __init__(self, session, geometria):
+        ancho, alto = geometria.entrada
+        nw, nh = geometria.redimensionado
+        self.session = session
+        self.geometria = geometria
+        self.resized = np.empty((nh, nw, 3), dtype=np.uint8)
+        self.entrada = np.full((1, 3, alto, ancho), RELLENO, dtype=np.float32)
+
+        self.binding = session.io_binding()
+        self.binding.bind_input(
+            name=session.get_inputs()[0].name, device_type="cpu", device_id=0,
+            element_type=np.float32, shape=self.entrada.shape, buffer_ptr=self.entrada.ctypes.data
+        )
+
+        # Si la forma de salida es estática también se preasigna
+        salida = session.get_outputs()[0]
+        self.salida = None
+        if all(isinstance(d, int) for d in salida.shape):
+            self.salida = np.empty(salida.shape, dtype=np.float32)
+            self.binding.bind_output(
+                name=salida.name, device_type="cpu", device_id=0,
+                element_type=np.float32, shape=self.salida.shape, buffer_ptr=self.salida.ctypes.data
+            )
+        else:
+            self.binding.bind_output(salida.name, "cpu")
+
+    def ejecutar(self):
+        self.session.run_with_iobinding(self.binding)
+        if self.salida is not None:
+            return self.salida
+        return self.binding.copy_outputs_to_cpu()[0]
@@ -0,0 +1,95 @@
+import cv2
+import numpy as np
+
+# ==========================
+#   PARÁMETROS POR DEFECTO
+# ==========================
+
+MUESTRAS = 8            # rostros que se toman en el registro (los de mejor calidad de la ráfaga)
+PLANTILLAS = 3          # plantillas guardadas por usuario: la media ponderada + las mejores muestras
+LADO_BUENO = 112        # lado (px) a partir del cual el tamaño del rostro no penaliza (entrada de ArcFace)
+NITIDEZ_REF = 100.0     # varianza del laplaciano que da nitidez 0.5
+POSE_MIN = 0.25         # factor de pose de un rostro nada simétrico (de perfil)
+CALIDAD_MIN = 0.15      # muestras por debajo no se usan (salvo que no haya otra)
+UMBRAL_ATIPICO = 0.45   # distancia a la media a partir de la cual una muestra se descarta
+DISTINTA_MIN = 0.02     # distancia mínima de una plantilla extra a las ya elegidas
+
+
+def calidad(recorte, conf=None):
+    """
+    Calidad de un rostro recortado en [0, 1] y sus componentes:
+
+      - tamano:    lado menor respecto de LADO_BUENO
+      - nitidez:   varianza del laplaciano (desenfoque, movimiento)
+      - pose:      simetría izquierda/derecha del recorte; un rostro de
+                   frente es casi simétrico y uno de perfil no
+      - deteccion: confianza de YOLO (1 si el recorte vino ya hecho)
+
+    La calidad es el producto: basta un componente malo para descartar
+    la muestra.
+    """
+    alto, ancho = recorte.shape[:2]
+    gris = cv2.cvtColor(recorte, cv2.COLOR_BGR2GRAY) if recorte.ndim == 3 else recorte
+
+    tamano = min(1.0, min(alto, ancho) / LADO_BUENO)
+
+    varianza = float(cv2.Laplacian(gris, cv2.CV_32F).var())
+    nitidez = varianza / (varianza + NITIDEZ_REF)
+
+    # Simetría sobre una versión chica y normalizada en brillo (barato y sin ruido de píxel)
+    chico = cv2.resize(gris, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    chico = (chico - chico.mean()) / (chico.std() + 1e-6)
+    # Acotada a [POSE_MIN, 1]: la iluminación lateral también resta simetría
+    simetria = float(np.clip(np.mean(chico * chico[:, ::-1]), 0.0, 1.0))
+    pose = POSE_MIN + (1.0 - POSE_MIN) * simetria
+
+    deteccion = 1.0 if conf is None else float(conf)
+
+    componentes = {'tamano': tamano, 'nitidez': nitidez, 'pose': pose, 'deteccion': deteccion}
+    return float(np.prod(list(componentes.values()))), componentes
+
+
+def seleccionar(muestras, n=MUESTRAS):
+    """Índices de las `n` muestras de mejor calidad; `muestras` = [(recorte, conf)]"""
+    calidades = [calidad(recorte, conf)[0] for recorte, conf in muestras]
+    orden = np.argsort(calidades)[::-1][:n]
+    return [int(i) for i in orden], [calidades[i] for i in orden]
+
+
+def combinar(embeddings, calidades, n=PLANTILLAS):
+    """
+    Plantillas (T,D) de un usuario a partir de K embeddings y su calidad:
+    la primera es la media normalizada ponderada por calidad y le siguen
+    hasta T-1 muestras de mejor calidad que no repitan una ya elegida.
+    Las muestras muy alejadas de la media (otra persona, una detección
+    errónea) se descartan antes.
+    """
+    embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    pesos = np.asarray(calidades, dtype=np.float32)
+
+    usar = pesos >= CALIDAD_MIN
+    if not usar.any():
+        usar = pesos == pesos.max()
+
+    for _ in range(2):
+        media = _media(embeddings[usar], pesos[usar])
+        quedan = usar & ((1.0 - embeddings @ media) < UMBRAL_ATIPICO)
+        if not quedan.any() or quedan.sum() == usar.sum():
+            break
+        usar = quedan
+    media = _media(embeddings[usar], pesos[usar])
+
+    # Mejores muestras, salteando las casi iguales a una ya elegida (frames seguidos de la ráfaga)
+    plantillas = [media]
+    for i in np.argsort(pesos)[::-1]:
+        if len(plantillas) == n:
+            break
+        if usar[i] and min(1.0 - float(p @ embeddings[i]) for p in plantillas) >= DISTINTA_MIN:
+            plantillas.append(embeddings[i])
+    return np.vstack(plantillas)
+
+
+def _media(embeddings, pesos):
+    media = (embeddings * np.maximum(pesos, 1e-6)[:, None]).sum(axis=0)
+    return media / max(float(np.linalg.norm(media)), 1e-12)
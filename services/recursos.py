@@ -0,0 +1,259 @@
+import atexit
+import os
+import threading
+import time
+from core.config import Settings
+
+# ==========================
+#   RECURSOS DEL PROCESO
+# ==========================
+#
+# Modelos, galería y cámara se crean la primera vez que alguien los pide
+# (no al importar), una sola vez por proceso aunque lleguen varias
+# peticiones a la vez. Importar app.py no carga modelos ni abre la base.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INDICE_ANN = os.path.join(BASE_DIR, "models", "indice_ivf.npz")
+ESPERA_OVERLAY = 2.0    # segundos que el stream espera el reconocimiento del overlay
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+_galeria = None
+_galeria_lock = threading.Lock()
+
+_camara = None
+_camara_lock = threading.Lock()
+
+_trabajos = None
+_trabajos_lock = threading.Lock()
+
+_difusor = None
+_difusor_lock = threading.Lock()
+
+
+def obtener_pipeline():
+    """FacePipeline compartido (sesiones YOLO + ArcFace, services/pipeline.py)"""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                from services.pipeline import FacePipeline
+                _pipeline = FacePipeline()
+    return _pipeline
+
+
+def obtener_galeria():
+    """
+    CacheGaleria compartida, cargada de la base de datos la primera vez.
+    Las rutas de administración la actualizan de forma incremental.
+
+    Con Settings.GALERIA_INSTANTANEA es una GaleriaCompartida: todos los
+    workers mapean la misma instantánea en disco (y la crea el primero).
+    """
+    global _galeria
+    if _galeria is None:
+        with _galeria_lock:
+            if _galeria is None:
+                _galeria = _cargar_galeria()
+    return _galeria
+
+
+def galeria_cargada():
+    """
+    La galería si ya se cargó, o None (no la carga). Si hay una carga en
+    curso espera a que termine, para que un cambio recién guardado en la
+    base no se pierda.
+    """
+    with _galeria_lock:
+        return _galeria
+
+
+def galeria_a_modificar():
+    """
+    Galería a la que aplicar un cambio de la administración, o None si no
+    hace falta. La CacheGaleria en memoria solo se actualiza si ya se
+    cargó: si no, al cargarla leerá la base ya actualizada. La instantánea
+    compartida (Settings.GALERIA_INSTANTANEA), en cambio, la leen otros
+    workers y procesos que nunca vuelven a la base, así que siempre se
+    abre para publicar el cambio en una generación nueva.
+    """
+    if Settings.GALERIA_INSTANTANEA:
+        return obtener_galeria()
+    return galeria_cargada()
+
+
+def _galeria_de_la_base():
+    from core.database import SessionLocal
+    from services.face_recognizer import obtener_usuarios
+
+    db = SessionLocal()
+    try:
+        base_usuarios = obtener_usuarios(db)
+    finally:
+        db.close()
+    print(f"✔ Usuarios cargados: {len(base_usuarios)}")
+    return base_usuarios
+
+
+def _cargar_galeria():
+    from services.face_recognizer import CacheGaleria, GaleriaCompartida
+    from services.indice_ann import preparar_indice
+
+    if Settings.GALERIA_INSTANTANEA:
+        galeria = GaleriaCompartida(Settings.GALERIA_INSTANTANEA, cargar=_galeria_de_la_base)
+        base_usuarios = galeria.galeria
+        print(f"✔ Instantánea de la galería: generación {galeria.generacion}, {len(base_usuarios)} usuarios")
+    else:
+        galeria = None
+        base_usuarios = _galeria_de_la_base()
+
+    # Índice ANN para bases grandes (None = búsqueda exacta).
+    # Se sincroniza de forma incremental y se persiste al salir.
+    indice_ann = preparar_indice(base_usuarios, INDICE_ANN)
+    if indice_ann is not None:
+        atexit.register(indice_ann.guardar, INDICE_ANN)
+
+    if galeria is not None:
+        galeria.asignar_indice(indice_ann)
+        return galeria
+    return CacheGaleria(base_usuarios, indice_ann)
+
+
+def obtener_camara():
+    """
+    Servicio de captura global: un solo hilo lee la cámara y publica los
+    frames en un buffer circular que comparten todas las rutas. Se vuelve
+    a abrir si la captura se detuvo. None si no hay cámara.
+    """
+    global _camara
+    from services.camara import CapturaCamara
+
+    with _camara_lock:
+        if _camara is None or not _camara.activo:
+            if _camara is not None:
+                _camara.detener()
+            _camara = None
+
+            fuentes = range(5) if Settings.CAMERA_SOURCE is None else [Settings.CAMERA_SOURCE]
+            for fuente in fuentes:
+                captura = CapturaCamara(fuente)
+                if captura.isOpened():
+                    _camara = captura.iniciar()
+                    break
+                captura.detener()
+        return _camara
+
+
+def obtener_difusor():
+    """
+    Stream compartido de /video_feed (services/transmision.py) sobre la
+    cámara actual: cada frame se codifica una vez para todos los clientes.
+    Se recrea si la cámara se volvió a abrir o si su hilo terminó. None si
+    no hay cámara.
+    """
+    global _difusor
+    from services.transmision import Difusor
+
+    camara = obtener_camara()
+    with _difusor_lock:
+        if camara is None:
+            return None
+        if _difusor is None or _difusor.camara is not camara or not _difusor.activo:
+            if _difusor is not None:
+                _difusor.detener()
+            reconocer = _reconocer_para_overlay if Settings.TRANSMISION_OVERLAY else None
+            _difusor = Difusor(camara, calidad=Settings.TRANSMISION_CALIDAD, lado_max=Settings.TRANSMISION_LADO_MAX,
+                               fps_max=Settings.TRANSMISION_FPS_MAX, reconocer=reconocer).iniciar()
+        return _difusor
+
+
+def _reconocer_para_overlay(frame):
+    """
+    Rostros del frame con la etiqueta que dibuja el overlay del stream.
+    La inferencia pasa por la cola de trabajos, así cuenta para el límite
+    de concurrencia y el control de admisión como un login más. Con la
+    cola llena (o si tarda más de ESPERA_OVERLAY) retorna None y el
+    stream conserva las últimas cajas.
+    """
+    from services.trabajos import ColaLlena, TERMINADO
+
+    try:
+        trabajo = obtener_trabajos().enviar('overlay', _identificar_overlay, frame)
+    except ColaLlena:
+        return None
+    if trabajo.esperar(timeout=ESPERA_OVERLAY) != TERMINADO:
+        if trabajo.listo:
+            raise RuntimeError(trabajo.resultado['message'])
+        return None
+    return trabajo.resultado
+
+
+def _identificar_overlay(frame):
+    from services.decision import UMBRAL_RECONOCIDO
+
+    rostros = obtener_pipeline().identify(frame, obtener_galeria().galeria, todas=True)
+    for rostro in rostros:
+        rostro['reconocido'] = rostro['distancia'] < UMBRAL_RECONOCIDO
+        rostro['etiqueta'] = rostro['usuario'] if rostro['reconocido'] else "Desconocido"
+    return rostros, 200
+
+
+def obtener_trabajos():
+    """
+    Cola de trabajos de reconocimiento (services/trabajos.py): un worker
+    por inferencia simultánea que esperan las sesiones de ONNX Runtime.
+    """
+    global _trabajos
+    if _trabajos is None:
+        with _trabajos_lock:
+            if _trabajos is None:
+                from services.trabajos import ColaTrabajos
+                _trabajos = ColaTrabajos(workers=Settings.ORT_CONCURRENCIA,
+                                         capacidad=Settings.TRABAJOS_CAPACIDAD,
+                                         max_oyentes=Settings.TRABAJOS_MAX_EVENTOS)
+    return _trabajos
+
+
+def calentar():
+    """
+    Crea los recursos y corre una inferencia de prueba en cada modelo, así
+    la primera petición real no paga la carga ni las asignaciones
+    iniciales de ONNX Runtime. Retorna los tiempos (ms) de cada paso.
+    """
+    import numpy as np
+    tiempos = {}
+
+    t0 = time.perf_counter()
+    pipeline = obtener_pipeline()
+    tiempos['modelos'] = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    pipeline.detect(frame)
+    pipeline.embed([frame[:112, :112]])
+    tiempos['inferencia'] = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    obtener_galeria()
+    tiempos['galeria'] = (time.perf_counter() - t0) * 1000
+
+    return {paso: round(ms, 1) for paso, ms in tiempos.items()}
+
+
+def cerrar():
+    """
+    Detiene los hilos del proceso (stream, trabajos, cámara) esperando a
+    que terminen: un hilo daemon que sigue dentro de ONNX Runtime u
+    OpenCV mientras el intérprete se apaga aborta el proceso. Se registra
+    con atexit.
+    """
+    if _difusor is not None:
+        _difusor.detener()
+    if _trabajos is not None:
+        _trabajos.cerrar()
+    if _camara is not None:
+        _camara.detener()
+
+
+atexit.register(cerrar)
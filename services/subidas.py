@@ -0,0 +1,113 @@
+import struct
+import cv2
+import numpy as np
+
+# ==========================
+#   PARÁMETROS POR DEFECTO
+# ==========================
+
+MAX_IMAGENES = 15       # imágenes por petición (una ráfaga de registro)
+LADO_FRAME = 640        # lado mayor mínimo de un frame tras reducir (entrada de YOLO)
+LADO_ROSTRO = 112       # lado mayor mínimo de un recorte tras reducir (entrada de ArcFace)
+
+# Decodificación reducida de OpenCV: en JPEG la escala se aplica dentro de
+# la IDCT, así que decodificar a 1/2, 1/4 u 1/8 es bastante más rápido
+REDUCCIONES = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+               (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+FIRMAS = ((b"\xff\xd8\xff", "jpeg"), (b"\x89PNG\r\n\x1a\n", "png"), (b"RIFF", "webp"))
+
+
+class SubidaInvalida(ValueError):
+    """El cuerpo de la petición no trae imágenes utilizables (→ HTTP 400)"""
+
+
+def formato(datos):
+    """'jpeg', 'png', 'webp' o None, según los primeros bytes"""
+    for firma, nombre in FIRMAS:
+        if bytes(datos[:len(firma)]) == firma:
+            if nombre == "webp" and bytes(datos[8:12]) != b"WEBP":
+                continue
+            return nombre
+    return None
+
+
+def dimensiones_jpeg(datos):
+    """(ancho, alto) leídos del marcador SOF sin decodificar; None si no se encuentra"""
+    i, n = 2, len(datos)
+    while i + 9 <= n:
+        if datos[i] != 0xFF:
+            return None
+        marcador = datos[i + 1]
+        if marcador == 0xFF:                        # relleno
+            i += 1
+            continue
+        if marcador == 0x01 or 0xD0 <= marcador <= 0xD8:  # marcadores sin longitud
+            i += 2
+            continue
+        if 0xC0 <= marcador <= 0xCF and marcador not in (0xC4, 0xC8, 0xCC):
+            alto, ancho = struct.unpack_from(">HH", datos, i + 5)
+            return ancho, alto
+        if marcador == 0xDA:                        # empieza la imagen: no hubo SOF
+            return None
+        i += 2 + struct.unpack_from(">H", datos, i + 2)[0]
+    return None
+
+
+def separar(cuerpo):
+    """
+    Imágenes de un cuerpo binario: cada una precedida por su largo en un
+    uint32 little-endian. Retorna vistas (memoryview) sin copiar los bytes.
+    """
+    vista = memoryview(cuerpo)
+    partes = []
+    i = 0
+    while i < len(vista):
+        if i + 4 > len(vista):
+            raise SubidaInvalida("Cuerpo truncado")
+        (largo,) = struct.unpack_from("<I", vista, i)
+        i += 4
+        if largo == 0 or i + largo > len(vista):
+            raise SubidaInvalida("Largo de imagen inválido")
+        partes.append(vista[i:i + largo])
+        i += largo
+    return partes
+
+
+def validar(partes, max_imagenes=MAX_IMAGENES):
+    """Comprobación barata (cantidad y formato) antes de encolar el trabajo"""
+    if not partes:
+        raise SubidaInvalida("No se recibieron imágenes")
+    if len(partes) > max_imagenes:
+        raise SubidaInvalida(f"Demasiadas imágenes ({len(partes)}, máximo {max_imagenes})")
+    for n, datos in enumerate(partes):
+        if formato(datos) is None:
+            raise SubidaInvalida(f"La imagen {n + 1} no es JPEG, PNG ni WebP")
+    return partes
+
+
+def decodificar(datos, lado_min=LADO_FRAME):
+    """
+    Imagen BGR desde los bytes de un JPEG/PNG/WebP, o None si no se puede
+    decodificar. El buffer se lee con np.frombuffer (sin copiar) y, si el
+    JPEG es más grande de lo necesario, se decodifica ya reducido con la
+    mayor escala que deja el lado mayor ≥ `lado_min`.
+    """
+    buf = np.frombuffer(datos, dtype=np.uint8)
+    flag = cv2.IMREAD_COLOR
+    dimensiones = dimensiones_jpeg(datos) if formato(datos) == "jpeg" else None
+    if dimensiones is not None:
+        lado = max(dimensiones)
+        for factor, reducido in REDUCCIONES:
+            if lado // factor >= lado_min:
+                flag = reducido
+                break
+    return cv2.imdecode(buf, flag)
+
+
+def decodificar_lote(partes, lado_min=LADO_FRAME):
+    """Decodifica de a una imagen (generador): si la decisión llega antes, el resto ni se decodifica"""
+    for datos in partes:
+        imagen = decodificar(datos, lado_min)
+        if imagen is not None:
+            yield imagen
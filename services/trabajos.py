@@ -0,0 +1,217 @@
+import collections
+import math
+import secrets
+import threading
+import time
+
+# ==========================
+#   PARÁMETROS POR DEFECTO
+# ==========================
+
+WORKERS = 2             # trabajos de reconocimiento simultáneos
+CAPACIDAD = 8           # trabajos en espera antes de rechazar con 429
+RETENCION = 120         # segundos que se guarda el resultado de un trabajo terminado
+DURACION_INICIAL = 1.0  # estimación (s) de un trabajo antes de haber medido ninguno
+MAX_OYENTES = 16        # streams de eventos (SSE) abiertos a la vez
+ESPERA_CIERRE = 10.0    # segundos que cerrar() espera a que terminen los trabajos en curso
+
+EN_COLA, PROCESANDO, TERMINADO, ERROR = "en_cola", "procesando", "terminado", "error"
+
+
+class ColaLlena(Exception):
+    """No hay lugar en la cola; `reintentar` = segundos sugeridos para Retry-After"""
+
+    def __init__(self, reintentar):
+        super().__init__(f"Cola de trabajos llena, reintentar en {reintentar} s")
+        self.reintentar = reintentar
+
+
+class Trabajo:
+    """
+    Una autenticación o un registro pendiente. `resultado` es el cuerpo
+    JSON de la respuesta y `codigo` su código HTTP, igual que si la
+    petición se hubiera atendido de forma síncrona.
+    """
+
+    def __init__(self, tipo, funcion, args):
+        self.id = secrets.token_urlsafe(16)
+        self.tipo = tipo
+        self.estado = EN_COLA
+        self.resultado = None
+        self.codigo = None
+        self.creado = time.time()
+        self.iniciado = None
+        self.terminado = None
+        self._funcion = funcion
+        self._args = args
+        self._cambio = threading.Condition()
+
+    @property
+    def listo(self):
+        return self.estado in (TERMINADO, ERROR)
+
+    def _cambiar(self, estado):
+        with self._cambio:
+            self.estado = estado
+            self._cambio.notify_all()
+
+    def esperar(self, desde=None, timeout=None):
+        """Espera a que el estado deje de ser `desde` (None = a que termine); retorna el estado"""
+        with self._cambio:
+            if desde is None:
+                self._cambio.wait_for(lambda: self.listo, timeout)
+            else:
+                self._cambio.wait_for(lambda: self.estado != desde, timeout)
+            return self.estado
+
+    def a_dict(self):
+        datos = {'job_id': self.id, 'type': self.tipo, 'status': self.estado}
+        if self.iniciado is not None:
+            datos['queued_ms'] = round((self.iniciado - self.creado) * 1000, 1)
+        if self.terminado is not None and self.iniciado is not None:
+            datos['run_ms'] = round((self.terminado - self.iniciado) * 1000, 1)
+        if self.listo:
+            datos['result'] = self.resultado
+            datos['http_status'] = self.codigo
+        return datos
+
+
+class ColaTrabajos:
+    """
+    Pool acotado de workers que corre los trabajos de reconocimiento
+    (captura + YOLO + ArcFace). Las rutas Flask solo encolan y responden,
+    así una ráfaga de logins no deja al servidor sin hilos: como mucho
+    `workers` trabajos usan los modelos a la vez y hasta `capacidad`
+    esperan turno. Si la cola está llena `enviar` lanza ColaLlena con una
+    estimación de cuándo habrá lugar (control de admisión → HTTP 429).
+
+    Los trabajos terminados se guardan `retencion` segundos para que el
+    cliente consulte el resultado (polling o SSE). Cada stream SSE ocupa
+    un hilo del servidor mientras espera, así que también están acotados:
+    como mucho `max_oyentes` abiertos a la vez (ver `escuchar`).
+
+    `cerrar()` (al salir del proceso) cancela lo que está en espera y
+    espera a que terminen los trabajos en curso, así ningún worker queda
+    dentro de ONNX Runtime mientras el intérprete se apaga.
+    """
+
+    def __init__(self, workers=WORKERS, capacidad=CAPACIDAD, retencion=RETENCION, max_oyentes=MAX_OYENTES):
+        self.n_workers = workers
+        self.capacidad = capacidad
+        self.retencion = retencion
+        self.max_oyentes = max_oyentes
+
+        self._pendientes = collections.deque()
+        self._trabajos = {}
+        self._lock = threading.Condition()
+        self._duracion = DURACION_INICIAL   # media móvil de lo que tarda un trabajo
+        self._en_proceso = 0
+        self._rechazados = 0
+        self._completados = 0
+        self._oyentes = 0
+        self._cerrada = False
+
+        self._hilos = []
+        for i in range(workers):
+            hilo = threading.Thread(target=self._worker, name=f"trabajos-{i}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def enviar(self, tipo, funcion, *args):
+        """Encola funcion(*args) -> (cuerpo, código HTTP); retorna el Trabajo"""
+        with self._lock:
+            self._purgar()
+            if self._cerrada or len(self._pendientes) >= self.capacidad:
+                self._rechazados += 1
+                raise ColaLlena(self._reintentar())
+
+            trabajo = Trabajo(tipo, funcion, args)
+            self._trabajos[trabajo.id] = trabajo
+            self._pendientes.append(trabajo)
+            self._lock.notify()
+            return trabajo
+
+    def escuchar(self):
+        """Reserva un lugar para un stream de eventos; False si ya hay `max_oyentes` abiertos"""
+        with self._lock:
+            if self._oyentes >= self.max_oyentes:
+                return False
+            self._oyentes += 1
+            return True
+
+    def dejar_de_escuchar(self):
+        with self._lock:
+            self._oyentes -= 1
+
+    def cerrar(self, timeout=ESPERA_CIERRE):
+        """No acepta más trabajos, cancela los que esperan y espera a los que están corriendo"""
+        with self._lock:
+            self._cerrada = True
+            cancelados = list(self._pendientes)
+            self._pendientes.clear()
+            self._lock.notify_all()
+        for trabajo in cancelados:
+            trabajo.resultado = {'success': False, 'message': 'El servidor se está cerrando'}
+            trabajo.codigo = 503
+            trabajo.terminado = time.time()
+            trabajo._funcion = trabajo._args = None
+            trabajo._cambiar(ERROR)
+
+        limite = time.perf_counter() + timeout
+        for hilo in self._hilos:
+            hilo.join(max(0.0, limite - time.perf_counter()))
+
+    def obtener(self, id_trabajo):
+        with self._lock:
+            return self._trabajos.get(id_trabajo)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'workers': self.n_workers,
+                'en_cola': len(self._pendientes),
+                'en_proceso': self._en_proceso,
+                'completados': self._completados,
+                'rechazados': self._rechazados,
+                'oyentes': self._oyentes,
+                'duracion_media_ms': round(self._duracion * 1000, 1),
+            }
+
+    def _reintentar(self):
+        """Segundos hasta que se libere un lugar: lo que tarda en terminar alguno de los workers"""
+        return max(1, math.ceil(self._duracion / self.n_workers))
+
+    def _purgar(self):
+        limite = time.time() - self.retencion
+        viejos = [i for i, t in self._trabajos.items() if t.listo and t.terminado < limite]
+        for i in viejos:
+            del self._trabajos[i]
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                self._lock.wait_for(lambda: self._pendientes or self._cerrada)
+                if not self._pendientes:
+                    return
+                trabajo = self._pendientes.popleft()
+                self._en_proceso += 1
+
+            trabajo.iniciado = time.time()
+            trabajo._cambiar(PROCESANDO)
+            try:
+                trabajo.resultado, trabajo.codigo = trabajo._funcion(*trabajo._args)
+                estado = TERMINADO
+            except Exception as e:
+                print(f"❌ Error en el trabajo {trabajo.tipo} {trabajo.id}: {e}")
+                trabajo.resultado = {'success': False, 'message': f'Error interno: {e}'}
+                trabajo.codigo = 500
+                estado = ERROR
+            trabajo.terminado = time.time()
+            # El resultado se retiene un tiempo; los argumentos (frames, imágenes) no
+            trabajo._funcion = trabajo._args = None
+
+            with self._lock:
+                self._en_proceso -= 1
+                self._completados += 1
+                self._duracion = 0.8 * self._duracion + 0.2 * (trabajo.terminado - trabajo.iniciado)
+            trabajo._cambiar(estado)
@@ -0,0 +1,187 @@
+import threading
+import time
+
+# ==========================
+#   PARÁMETROS POR DEFECTO
+# ==========================
+
+INTERVALO = 2       # detectar 1 de cada N frames (el resto reutiliza la última caja)
+MARGEN = 0.6        # la ROI se amplía este porcentaje del tamaño de la caja por lado
+REFRESCO = 10       # detecciones en ROI antes de forzar una en el frame completo
+MAX_PERDIDOS = 3    # detecciones fallidas antes de dar el track por perdido
+
+
+class EstadoTrack:
+    """
+    Estado de seguimiento de un rostro entre frames.
+
+    Mientras hay un track, YOLO corre solo en una región ampliada alrededor
+    de la última caja. Se vuelve al frame completo cada `refresco`
+    detecciones (por si entra otra persona) y en cuanto la ROI no encuentra
+    el rostro. Tras `max_perdidos` fallos seguidos el track se descarta.
+
+    Cada track nuevo recibe un `id` distinto, para poder asociarle datos
+    (p.ej. el embedding ya calculado).
+    """
+
+    def __init__(self, intervalo=INTERVALO, margen=MARGEN, refresco=REFRESCO, max_perdidos=MAX_PERDIDOS):
+        self.intervalo = intervalo
+        self.margen = margen
+        self.refresco = refresco
+        self.max_perdidos = max_perdidos
+
+        self.id = 0
+        self.caja = None
+        self.perdidos = 0
+        self._frame = 0
+        self._desde_completo = 0
+
+    @property
+    def activo(self):
+        return self.caja is not None
+
+    def debe_detectar(self):
+        """Avanza un frame; True si en este toca correr YOLO"""
+        self._frame += 1
+        return self._frame % self.intervalo == 0
+
+    def region(self, W, H):
+        """ROI (x1,y1,x2,y2) donde buscar el rostro, o None para el frame completo"""
+        if self.caja is None or self.perdidos > 0 or self._desde_completo >= self.refresco:
+            return None
+
+        x1, y1, x2, y2 = self.caja
+        # Región cuadrada (el recorte se estira a una entrada cuadrada)
+        lado = max(x2 - x1, y2 - y1) * (1 + 2 * self.margen)
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        rx1, ry1 = max(int(cx - lado / 2), 0), max(int(cy - lado / 2), 0)
+        rx2, ry2 = min(int(cx + lado / 2), W), min(int(cy + lado / 2), H)
+
+        # Si la región cubre casi todo el frame no hay nada que ahorrar
+        if (rx2 - rx1) * (ry2 - ry1) > 0.5 * W * H:
+            return None
+        return rx1, ry1, rx2, ry2
+
+    def actualizar(self, caja, roi=None):
+        """
+        Registra el resultado de una detección (caja o None) hecha en `roi`
+        (None = frame completo). Retorna la caja a usar, que durante unos
+        pocos fallos sigue siendo la última conocida (anti-parpadeo).
+        """
+        self._desde_completo = self._desde_completo + 1 if roi is not None else 0
+
+        if caja is not None:
+            if self.caja is None:
+                self.id += 1
+            self.caja = caja
+            self.perdidos = 0
+            return caja
+
+        if self.caja is not None:
+            self.perdidos += 1
+            if self.perdidos > self.max_perdidos:
+                self.caja = None
+                self.perdidos = 0
+        return self.caja
+
+    def detectar(self, pipeline, frame):
+        """
+        Corre YOLO en la ROI o en el frame completo y actualiza el track.
+        Si el modelo no admite la entrada reducida (pipeline.entrada_roi
+        None) siempre usa el frame completo.
+        """
+        H, W = frame.shape[:2]
+        roi = self.region(W, H) if pipeline.entrada_roi is not None else None
+        if roi is None:
+            _, _, caja, _ = pipeline.detect(frame)
+        else:
+            _, _, caja, _ = pipeline.detect_roi(frame, roi)
+        return self.actualizar(caja, roi)
+
+
+# ==========================
+#   CACHE DE IDENTIDAD
+# ==========================
+
+MAX_DESPLAZAMIENTO = 0.15   # movimiento del centro (fracción del tamaño de la caja)
+MAX_CAMBIO_ESCALA = 0.20    # cambio relativo del tamaño de la caja
+MAX_EDAD = 2.0              # segundos antes de recalcular el embedding igualmente
+UMBRAL_REUTILIZAR = 0.45    # solo se reutilizan coincidencias con distancia menor
+
+
+class _Identidad:
+    def __init__(self, caja, embedding, resultado, instante):
+        self.caja = caja
+        self.embedding = embedding
+        self.resultado = resultado      # (usuario, distancia, acceso)
+        self.instante = instante
+
+
+class CacheIdentidad:
+    """
+    Último embedding y resultado por track, para no correr ArcFace en
+    cada frame mientras la misma persona sigue quieta frente a la cámara.
+
+    Una entrada deja de valer si la caja se movió o cambió de tamaño más
+    de lo permitido, si pasó `max_edad` o si la coincidencia no era lo
+    bastante fuerte (distancia >= `umbral`). Lo que se reutiliza es el
+    embedding: quien lo use debe volver a compararlo con la galería
+    (es barato), así un cambio de acceso o un usuario borrado se ve al
+    instante.
+
+    Es seguro usarla desde varios hilos (peticiones Flask).
+    """
+
+    def __init__(self, max_desplazamiento=MAX_DESPLAZAMIENTO, max_cambio_escala=MAX_CAMBIO_ESCALA,
+                 max_edad=MAX_EDAD, umbral=UMBRAL_REUTILIZAR):
+        self.max_desplazamiento = max_desplazamiento
+        self.max_cambio_escala = max_cambio_escala
+        self.max_edad = max_edad
+        self.umbral = umbral
+
+        self._entradas = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, track_id, caja, ahora=None):
+        """Embedding guardado para el track si sigue siendo válido, o None"""
+        ahora = time.monotonic() if ahora is None else ahora
+        with self._lock:
+            entrada = self._entradas.get(track_id)
+        if entrada is None:
+            return None
+
+        if (ahora - entrada.instante > self.max_edad
+                or entrada.resultado[1] >= self.umbral
+                or not self._misma_caja(entrada.caja, caja)):
+            return None
+        return entrada.embedding
+
+    def guardar(self, track_id, caja, embedding, resultado, ahora=None):
+        """Registra un embedding recién calculado y su resultado"""
+        ahora = time.monotonic() if ahora is None else ahora
+        with self._lock:
+            self._entradas[track_id] = _Identidad(caja, embedding, resultado, ahora)
+
+    def actualizar_resultado(self, track_id, resultado):
+        """Nuevo resultado de un embedding reutilizado (no renueva la edad)"""
+        with self._lock:
+            entrada = self._entradas.get(track_id)
+            if entrada is not None:
+                entrada.resultado = resultado
+
+    def olvidar(self, track_id):
+        with self._lock:
+            self._entradas.pop(track_id, None)
+
+    def _misma_caja(self, a, b):
+        aw, ah = a[2] - a[0], a[3] - a[1]
+        bw, bh = b[2] - b[0], b[3] - b[1]
+        lado = max(aw, ah, 1)
+
+        dx = abs((a[0] + a[2]) - (b[0] + b[2])) / 2
+        dy = abs((a[1] + a[3]) - (b[1] + b[3])) / 2
+        if max(dx, dy) > self.max_desplazamiento * lado:
+            return False
+
+        escala = max(bw, bh) / lado
+        return abs(escala - 1) <= self.max_cambio_escala
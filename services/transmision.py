@@ -0,0 +1,225 @@
+import threading
+import time
+import cv2
+
+# ==========================
+#   PARÁMETROS POR DEFECTO
+# ==========================
+
+CALIDAD = 70            # calidad JPEG (0-100) del stream
+LADO_MAX = 640          # lado mayor de los frames del stream (None = resolución de la cámara)
+FPS_MAX = 15            # frames codificados por segundo como máximo
+OVERLAY_CADA = 5        # con overlay: reconocer 1 de cada N frames codificados (el resto reusa las cajas)
+
+FRONTERA = b"frame"
+
+
+def dibujar_rostros(frame, rostros, escala=1.0):
+    """Cajas y nombres (verde = acceso, rojo = desconocido o sin acceso) sobre el frame, en el lugar"""
+    for rostro in rostros:
+        x1, y1, x2, y2 = (int(v * escala) for v in rostro['caja'])
+        color = (0, 255, 0) if rostro.get('reconocido') and rostro['acceso'] else (0, 0, 255)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, rostro['etiqueta'], (x1, max(y1 - 8, 12)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+
+class _Promedio:
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+
+    def agregar(self, valor):
+        self.n += 1
+        self.total += valor
+
+    def media(self, factor=1.0):
+        return round(self.total / self.n * factor, 2) if self.n else None
+
+
+class Difusor:
+    """
+    Stream MJPEG de la cámara compartido por todos los clientes de
+    /video_feed. Un solo hilo toma el último frame de la CapturaCamara,
+    lo reduce a `lado_max`, lo codifica a JPEG con `calidad` y publica
+    la parte multipart ya armada; cada suscriptor envía esos mismos
+    bytes, así que una pestaña más no agrega codificaciones.
+
+    El hilo codifica como mucho `fps_max` frames por segundo y se queda
+    dormido mientras no haya suscriptores. Un suscriptor lento se salta
+    frames (siempre recibe el último) en lugar de acumular retraso.
+
+    `reconocer(frame) -> rostros` opcional dibuja el overlay: corre 1 de
+    cada `overlay_cada` frames y en el resto se redibujan las últimas
+    cajas. Cada rostro es un dict con caja, etiqueta, acceso y reconocido.
+    Si `reconocer` retorna None o falla (ORT, galería cargando, base caída)
+    el stream sigue con las últimas cajas; el error se muestra una vez.
+    """
+
+    def __init__(self, camara, calidad=CALIDAD, lado_max=LADO_MAX, fps_max=FPS_MAX, reconocer=None,
+                 overlay_cada=OVERLAY_CADA):
+        self.camara = camara
+        self.calidad = calidad
+        self.lado_max = lado_max
+        self.fps_max = fps_max
+        self.reconocer = reconocer
+        self.overlay_cada = overlay_cada
+
+        self._cond = threading.Condition()
+        self._suscriptores = 0
+        self._seq = -1
+        self._parte = None          # última parte multipart publicada
+        self._activo = False
+        self._hilo = None
+
+        self._codificados = 0
+        self._codificacion = _Promedio()    # segundos de resize + overlay + imencode por frame
+        self._overlay = _Promedio()         # segundos de reconocer() cuando corre
+        self._fallos_overlay = 0
+        self._fallando = False
+        self._tamano = _Promedio()          # bytes por frame
+        self._enviados = 0                  # partes entregadas, sumando todos los suscriptores
+        self._inicio = None
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._activo = True
+            self._inicio = time.perf_counter()
+            self._hilo = threading.Thread(target=self._bucle, name="difusor", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self):
+        self._activo = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._hilo is not None:
+            self._hilo.join(timeout=2)
+            self._hilo = None
+
+    @property
+    def activo(self):
+        return self._activo and self.camara.activo
+
+    @property
+    def suscriptores(self):
+        return self._suscriptores
+
+    # ==========================
+    #   SUSCRIPTORES
+    # ==========================
+
+    def suscribir(self):
+        """
+        Generador de partes multipart (bytes) para una respuesta
+        multipart/x-mixed-replace. La suscripción termina cuando el
+        generador se cierra (Flask lo cierra al desconectarse el cliente).
+        """
+        with self._cond:
+            self._suscriptores += 1
+            self._cond.notify_all()
+        try:
+            seq = -1
+            while self.activo:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._seq > seq or not self.activo, timeout=1.0)
+                    if self._seq <= seq:
+                        continue
+                    seq, parte = self._seq, self._parte
+                    self._enviados += 1
+                yield parte
+        finally:
+            with self._cond:
+                self._suscriptores -= 1
+
+    # ==========================
+    #   CODIFICACIÓN
+    # ==========================
+
+    def _bucle(self):
+        try:
+            self._difundir()
+        finally:
+            # Si el hilo termina (detener() o un error inesperado) los suscriptores no quedan esperando
+            with self._cond:
+                self._activo = False
+                self._cond.notify_all()
+
+    def _difundir(self):
+        periodo = 1.0 / self.fps_max if self.fps_max else 0
+        siguiente = time.perf_counter()
+        seq_camara = -1
+        rostros = []
+
+        while self.activo:
+            # Sin suscriptores no se codifica nada
+            with self._cond:
+                self._cond.wait_for(lambda: self._suscriptores > 0 or not self._activo, timeout=1.0)
+                if not self._suscriptores:
+                    continue
+
+            # Límite de FPS: esperar el turno y tomar el frame más reciente
+            espera = siguiente - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            dato = self.camara.esperar(desde=seq_camara)
+            if dato is None:
+                continue
+            seq_camara, _, frame = dato
+            siguiente = max(siguiente + periodo, time.perf_counter()) if periodo else 0
+
+            t0 = time.perf_counter()
+            if self.reconocer is not None and self._codificados % self.overlay_cada == 0:
+                rostros = self._reconocer(frame, rostros)
+                self._overlay.agregar(time.perf_counter() - t0)
+            parte = self._codificar(frame, rostros)
+            self._codificacion.agregar(time.perf_counter() - t0)
+            self._tamano.agregar(len(parte))
+
+            with self._cond:
+                self._seq += 1
+                self._parte = parte
+                self._codificados += 1
+                self._cond.notify_all()
+
+    def _reconocer(self, frame, anteriores):
+        """self.reconocer(frame), o los `anteriores` si no hay resultado nuevo"""
+        try:
+            rostros = self.reconocer(frame)
+        except Exception as e:
+            self._fallos_overlay += 1
+            if not self._fallando:
+                print(f"⚠ Overlay de /video_feed: {e} (se mantienen las últimas cajas)")
+            self._fallando = True
+            return anteriores
+        self._fallando = False
+        return anteriores if rostros is None else rostros
+
+    def _codificar(self, frame, rostros):
+        alto, ancho = frame.shape[:2]
+        escala = 1.0
+        if self.lado_max and max(alto, ancho) > self.lado_max:
+            escala = self.lado_max / max(alto, ancho)
+            # resize crea un frame nuevo: el de la cámara (compartido) no se toca
+            frame = cv2.resize(frame, (round(ancho * escala), round(alto * escala)), interpolation=cv2.INTER_AREA)
+        elif rostros:
+            frame = frame.copy()
+        if rostros:
+            dibujar_rostros(frame, rostros, escala)
+
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.calidad])
+        jpeg = buffer.tobytes()
+        return (b"--" + FRONTERA + b"\r\nContent-Type: image/jpeg\r\nContent-Length: " +
+                str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n")
+
+    def estadisticas(self):
+        segundos = time.perf_counter() - self._inicio if self._inicio else 0
+        return {
+            'suscriptores': self._suscriptores,
+            'frames_codificados': self._codificados,
+            'fps': round(self._codificados / segundos, 1) if segundos else None,
+            'codificacion_ms': self._codificacion.media(1000),
+            'overlay_ms': self._overlay.media(1000),
+            'overlay_fallos': self._fallos_overlay,
+            'kb_por_frame': self._tamano.media(1 / 1024),
+            'partes_enviadas': self._enviados,
+        }
@@ -0,0 +1,110 @@
+import numpy as np
+
+# ==========================
+#   PARÁMETROS POR DEFECTO
+# ==========================
+
+CONF_UMBRAL = 0.55   # confianza mínima de detección
+TAM_MINIMO = 50      # ancho/alto mínimo de la caja (px del frame original)
+IOU_UMBRAL = 0.45    # solapamiento máximo permitido entre cajas tras NMS
+ENTRADA_YOLO = (640, 640)
+
+
+def nms(cajas, iou_umbral=IOU_UMBRAL):
+    """
+    Non-Maximum Suppression vectorizado.
+    cajas: (K,4) x1,y1,x2,y2 ordenadas por confianza descendente.
+    Retorna los índices (sobre `cajas`) que sobreviven.
+    """
+    if len(cajas) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    x1, y1, x2, y2 = cajas.astype(np.float32).T
+    areas = (x2 - x1) * (y2 - y1)
+
+    restantes = np.arange(len(cajas))
+    keep = []
+    while restantes.size > 0:
+        i = restantes[0]
+        keep.append(i)
+        resto = restantes[1:]
+
+        ix1 = np.maximum(x1[i], x1[resto])
+        iy1 = np.maximum(y1[i], y1[resto])
+        ix2 = np.minimum(x2[i], x2[resto])
+        iy2 = np.minimum(y2[i], y2[resto])
+
+        inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+        iou = inter / (areas[i] + areas[resto] - inter + 1e-9)
+
+        restantes = resto[iou <= iou_umbral]
+
+    return np.asarray(keep, dtype=np.intp)
+
+
+def decodificar_yolo(salida, W, H, conf_umbral=CONF_UMBRAL, tam_minimo=TAM_MINIMO,
+                     iou_umbral=IOU_UMBRAL, entrada=ENTRADA_YOLO, escala=None, padding=(0, 0)):
+    """
+    Decodifica la salida (1,5,N) de YOLO face sin recorrerla anclaje por anclaje.
+
+    Aplica umbral de confianza, tamaño mínimo, caja dentro del frame,
+    re-escalado a (W,H) y NMS (iou_umbral=None lo desactiva).
+
+    Por defecto asume que el frame se estiró a `entrada`. Con letterbox o
+    entrada rectangular se indica la transformación inversa:
+    x_frame = (x_modelo - padding_x) * escala_x (igual para y).
+
+    Retorna (cajas, confs, best_box, best_conf):
+      cajas     -> ndarray (K,4) int32 x1,y1,x2,y2 ordenadas por confianza
+      confs     -> ndarray (K,) float32
+      best_box  -> tupla (x1,y1,x2,y2) de mayor confianza, o None
+      best_conf -> confianza de best_box (0 si no hay)
+    """
+    out = np.asarray(salida).reshape(5, -1)
+    xs, ys, ws, hs, scores = out
+
+    # Descartar primero por confianza: normalmente quedan muy pocas anclas
+    idx = np.flatnonzero(scores > conf_umbral)
+    if idx.size == 0:
+        return np.empty((0, 4), dtype=np.int32), np.empty(0, dtype=np.float32), None, 0
+
+    if escala is None:
+        escala = (W / entrada[0], H / entrada[1])
+    scale_x, scale_y = escala
+    pad_x, pad_y = padding
+
+    cx = (xs[idx] - pad_x) * scale_x
+    cy = (ys[idx] - pad_y) * scale_y
+    w_box = ws[idx] * scale_x
+    h_box = hs[idx] * scale_y
+
+    # astype trunca hacia cero, igual que int()
+    x1 = (cx - w_box / 2).astype(np.int32)
+    y1 = (cy - h_box / 2).astype(np.int32)
+    x2 = (cx + w_box / 2).astype(np.int32)
+    y2 = (cy + h_box / 2).astype(np.int32)
+
+    validas = (
+        (w_box >= tam_minimo) & (h_box >= tam_minimo) &
+        (x1 >= 0) & (y1 >= 0) & (x2 <= W) & (y2 <= H)
+    )
+    if not validas.any():
+        return np.empty((0, 4), dtype=np.int32), np.empty(0, dtype=np.float32), None, 0
+
+    cajas = np.stack([x1, y1, x2, y2], axis=1)[validas]
+    confs = scores[idx][validas]
+
+    # Orden estable: ante empates gana el ancla de menor índice (como el bucle original)
+    orden = np.argsort(-confs, kind="stable")
+    cajas = cajas[orden]
+    confs = confs[orden]
+
+    if iou_umbral is not None:
+        keep = nms(cajas, iou_umbral)
+        cajas = cajas[keep]
+        confs = confs[keep]
+
+    best_box = tuple(int(v) for v in cajas[0])
+    best_conf = confs[0]
+
+    return cajas, confs, best_box, best_conf
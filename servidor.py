@@ -0,0 +1,93 @@
+"""
+Servidor de reconocimiento multi-cámara: un solo proceso (modelos
+cargados una vez) atiende varias puertas.
+
+    python servidor.py 0 1
+    python servidor.py rtsp://10.0.0.5/stream puerta2.mp4 --workers 3
+
+Cada fuente puede ser un índice de cámara, una URL RTSP/HTTP o un
+archivo de video. Los resultados de cada fuente se imprimen por su
+propio canal; Ctrl+C para salir.
+"""
+import argparse
+import os
+import threading
+import time
+from core.config import Settings
+from core.database import SessionLocal
+from services.face_recognizer import obtener_usuarios, CacheGaleria, GaleriaCompartida
+from services.pipeline import FacePipeline
+from services.indice_ann import preparar_indice
+from services.multicamara import ServidorMultiCamara, WORKERS
+from services.decision import UMBRAL_RECONOCIDO
+from session_options import FabricaSesiones
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INDICE_ANN = os.path.join(BASE_DIR, "models", "indice_ivf.npz")
+
+
+def fuente(valor):
+    return int(valor) if valor.isdigit() else valor
+
+
+def mostrar_resultados(nombre, canal):
+    """Consumidor del canal de una fuente: imprime los rostros reconocidos"""
+    while True:
+        resultado = canal.get()
+        if resultado is None:
+            return
+        rostros = [
+            f"{r['usuario'] if r['distancia'] < UMBRAL_RECONOCIDO else 'DESCONOCIDO'} ({r['distancia']:.3f})"
+            for r in resultado['rostros']
+        ]
+        if rostros:
+            print(f"[{nombre}] frame {resultado['seq']}: {', '.join(rostros)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fuentes", nargs="+", type=fuente)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--principal", action="store_true", help="solo el rostro de mayor confianza por frame")
+    args = parser.parse_args()
+
+    # Los workers se reparten los núcleos en lugar de pedir 8 hilos cada uno
+    fabrica = FabricaSesiones(concurrencia=args.workers)
+    pipeline = FacePipeline(fabrica=fabrica)
+
+    def cargar_base():
+        db = SessionLocal()
+        base_usuarios = obtener_usuarios(db)
+        db.close()
+        return base_usuarios
+
+    if Settings.GALERIA_INSTANTANEA:
+        # Misma instantánea que app.py: los cambios del panel de administración se ven aquí
+        galeria = GaleriaCompartida(Settings.GALERIA_INSTANTANEA, cargar=cargar_base)
+        galeria.asignar_indice(preparar_indice(galeria.galeria, INDICE_ANN))
+    else:
+        base_usuarios = cargar_base()
+        galeria = CacheGaleria(base_usuarios, preparar_indice(base_usuarios, INDICE_ANN))
+    print(f"✔ Usuarios cargados: {len(galeria.galeria)}")
+
+    servidor = ServidorMultiCamara(args.fuentes, pipeline, galeria, workers=args.workers,
+                                   todas=not args.principal)
+    for flujo in servidor.flujos:
+        threading.Thread(target=mostrar_resultados, args=(flujo.nombre, flujo.resultados), daemon=True).start()
+
+    servidor.iniciar()
+    print(f"🎥 {len(servidor.flujos)} fuentes, {args.workers} workers | ONNX: {fabrica.describir()}")
+
+    try:
+        while True:
+            time.sleep(10)
+            for nombre, stats in servidor.estadisticas().items():
+                print(f"📊 {nombre}: {stats}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.detener()
+
+
+if __name__ == "__main__":
+    main()
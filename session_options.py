@@ -1,17 +1,281 @@
+import hashlib
+import json
+import math
+import os
+import platform
 import onnxruntime as ort
+from core.config import Settings
 
-def get_optimized_session(model_path):
-    so = ort.SessionOptions()
-    so.intra_op_num_threads = 8     
-    so.inter_op_num_threads = 8
-
-    # optimizador de grafos
-    so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
-
-    return ort.InferenceSession(
-        model_path,
-        sess_options=so,
-        providers=[
-            "CPUExecutionProvider"
-        ]
-    )
+# API privada de ONNX Runtime para fijar el pool global: puede desaparecer
+# en cualquier versión, así que se comprueba antes de usarla
+try:
+    from onnxruntime.capi import _pybind_state
+except ImportError:
+    _pybind_state = None
+_fijar_pool_global = getattr(_pybind_state, "set_global_thread_pool_sizes", None)
+
+# ==========================
+#   CPUS DISPONIBLES
+# ==========================
+
+def cpus_disponibles():
+    """
+    Núcleos que este proceso puede usar de verdad: afinidad de CPU
+    limitada por la cuota de cgroup (contenedores, systemd CPUQuota).
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # Windows / macOS
+        cpus = os.cpu_count() or 1
+
+    cuota = _cuota_cgroup()
+    if cuota is not None:
+        cpus = min(cpus, max(1, math.ceil(cuota)))
+    return cpus
+
+
+def _cuota_cgroup():
+    """Cuota de CPU en núcleos (cgroup v2 o v1), o None si no hay límite"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            cuota, periodo = f.read().split()
+        if cuota != "max":
+            return int(cuota) / int(periodo)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            cuota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            periodo = int(f.read())
+        if cuota > 0 and periodo > 0:
+            return cuota / periodo
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+# ==========================
+#   VARIANTES CUANTIZADAS
+# ==========================
+
+# Generadas con tools/cuantizar.py junto al modelo original:
+# models/arcface_r100.onnx -> models/arcface_r100.int8_estatico.onnx
+VARIANTES = ("fp32", "int8_dinamico", "int8_estatico", "fp16")
+
+
+def ruta_variante(model_path, variante):
+    """Ruta del modelo en la variante pedida (FP32 si no se generó)"""
+    if variante in (None, "fp32"):
+        return model_path
+    if variante not in VARIANTES:
+        raise ValueError(f"Variante de modelo desconocida: {variante}")
+
+    base, ext = os.path.splitext(model_path)
+    ruta = f"{base}.{variante}{ext}"
+    if not os.path.exists(ruta):
+        print(f"⚠ No existe {ruta} (ver tools/cuantizar.py); se usa FP32")
+        return model_path
+    return ruta
+
+
+# ==========================
+#   CACHE DE GRAFOS OPTIMIZADOS
+# ==========================
+
+# Nivel al que se guarda el grafo en cache. Las optimizaciones de nivel
+# ALL agregan transformaciones de layout (NCHWc) que dependen de las
+# instrucciones del CPU: un grafo guardado así puede no servir en otra
+# máquina x86_64 que comparta el directorio. Hasta EXTENDED (fusiones,
+# constantes plegadas) el grafo es portable; el layout se aplica al cargar.
+NIVEL_CACHE = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+
+def huella_modelo(ruta, directorio_cache):
+    """
+    SHA-256 del archivo del modelo. Se recuerda por (tamaño, mtime) en el
+    directorio de cache para no volver a leer 250 MB en cada arranque.
+    """
+    stat = os.stat(ruta)
+    firma = [stat.st_size, stat.st_mtime_ns]
+    indice_ruta = os.path.join(directorio_cache, "huellas.json")
+    try:
+        with open(indice_ruta) as f:
+            indice = json.load(f)
+    except (OSError, ValueError):
+        indice = {}
+
+    previa = indice.get(os.path.abspath(ruta))
+    if previa is not None and previa["firma"] == firma:
+        return previa["sha256"]
+
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+
+    indice[os.path.abspath(ruta)] = {"firma": firma, "sha256": h.hexdigest()}
+    tmp = f"{indice_ruta}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(indice, f)
+    os.replace(tmp, indice_ruta)
+    return h.hexdigest()
+
+
+def ruta_optimizada(ruta, directorio_cache, opciones):
+    """
+    Ruta del grafo ya optimizado (hasta NIVEL_CACHE) para este modelo en
+    el directorio de cache. La clave combina el hash del modelo, la versión
+    de ONNX Runtime, la arquitectura y las opciones que cambian el grafo
+    resultante.
+    """
+    clave = "|".join([
+        huella_modelo(ruta, directorio_cache), ort.__version__, platform.machine(), ort.get_device(),
+        str(NIVEL_CACHE), str(opciones.execution_mode),
+    ])
+    nombre = os.path.splitext(os.path.basename(ruta))[0]
+    return os.path.join(directorio_cache, f"{nombre}.{hashlib.sha256(clave.encode()).hexdigest()[:16]}.onnx")
+
+
+# ==========================
+#   FÁBRICA DE SESIONES
+# ==========================
+
+MODOS = {
+    "secuencial": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "paralelo": ort.ExecutionMode.ORT_PARALLEL,
+}
+
+# Tamaños del pool global del proceso: ONNX Runtime solo permite fijarlos
+# una vez, antes de crear la primera sesión
+_pool_global = None
+
+
+class FabricaSesiones:
+    """
+    Crea las sesiones ONNX de un proceso con un reparto de hilos coherente.
+
+    - hilos intra-op = núcleos disponibles / `concurrencia` (cuántas
+      inferencias corren a la vez: workers, peticiones Flask simultáneas)
+    - modo "secuencial" (inter-op = 1) o "paralelo" (ramas del grafo en
+      paralelo, inter-op = núcleos / intra)
+    - spinning: los hilos esperan trabajo girando en lugar de dormir. Baja
+      la latencia si hay núcleos de sobra, pero con varias sesiones o
+      varias inferencias a la vez les roba CPU a las demás. None = solo
+      si todos los hilos caben en los núcleos. (Solo aplica a pools por
+      sesión; el pool global usa el valor por defecto de ONNX Runtime.)
+    - pool_global: todas las sesiones comparten un único pool de hilos en
+      lugar de uno por sesión (YOLO y ArcFace corren uno tras otro, no
+      necesitan hilos propios).
+
+    Con `cache` (por defecto Settings.ORT_CACHE_DIR; False lo desactiva)
+    el grafo optimizado hasta NIVEL_CACHE se guarda la primera vez y los
+    arranques siguientes lo cargan directamente; al cargarlo solo quedan
+    por aplicar las optimizaciones de layout, propias de cada CPU.
+
+    Los parámetros que no se indican salen de Settings.ORT_*.
+    """
+
+    def __init__(self, concurrencia=None, n_sesiones=2, hilos=None, modo=None, spinning=None,
+                 pool_global=None, cache=None):
+        self.cpus = cpus_disponibles()
+        self.concurrencia = max(1, concurrencia or Settings.ORT_CONCURRENCIA)
+        self.n_sesiones = n_sesiones
+        self.modo = modo or Settings.ORT_MODO
+        if self.modo not in MODOS:
+            raise ValueError(f"Modo de ejecución ONNX desconocido: {self.modo}")
+
+        self.intra = hilos or Settings.ORT_HILOS or max(1, self.cpus // self.concurrencia)
+        self.inter = 1 if self.modo == "secuencial" else max(1, self.cpus // self.intra)
+
+        self.pool_global = Settings.ORT_POOL_GLOBAL if pool_global is None else pool_global
+        if self.pool_global and _fijar_pool_global is None:
+            print(f"⚠ ONNX Runtime {ort.__version__} no permite fijar el pool global de hilos; "
+                  f"se usan hilos por sesión")
+            self.pool_global = False
+        if spinning is None:
+            spinning = Settings.ORT_SPINNING
+        if spinning is None:
+            hilos_totales = self.intra * self.concurrencia * (1 if self.pool_global else self.n_sesiones)
+            spinning = hilos_totales <= self.cpus
+        self.spinning = spinning
+
+        self.cache = Settings.ORT_CACHE_DIR if cache is None else (cache or None)
+
+        if self.pool_global:
+            self._preparar_pool_global()
+
+    def _preparar_pool_global(self):
+        global _pool_global
+        if _pool_global is None:
+            _pool_global = (self.intra, self.inter)
+            _fijar_pool_global(self.intra, self.inter)
+        elif _pool_global != (self.intra, self.inter):
+            print(f"⚠ El pool global ya existe con {_pool_global[0]}/{_pool_global[1]} hilos; se reutiliza")
+            self.intra, self.inter = _pool_global
+
+    def opciones(self):
+        so = ort.SessionOptions()
+        so.execution_mode = MODOS[self.modo]
+
+        if self.pool_global:
+            so.use_per_session_threads = False
+        else:
+            so.intra_op_num_threads = self.intra
+            so.inter_op_num_threads = self.inter
+            spinning = "1" if self.spinning else "0"
+            so.add_session_config_entry("session.intra_op.allow_spinning", spinning)
+            so.add_session_config_entry("session.inter_op.allow_spinning", spinning)
+
+        # optimizador de grafos
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return so
+
+    def crear(self, model_path, variante=None):
+        model_path = ruta_variante(model_path, variante)
+        so = self.opciones()
+
+        if self.cache:
+            os.makedirs(self.cache, exist_ok=True)
+            optimizado = ruta_optimizada(model_path, self.cache, so)
+            if not os.path.exists(optimizado):
+                # Arranque en frío: ORT escribe el grafo optimizado (hasta
+                # NIVEL_CACHE) al crear una sesión solo para eso. Nombre
+                # temporal por proceso + rename atómico: varios workers
+                # pueden arrancar a la vez
+                tmp = f"{optimizado}.{os.getpid()}.tmp"
+                guardar = self.opciones()
+                guardar.graph_optimization_level = NIVEL_CACHE
+                guardar.optimized_model_filepath = tmp
+                self._sesion(model_path, guardar)
+                if not os.path.exists(tmp):
+                    return self._sesion(model_path, so)
+                os.replace(tmp, optimizado)
+            # El grafo ya está optimizado: ORT solo aplica lo que falta (layout de este CPU)
+            model_path = optimizado
+
+        return self._sesion(model_path, so)
+
+    @staticmethod
+    def _sesion(model_path, so):
+        return ort.InferenceSession(
+            model_path,
+            sess_options=so,
+            providers=[
+                "CPUExecutionProvider"
+            ]
+        )
+
+    def describir(self):
+        if self.pool_global:
+            hilos = "pool global"
+        else:
+            hilos = f"pool por sesión, spinning={'sí' if self.spinning else 'no'}"
+        return (f"{self.cpus} CPUs, concurrencia {self.concurrencia}: intra={self.intra} inter={self.inter} "
+                f"{self.modo}, {hilos}")
+
+
+def get_optimized_session(model_path, hilos=None, fabrica=None, variante=None):
+    fabrica = fabrica or FabricaSesiones(n_sesiones=1, hilos=hilos)
+    return fabrica.crear(model_path, variante)
@@ -0,0 +1,96 @@
+"""
+Mide el costo de arranque de app.py:
+
+  - tiempo de `import app` (no debe cargar modelos, OpenCV ni conectar a la base)
+  - latencia de la primera petición a /login y a /authenticate, sin y con
+    calentamiento (create_app(calentar_modelos=True)), y de la segunda
+    /authenticate como referencia
+
+    python tests/medir_arranque.py
+
+Cada caso corre en un proceso nuevo con una base SQLite temporal y una
+cámara sintética, así no necesita Postgres ni cámara. Requiere models/*.onnx.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def caso(calentar):
+    """Corre dentro del subproceso"""
+    sys.path.insert(0, RAIZ)
+    from core.config import Settings
+    Settings.DATABASE_URL = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "arranque.db")
+
+    t0 = time.perf_counter()
+    import app as modulo
+    importar = time.perf_counter() - t0
+
+    from services import recursos
+    cargado = recursos._pipeline is not None or recursos._galeria is not None
+    opencv = 'cv2' in sys.modules
+
+    from core.database import init_db
+    from services.camara import FuenteSintetica
+    init_db()
+    Settings.CAMERA_SOURCE = FuenteSintetica()
+
+    t0 = time.perf_counter()
+    flask_app = modulo.create_app(calentar_modelos=calentar)
+    crear = time.perf_counter() - t0
+    cliente = flask_app.test_client()
+
+    def peticion(metodo, ruta):
+        t0 = time.perf_counter()
+        respuesta = getattr(cliente, metodo)(ruta)
+        ms = (time.perf_counter() - t0) * 1000
+        assert respuesta.status_code == 200, f"{ruta}: {respuesta.status_code}"
+        return ms
+
+    return {
+        'import_ms': importar * 1000,
+        'cargado_al_importar': cargado,
+        'opencv_al_importar': opencv,
+        'create_app_ms': crear * 1000,
+        'login_ms': peticion('get', '/login'),
+        'authenticate_ms': peticion('post', '/authenticate'),
+        'authenticate_2_ms': peticion('post', '/authenticate'),
+    }
+
+
+def medir(calentar):
+    salida = subprocess.run([sys.executable, __file__, "--caso", "1" if calentar else "0"],
+                            capture_output=True, text=True, cwd=RAIZ)
+    if salida.returncode != 0:
+        raise RuntimeError(salida.stderr)
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--caso":
+        print(json.dumps(caso(sys.argv[2] == "1")))
+        sys.exit(0)
+
+    ok = True
+    for calentar in (False, True):
+        r = medir(calentar)
+        print(f"\n== {'con' if calentar else 'sin'} calentamiento")
+        print(f"import app           : {r['import_ms']:8.1f} ms")
+        print(f"create_app           : {r['create_app_ms']:8.1f} ms")
+        print(f"1ª GET /login        : {r['login_ms']:8.1f} ms")
+        print(f"1ª POST /authenticate: {r['authenticate_ms']:8.1f} ms")
+        print(f"2ª POST /authenticate: {r['authenticate_2_ms']:8.1f} ms")
+        if r['cargado_al_importar']:
+            print("❌ Importar app.py cargó modelos o la galería")
+            ok = False
+        if r['opencv_al_importar']:
+            print("❌ Importar app.py cargó OpenCV (cv2)")
+            ok = False
+
+    print("\n✔ OK" if ok else "\n❌ FALLÓ")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,74 @@
+"""
+Comprueba que el login de la cámara del servidor no arrastra la
+identidad de una petición a la siguiente: una segunda persona que se
+pone en el mismo lugar justo después de un login válido debe ser
+comparada con su propio rostro y rechazada.
+
+    python tests/test-autenticacion.py
+
+No usa modelos ni base de datos: el pipeline y la cámara se reemplazan
+por versiones mínimas que devuelven siempre la misma caja y el
+embedding de la persona que esté "frente a la cámara".
+"""
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import app as modulo
+from services.face_recognizer import Galeria, CacheGaleria
+
+CAJA = (200, 120, 320, 260)
+DIM = 512
+
+
+class PipelineFalso:
+    def __init__(self):
+        self.embedding = None   # rostro de quien está frente a la cámara
+
+    def detect(self, frame):
+        return np.array([CAJA]), np.array([0.9]), CAJA, 0.9
+
+    def recortar(self, frame, caja):
+        return frame
+
+    def embed(self, recortes):
+        return np.repeat(self.embedding[None, :], len(recortes), axis=0)
+
+
+class CamaraFalsa:
+    def flujo(self, max_frames):
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        for n in range(max_frames):
+            yield n, 0.0, frame
+
+
+rng = np.random.default_rng(0)
+ana, otra = rng.normal(size=(2, DIM)).astype(np.float32)
+
+galeria = CacheGaleria(Galeria(np.array([1]), ["ana"], ana[None, :], [True]))
+pipeline = PipelineFalso()
+
+modulo.obtener_pipeline = lambda: pipeline
+modulo.obtener_galeria = lambda: galeria
+modulo.obtener_camara = lambda: CamaraFalsa()
+
+ok = True
+
+pipeline.embedding = ana
+cuerpo, _ = modulo.autenticar_camara()
+print("ana       :", cuerpo['message'])
+if not cuerpo['success'] or cuerpo['user'] != "ana":
+    print("❌ ana debería entrar")
+    ok = False
+
+# Otra persona, misma caja, inmediatamente después
+pipeline.embedding = otra
+cuerpo, _ = modulo.autenticar_camara()
+print("otra      :", cuerpo['message'])
+if cuerpo['success']:
+    print("❌ Otra persona en la misma caja entró como", cuerpo.get('user'))
+    ok = False
+
+print("\n✔ OK" if ok else "\n❌ FALLÓ")
+sys.exit(0 if ok else 1)
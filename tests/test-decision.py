@@ -0,0 +1,46 @@
+"""
+Comprueba que PoliticaDecision no acepta con una coincidencia débil que
+fue contradicha por frames claramente desconocidos posteriores.
+
+    python tests/test-decision.py
+
+No usa modelos: cada frame es directamente (usuario, distancia, acceso).
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services.decision import PoliticaDecision, UMBRAL_RECONOCIDO
+
+DEBIL = ("ana", 0.50, True)         # reconocida, pero no segura
+AJENO = ("ana", 0.90, True)         # claramente desconocido
+
+
+def aceptado(frames, **parametros):
+    """Corre la secuencia como autenticar_camara y retorna (aceptado, motivo)"""
+    politica = PoliticaDecision(**parametros)
+    for frame in frames:
+        politica.agregar(*frame)
+        if politica.decidido:
+            break
+    mejor = politica.resultado()
+    return mejor is not None and mejor['distancia'] < UMBRAL_RECONOCIDO and mejor['acceso'], politica.motivo
+
+
+casos = [
+    # (nombre, frames, parámetros, debe aceptar)
+    ("débil, ajeno, ajeno (presupuesto)", [DEBIL, AJENO, AJENO], {'max_frames': 3}, False),
+    ("débil, ajeno, ajeno (rechazo)", [DEBIL, AJENO, AJENO], {'min_rechazo': 2}, False),
+    ("débil, ajeno, débil (presupuesto)", [DEBIL, AJENO, DEBIL], {'max_frames': 3}, True),
+    ("débil, débil", [DEBIL, DEBIL], {}, True),
+]
+
+ok = True
+for nombre, frames, parametros, esperado in casos:
+    obtenido, motivo = aceptado(frames, **parametros)
+    marca = "✔" if obtenido == esperado else "❌"
+    print(f"{marca} {nombre:<36} aceptado={obtenido!s:<5} motivo={motivo}")
+    ok &= obtenido == esperado
+
+print("\n✔ OK" if ok else "\n❌ FALLÓ")
+sys.exit(0 if ok else 1)
@@ -0,0 +1,95 @@
+"""
+Comprueba que el índice ANN (services/indice_ann.py) guarda un solo
+vector por usuario aunque tenga varias plantillas, y que tras reemplazar
+y eliminar usuarios con plantillas su resultado coincide con la
+búsqueda exacta.
+
+    python tests/test-indice-plantillas.py
+
+No usa modelos: cada usuario es un vector aleatorio y sus plantillas la
+media más dos muestras con ruido.
+"""
+import copy
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services.face_recognizer import Galeria, CacheGaleria
+from services.indice_ann import IndiceIVF
+from services.decision import UMBRAL_RECONOCIDO
+
+USUARIOS = 400
+PLANTILLAS = 3
+DIM = 512
+RUIDO = 0.6
+
+rng = np.random.default_rng(0)
+
+
+def plantillas(identidad):
+    muestras = identidad + RUIDO * rng.normal(size=(PLANTILLAS - 1, DIM)) / np.sqrt(DIM)
+    return np.vstack([identidad, muestras])
+
+
+def consulta(identidad):
+    return identidad + RUIDO * rng.normal(size=DIM) / np.sqrt(DIM)
+
+
+identidades = rng.normal(size=(USUARIOS, DIM)) / np.sqrt(DIM)
+galeria = Galeria(np.repeat(np.arange(USUARIOS), PLANTILLAS),
+                  np.repeat([f"u{u}" for u in range(USUARIOS)], PLANTILLAS),
+                  np.vstack([plantillas(v) for v in identidades]),
+                  np.ones(USUARIOS * PLANTILLAS, dtype=bool))
+
+indice = IndiceIVF(n_listas=20)
+indice.n_probe = indice.n_listas     # todas las celdas: el ANN debe dar lo mismo que la búsqueda exacta
+indice.entrenar(galeria.matriz, galeria.ids)
+cache = CacheGaleria(galeria, indice)
+
+# Reemplazar a u7 por otra persona y eliminar a u11
+vieja_u7 = identidades[7].copy()
+identidades[7] = rng.normal(size=DIM) / np.sqrt(DIM)
+cache.agregar(7, "u7", plantillas(identidades[7]), True)
+cache.eliminar(11)
+
+ok = True
+
+vectores = sum(len(ids) for ids, _ in indice._listas)
+print(f"índice    : {len(indice)} ids, {vectores} vectores, galería con {len(cache.galeria)} usuarios")
+if len(indice) != len(cache.galeria) or vectores != len(indice):
+    print("❌ El índice debería tener exactamente un vector por usuario vivo")
+    ok = False
+
+ann = cache.galeria
+exacta = copy.copy(ann)
+exacta.indice = None
+
+# Usuarios registrados (incluido el u7 nuevo): mismo usuario y distancia que la búsqueda exacta
+vivos = [u for u in range(USUARIOS) if u != 11]
+consultas = [consulta(identidades[u]) for u in rng.choice(vivos, 50, replace=False)]
+consultas.append(consulta(identidades[7]))
+distintas = 0
+for q in consultas:
+    nombre_ann, dist_ann, _ = ann.identificar(q)
+    nombre_exacto, dist_exacta, _ = exacta.identificar(q)
+    if nombre_ann != nombre_exacto or abs(dist_ann - dist_exacta) > 1e-4:
+        distintas += 1
+        print(f"❌ ANN {nombre_ann} ({dist_ann:.4f}) != exacta {nombre_exacto} ({dist_exacta:.4f})")
+print(f"consultas : {len(consultas) - distintas}/{len(consultas)} iguales a la búsqueda exacta")
+ok &= distintas == 0
+
+# Rostros que ya no están (u7 anterior, u11): ninguno se acepta ni vuelve a aparecer
+nombre, distancia, _ = ann.identificar(consulta(vieja_u7))
+print(f"u7 viejo  : {nombre} ({distancia:.4f})")
+if nombre == "u7" or distancia < UMBRAL_RECONOCIDO:
+    print("❌ La identidad anterior de u7 sigue coincidiendo")
+    ok = False
+cercanos = ann.buscar(consulta(identidades[11]), k=5)
+print(f"u11       : {cercanos[0][0]} ({cercanos[0][1]:.4f})")
+if "u11" in [n for n, _, _ in cercanos] or cercanos[0][1] < UMBRAL_RECONOCIDO:
+    print("❌ u11 eliminado sigue apareciendo")
+    ok = False
+
+print("\n✔ OK" if ok else "\n❌ FALLÓ")
+sys.exit(0 if ok else 1)
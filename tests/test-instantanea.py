@@ -0,0 +1,67 @@
+"""
+Comprueba que revocar el acceso y eliminar un usuario desde un worker
+que todavía no cargó la galería llega a la instantánea compartida
+(Settings.GALERIA_INSTANTANEA), que es lo que leen los demás workers,
+reconocer.py y servidor.py.
+
+    python tests/test-instantanea.py
+
+No usa modelos: la base es un SQLite temporal y la instantánea se crea
+en un directorio temporal con un embedding aleatorio.
+"""
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from core.config import Settings
+
+temporal = tempfile.mkdtemp()
+Settings.DATABASE_URL = "sqlite:///" + os.path.join(temporal, "usuarios.db")
+Settings.GALERIA_INSTANTANEA = os.path.join(temporal, "galeria")
+
+from core.database import SessionLocal, init_db
+from core.models import Usuario
+from services.face_recognizer import Galeria, GaleriaCompartida, codificar_embedding
+import app as modulo
+
+DIM = 512
+ana = np.random.default_rng(0).normal(size=DIM).astype(np.float32)
+
+# Base con ana y la instantánea publicada (como la dejaría otro worker)
+init_db()
+db = SessionLocal()
+usuario = Usuario(name="ana", embedding=codificar_embedding(ana), access=True)
+db.add(usuario)
+db.commit()
+id_ana = usuario.id
+db.close()
+GaleriaCompartida(Settings.GALERIA_INSTANTANEA,
+                  cargar=lambda: Galeria(np.array([id_ana]), ["ana"], ana[None, :], [True]))
+
+# Otro proceso que solo lee la instantánea
+lector = GaleriaCompartida(Settings.GALERIA_INSTANTANEA, intervalo=0)
+
+cliente = modulo.create_app().test_client()
+with cliente.session_transaction() as sesion:
+    sesion['user'] = "admin"
+
+ok = True
+
+r = cliente.post(f'/api/users/{id_ana}/toggle_access').get_json()
+nombre, distancia, acceso = lector.galeria.identificar(ana)
+print("revocar   :", r['message'], "→", (nombre, round(distancia, 3), acceso))
+if r['access'] or nombre != "ana" or acceso:
+    print("❌ La instantánea sigue dando acceso a ana")
+    ok = False
+
+r = cliente.delete(f'/api/users/{id_ana}').get_json()
+nombre, distancia, acceso = lector.galeria.identificar(ana)
+print("eliminar  :", r['message'], "→", (nombre, round(distancia, 3), acceso))
+if not r['success'] or nombre == "ana":
+    print("❌ La instantánea sigue reconociendo a ana")
+    ok = False
+
+print("\n✔ OK" if ok else "\n❌ FALLÓ")
+sys.exit(0 if ok else 1)
@@ -0,0 +1,74 @@
+"""
+Prueba del servidor multi-cámara con archivos de video locales en lugar
+de cámaras.
+
+    python tests/test-multicamara.py                       # genera 3 clips sintéticos
+    python tests/test-multicamara.py puerta1.mp4 puerta2.mp4 --workers 2
+
+Cada archivo se reproduce una vez a su FPS nominal. Al terminar imprime,
+por fuente, frames procesados, frames descartados por carga y latencia
+media, y comprueba que todas las fuentes recibieron resultados.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services.face_recognizer import Galeria
+from services.pipeline import FacePipeline
+from services.multicamara import ServidorMultiCamara
+from session_options import FabricaSesiones
+
+
+def clip_sintetico(i, n_frames=90, fps=30):
+    ruta = os.path.join(tempfile.gettempdir(), f"test_multicamara_{i}.avi")
+    rng = np.random.default_rng(i)
+    base = rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    escritor = cv2.VideoWriter(ruta, cv2.VideoWriter_fourcc(*"MJPG"), fps, (640, 480))
+    for n in range(n_frames):
+        escritor.write(np.roll(base, n * 3, axis=1))
+    escritor.release()
+    return ruta
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("videos", nargs="*")
+parser.add_argument("--workers", type=int, default=2)
+args = parser.parse_args()
+
+videos = args.videos or [clip_sintetico(i, fps=fps) for i, fps in enumerate((30, 25, 15))]
+
+# Galería sintética: basta para ejercitar el matching
+rng = np.random.default_rng(0)
+galeria = Galeria(np.arange(100), [f"u{i}" for i in range(100)],
+                  rng.normal(size=(100, 512)).astype(np.float32), np.ones(100, dtype=bool))
+
+pipeline = FacePipeline(fabrica=FabricaSesiones(concurrencia=args.workers))
+servidor = ServidorMultiCamara(videos, pipeline, galeria, workers=args.workers, repetir=False)
+
+print(f"Procesando {len(videos)} videos con {args.workers} workers...")
+servidor.iniciar()
+terminado = servidor.esperar_fin(timeout=120)
+servidor.detener()
+
+ok = terminado
+for flujo in servidor.flujos:
+    recibidos = flujo.resultados.qsize()
+    stats = flujo.estadisticas()
+    print(f"{os.path.basename(flujo.nombre):<24} procesados={stats['procesados']:<4} "
+          f"descartados={stats['descartados']:<4} latencia={stats['latencia_ms']} ms  canal={recibidos}")
+    ok = ok and stats['procesados'] > 0 and recibidos > 0
+
+    # Los resultados de cada canal son solo de su fuente y en orden
+    seqs = []
+    while not flujo.resultados.empty():
+        resultado = flujo.resultados.get()
+        ok = ok and resultado['fuente'] == flujo.nombre
+        seqs.append(resultado['seq'])
+    ok = ok and seqs == sorted(seqs)
+
+print("✔ OK" if ok else "❌ FALLÓ")
+sys.exit(0 if ok else 1)
@@ -0,0 +1,92 @@
+"""
+Convierte un modelo ONNX con batch fijo (p.ej. (1,112,112,3)) a batch
+dinámico ('N',112,112,3), para que ArcFace procese varios rostros por llamada.
+
+    python tools/batch_dinamico.py models/arcface_r100.onnx
+    python tools/batch_dinamico.py entrada.onnx -o salida.onnx
+
+Además de las entradas/salidas, corrige los Reshape con el batch escrito
+como constante (típico en el "flatten" previo a la capa de embedding) y
+verifica con ONNX Runtime que un lote de 4 da lo mismo que 4 llamadas de 1.
+"""
+import argparse
+import os
+import sys
+import numpy as np
+import onnx
+from onnx import numpy_helper
+
+
+def hacer_batch_dinamico(modelo, nombre_dim="N"):
+    grafo = modelo.graph
+    iniciales = {i.name for i in grafo.initializer}
+
+    for tensor in list(grafo.input) + list(grafo.output):
+        if tensor.name in iniciales:
+            continue
+        dims = tensor.type.tensor_type.shape.dim
+        if len(dims) > 0:
+            dims[0].ClearField("dim_value")
+            dims[0].dim_param = nombre_dim
+
+    # Las formas intermedias inferidas con batch=1 ya no son válidas
+    del grafo.value_info[:]
+
+    # Reshape con forma constante [1, ...] -> [0, ...] (0 = copiar el batch de la entrada)
+    constantes = {i.name: i for i in grafo.initializer}
+    for nodo in grafo.node:
+        if nodo.op_type == "Constant" and nodo.attribute:
+            constantes[nodo.output[0]] = nodo.attribute[0].t
+
+    corregidos = 0
+    for nodo in grafo.node:
+        if nodo.op_type != "Reshape" or nodo.input[1] not in constantes:
+            continue
+        tensor = constantes[nodo.input[1]]
+        forma = numpy_helper.to_array(tensor).copy()
+        if forma.ndim == 1 and len(forma) > 0 and forma[0] == 1:
+            forma[0] = 0
+            tensor.CopyFrom(numpy_helper.from_array(forma, tensor.name))
+            corregidos += 1
+
+    return modelo, corregidos
+
+
+def verificar(ruta, lote=4):
+    """Compara un lote de `lote` elementos contra `lote` llamadas individuales"""
+    import onnxruntime as ort
+
+    sesion = ort.InferenceSession(ruta, providers=["CPUExecutionProvider"])
+    entrada = sesion.get_inputs()[0]
+    forma = [lote] + [d if isinstance(d, int) else 1 for d in entrada.shape[1:]]
+    x = np.random.default_rng(0).uniform(-1, 1, forma).astype(np.float32)
+
+    en_lote = sesion.run(None, {entrada.name: x})[0]
+    de_a_uno = np.concatenate([sesion.run(None, {entrada.name: x[i:i + 1]})[0] for i in range(lote)])
+    return float(np.max(np.abs(en_lote - de_a_uno)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modelo")
+    parser.add_argument("-o", "--salida", help="por defecto sobrescribe el modelo de entrada")
+    args = parser.parse_args()
+
+    salida = args.salida or args.modelo
+    modelo, corregidos = hacer_batch_dinamico(onnx.load(args.modelo))
+    onnx.checker.check_model(modelo)
+
+    tmp = salida + ".tmp"
+    onnx.save(modelo, tmp)
+    error = verificar(tmp)
+    if error > 1e-3:
+        os.remove(tmp)
+        print(f"❌ El lote no coincide con la inferencia individual (error máx {error:.2e})")
+        sys.exit(1)
+
+    os.replace(tmp, salida)
+    print(f"✔ Batch dinámico: {salida} ({corregidos} Reshape corregidos, error máx {error:.2e})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Genera variantes cuantizadas de los modelos ONNX con las herramientas de
+ONNX Runtime, junto al original:
+
+    models/arcface_r100.onnx -> arcface_r100.int8_dinamico.onnx
+                                arcface_r100.int8_estatico.onnx
+                                arcface_r100.fp16.onnx
+
+    python tools/cuantizar.py models/arcface_r100.onnx --calibracion rostros/
+    python tools/cuantizar.py models/model.onnx --calibracion frames/
+    python tools/cuantizar.py models/model.onnx --variantes int8_dinamico fp16
+
+La cuantización estática necesita un directorio de calibración con
+imágenes locales: recortes de rostro para ArcFace, frames de la cámara
+para YOLO (se preprocesan igual que en producción). Para elegir una
+variante: Settings.YOLO_VARIANTE / Settings.ARC_VARIANTE, tras validarla
+con tools/validar_cuantizacion.py.
+"""
+import argparse
+import glob
+import os
+import sys
+import cv2
+import numpy as np
+import onnx
+from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                      quantize_dynamic, quantize_static)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from session_options import ruta_variante, VARIANTES
+from utils import preprocess_arcface_batch
+
+EXTENSIONES = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
+MAX_CALIBRACION = 200
+
+
+def leer_imagenes(directorio, limite=MAX_CALIBRACION):
+    rutas = sorted(r for ext in EXTENSIONES for r in glob.glob(os.path.join(directorio, "**", ext), recursive=True))
+    imagenes = []
+    for ruta in rutas[:limite]:
+        img = cv2.imread(ruta)
+        if img is not None:
+            imagenes.append(img)
+    return imagenes
+
+
+def es_arcface(modelo):
+    """ArcFace recibe HWC (N,112,112,3); YOLO recibe NCHW (1,3,H,W)"""
+    dims = modelo.graph.input[0].type.tensor_type.shape.dim
+    return dims[-1].dim_value == 3
+
+
+class LectorCalibracion(CalibrationDataReader):
+    def __init__(self, nombre_entrada, tensores):
+        self._datos = iter([{nombre_entrada: t} for t in tensores])
+
+    def get_next(self):
+        return next(self._datos, None)
+
+
+def tensores_calibracion(ruta_modelo, arcface, imagenes):
+    if arcface:
+        return [preprocess_arcface_batch([img]) for img in imagenes]
+
+    # Mismo preprocesado (modo de entrada y normalización) que FacePipeline, a partir del modelo FP32
+    from services.pipeline import FacePipeline
+    pipeline = FacePipeline(yolo_model=ruta_modelo, arc_model=None, yolo_variante="fp32")
+    return [pipeline.preprocess(img).copy() for img in imagenes]
+
+
+def generar(ruta_modelo, variante, calibracion=None):
+    base, ext = os.path.splitext(ruta_modelo)
+    salida = f"{base}.{variante}{ext}"
+    modelo = onnx.load(ruta_modelo)
+    arcface = es_arcface(modelo)
+
+    if variante == "fp16":
+        from onnxruntime.transformers.float16 import convert_float_to_float16
+        # Entradas/salidas siguen en float32: el resto del código no cambia
+        onnx.save(convert_float_to_float16(modelo, keep_io_types=True), salida)
+        return salida
+
+    # Inferencia de formas + optimizaciones previas recomendadas por ORT
+    previo = f"{base}.preproc{ext}"
+    try:
+        quant_pre_process(ruta_modelo, previo, skip_symbolic_shape=True)
+    except Exception as e:
+        print(f"⚠ Sin pre-procesado de cuantización ({e}); se usa el modelo tal cual")
+        previo = ruta_modelo
+
+    try:
+        if variante == "int8_dinamico":
+            quantize_dynamic(previo, salida, weight_type=QuantType.QInt8)
+        else:
+            imagenes = leer_imagenes(calibracion) if calibracion else []
+            if not imagenes:
+                raise SystemExit("❌ int8_estatico necesita --calibracion con imágenes locales")
+            nombre = modelo.graph.input[0].name
+            lector = LectorCalibracion(nombre, tensores_calibracion(ruta_modelo, arcface, imagenes))
+            quantize_static(previo, salida, lector, quant_format=QuantFormat.QDQ, per_channel=True,
+                            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+            print(f"  calibración: {len(imagenes)} imágenes de {calibracion}")
+    finally:
+        if previo != ruta_modelo and os.path.exists(previo):
+            os.remove(previo)
+    return salida
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modelo")
+    parser.add_argument("--calibracion", help="directorio con imágenes locales para int8_estatico")
+    parser.add_argument("--variantes", nargs="+", choices=VARIANTES[1:],
+                        help="por defecto int8_dinamico, fp16 y (con --calibracion) int8_estatico")
+    args = parser.parse_args()
+
+    variantes = args.variantes or ["int8_dinamico", "fp16"] + (["int8_estatico"] if args.calibracion else [])
+    tam_original = os.path.getsize(args.modelo)
+    for variante in variantes:
+        print(f"→ {variante}...")
+        salida = generar(args.modelo, variante, args.calibracion)
+        assert salida == ruta_variante(args.modelo, variante)
+        print(f"✔ {salida} ({os.path.getsize(salida) / 1e6:.1f} MB, "
+              f"{os.path.getsize(salida) / tam_original:.0%} del original)")
+
+
+if __name__ == "__main__":
+    main()
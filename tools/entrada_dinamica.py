@@ -0,0 +1,144 @@
+"""
+Convierte un YOLO ONNX con entrada fija (1,3,640,640) a alto/ancho
+dinámicos (1,3,'H','W'), para que FacePipeline pueda detectar en la ROI
+del track con una entrada reducida (TAM_ROI) y para el modo "rect".
+
+    python tools/entrada_dinamica.py models/model.onnx
+    python tools/entrada_dinamica.py entrada.onnx -o salida.onnx
+
+Solo funciona si el grafo calcula la grilla de anclas a partir de la
+entrada. Muchos exportadores con entrada fija la guardan como constantes
+(anclas y strides de forma (1,2,8400), Reshape a [1,C,6400]...): eso no
+se puede corregir renombrando dimensiones y la herramienta lo rechaza.
+En ese caso hay que volver a exportar el modelo con H/W dinámicos, p.ej.
+con Ultralytics:
+
+    yolo export model=best.pt format=onnx imgsz=640 dynamic=True
+
+Verifica con ONNX Runtime que a tamaño original la salida es la misma y
+que con una entrada de TAM_ROI x TAM_ROI la cantidad de anclas es la
+esperada.
+"""
+import argparse
+import os
+import sys
+import numpy as np
+import onnx
+from onnx import numpy_helper
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services.pipeline import TAM_ROI
+
+STRIDES = (8, 16, 32)   # niveles de detección de YOLOv5/v8
+
+
+def anclas(alto, ancho):
+    """(celdas por nivel, total) de la grilla de YOLO para una entrada alto x ancho"""
+    niveles = [(alto // s) * (ancho // s) for s in STRIDES]
+    return niveles, sum(niveles)
+
+
+def constantes_de_grilla(modelo, alto, ancho):
+    """Nombres de constantes que dependen del tamaño de entrada (anclas o formas fijas)"""
+    niveles, total = anclas(alto, ancho)
+    grafo = modelo.graph
+    constantes = {i.name: i for i in grafo.initializer}
+    for nodo in grafo.node:
+        if nodo.op_type == "Constant" and nodo.attribute:
+            constantes[nodo.output[0]] = nodo.attribute[0].t
+    formas = {nodo.input[1] for nodo in grafo.node if nodo.op_type == "Reshape" and len(nodo.input) > 1}
+
+    sospechosas = []
+    for nombre, tensor in constantes.items():
+        if total in tensor.dims:
+            sospechosas.append(nombre)
+        elif nombre in formas:
+            forma = numpy_helper.to_array(tensor)
+            if np.isin(forma, niveles + [total]).any():
+                sospechosas.append(nombre)
+    return sospechosas
+
+
+def hacer_entrada_dinamica(modelo, alto, ancho):
+    _, total = anclas(alto, ancho)
+    grafo = modelo.graph
+    dims = grafo.input[0].type.tensor_type.shape.dim
+    for i, nombre in ((2, "H"), (3, "W")):
+        dims[i].ClearField("dim_value")
+        dims[i].dim_param = nombre
+
+    for salida in grafo.output:
+        for dim in salida.type.tensor_type.shape.dim:
+            if dim.HasField("dim_value") and dim.dim_value == total:
+                dim.ClearField("dim_value")
+                dim.dim_param = "anclas"
+
+    # Las formas intermedias inferidas con 640x640 ya no son válidas
+    del grafo.value_info[:]
+    return modelo
+
+
+def verificar(original, convertido, alto, ancho):
+    """(error máx a tamaño original, anclas obtenidas con TAM_ROI, anclas esperadas)"""
+    import onnxruntime as ort
+
+    def sesion(ruta):
+        return ort.InferenceSession(ruta, providers=["CPUExecutionProvider"])
+
+    antes, despues = sesion(original), sesion(convertido)
+    nombre = despues.get_inputs()[0].name
+    rng = np.random.default_rng(0)
+
+    x = rng.uniform(0, 1, (1, 3, alto, ancho)).astype(np.float32)
+    error = float(np.max(np.abs(antes.run(None, {nombre: x})[0] - despues.run(None, {nombre: x})[0])))
+
+    x = rng.uniform(0, 1, (1, 3, TAM_ROI, TAM_ROI)).astype(np.float32)
+    salida = despues.run(None, {nombre: x})[0]
+    return error, salida.shape[-1], anclas(TAM_ROI, TAM_ROI)[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modelo")
+    parser.add_argument("-o", "--salida", help="por defecto sobrescribe el modelo de entrada")
+    args = parser.parse_args()
+
+    salida = args.salida or args.modelo
+    modelo = onnx.load(args.modelo)
+    dims = modelo.graph.input[0].type.tensor_type.shape.dim
+    if len(dims) != 4 or not (dims[2].HasField("dim_value") and dims[3].HasField("dim_value")):
+        print("✔ La entrada ya tiene alto/ancho dinámicos, no hay nada que hacer")
+        return
+    alto, ancho = dims[2].dim_value, dims[3].dim_value
+
+    sospechosas = constantes_de_grilla(modelo, alto, ancho)
+    if sospechosas:
+        print(f"❌ El grafo tiene la grilla de {alto}x{ancho} como constantes "
+              f"({', '.join(sospechosas[:5])}{'...' if len(sospechosas) > 5 else ''}).")
+        print("   Exporta el modelo de nuevo con H/W dinámicos, p.ej.: "
+              "yolo export model=best.pt format=onnx imgsz=640 dynamic=True")
+        sys.exit(1)
+
+    modelo = hacer_entrada_dinamica(modelo, alto, ancho)
+    onnx.checker.check_model(modelo)
+
+    tmp = salida + ".tmp"
+    onnx.save(modelo, tmp)
+    try:
+        error, obtenidas, esperadas = verificar(args.modelo, tmp, alto, ancho)
+    except Exception as e:
+        os.remove(tmp)
+        print(f"❌ El modelo convertido no corre con {TAM_ROI}x{TAM_ROI}: {e}")
+        sys.exit(1)
+    if error > 1e-4 or obtenidas != esperadas:
+        os.remove(tmp)
+        print(f"❌ Conversión inválida (error máx {error:.2e}, {obtenidas} anclas con "
+              f"{TAM_ROI}x{TAM_ROI}, se esperaban {esperadas})")
+        sys.exit(1)
+
+    os.replace(tmp, salida)
+    print(f"✔ Entrada dinámica: {salida} (error máx {error:.2e}, {obtenidas} anclas con {TAM_ROI}x{TAM_ROI})")
+
+
+if __name__ == "__main__":
+    main()
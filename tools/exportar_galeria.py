@@ -0,0 +1,51 @@
+"""
+Reconstruye la instantánea de la galería (Settings.GALERIA_INSTANTANEA)
+desde la base de datos y la publica como una generación nueva. Los
+procesos que la tienen abierta la toman sin reiniciar.
+
+Hace falta tras cambios hechos directamente en la base (importaciones
+masivas, tools/migrar_embeddings.py, SQL a mano); app.py, registrar.py y
+reconocer.py ya la mantienen al día.
+
+    python tools/exportar_galeria.py
+    python tools/exportar_galeria.py --dtype float16 --directorio /dev/shm/galeria
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from core.config import Settings
+from core.database import SessionLocal
+from services.face_recognizer import obtener_usuarios, exportar_galeria, abrir_galeria
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--directorio", default=Settings.GALERIA_INSTANTANEA)
+    parser.add_argument("--dtype", choices=("float32", "float16"), default=Settings.EMBEDDING_DTYPE)
+    args = parser.parse_args()
+
+    if not args.directorio:
+        parser.error("Settings.GALERIA_INSTANTANEA es None: indica --directorio")
+
+    t0 = time.perf_counter()
+    db = SessionLocal()
+    try:
+        galeria = obtener_usuarios(db)
+    finally:
+        db.close()
+    t1 = time.perf_counter()
+
+    generacion = exportar_galeria(galeria, args.directorio, args.dtype)
+    t2 = time.perf_counter()
+
+    _, nombre = abrir_galeria(args.directorio)
+    tamano = os.path.getsize(os.path.join(args.directorio, nombre))
+    print(f"✔ {len(galeria)} usuarios → {nombre} (generación {generacion}, {args.dtype}, "
+          f"{tamano / 1e6:.1f} MB) | base {t1 - t0:.2f}s, exportar {t2 - t1:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Reescribe los embeddings de la base al formato con cabecera
+(services/face_recognizer.codificar_embedding): normalizados y en el dtype
+indicado. Sirve para los registros antiguos sin cabecera y para pasar la
+base a float16 (o volver a float32).
+
+    python tools/migrar_embeddings.py                # Settings.EMBEDDING_DTYPE
+    python tools/migrar_embeddings.py --dtype float16
+"""
+import argparse
+import os
+import sys
+from sqlalchemy import select, update
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from core.config import Settings
+from core.database import SessionLocal
+from core.models import Usuario
+from services.face_recognizer import codificar_embedding, decodificar_embedding, formato_embedding, LOTE_CARGA
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dtype", choices=("float32", "float16"), default=Settings.EMBEDDING_DTYPE)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        # Se leen todos los ids primero: la consulta en streaming no se
+        # puede mezclar con UPDATE sobre la misma conexión
+        ids = db.scalars(select(Usuario.id).order_by(Usuario.id)).all()
+        cambiados = 0
+        for i in range(0, len(ids), LOTE_CARGA):
+            filas = db.execute(
+                select(Usuario.id, Usuario.embedding).where(Usuario.id.in_(ids[i:i + LOTE_CARGA]))
+            ).all()
+            for id_, blob in filas:
+                offset, dtype, _, _, _ = formato_embedding(blob)
+                if offset and dtype.name == args.dtype:
+                    continue    # ya está en el formato pedido
+                nuevo = codificar_embedding(decodificar_embedding(blob), args.dtype)
+                db.execute(update(Usuario).where(Usuario.id == id_).values(embedding=nuevo))
+                cambiados += 1
+            db.commit()
+        print(f"✔ {cambiados} de {len(ids)} embeddings reescritos en {args.dtype}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Compara las variantes cuantizadas (tools/cuantizar.py) contra FP32 antes
+de adoptarlas:
+
+  - ArcFace: deriva del embedding (1 - coseno contra FP32) sobre recortes
+    de rostro locales, y acuerdo de la decisión "misma persona" sobre una
+    lista de pares.
+  - YOLO: IoU de la mejor caja contra FP32 sobre frames locales.
+  - Latencia por modelo y variante.
+
+    python tools/validar_cuantizacion.py --rostros rostros/ --pares pares.txt --frames frames/
+
+pares.txt: una línea por par, rutas relativas a --rostros y opcionalmente
+la etiqueta (1 = misma persona, 0 = distinta):
+
+    ana/1.jpg ana/2.jpg 1
+    ana/1.jpg luis/1.jpg 0
+"""
+import argparse
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from services.decision import UMBRAL_RECONOCIDO
+from services.face_recognizer import normalizar
+from services.pipeline import FacePipeline, YOLO_MODEL, ARC_MODEL
+from session_options import VARIANTES, FabricaSesiones
+from utils import run_arcface_batch
+from cuantizar import leer_imagenes
+
+REPETICIONES = 20
+
+
+def variantes_disponibles(ruta_modelo):
+    base, ext = os.path.splitext(ruta_modelo)
+    return [v for v in VARIANTES if v == "fp32" or os.path.exists(f"{base}.{v}{ext}")]
+
+
+def latencia_ms(fn):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(REPETICIONES):
+        fn()
+    return (time.perf_counter() - t0) / REPETICIONES * 1000
+
+
+def iou(a, b):
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def leer_pares(ruta, directorio):
+    pares = []
+    with open(ruta) as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) < 2:
+                continue
+            a, b = (cv2.imread(os.path.join(directorio, p)) for p in partes[:2])
+            if a is None or b is None:
+                print(f"⚠ Par ignorado (no se pudo leer): {linea.strip()}")
+                continue
+            etiqueta = int(partes[2]) if len(partes) > 2 else None
+            pares.append((a, b, etiqueta))
+    return pares
+
+
+def validar_arcface(fabrica, rostros, pares):
+    print(f"\n== ArcFace ({len(rostros)} recortes, {len(pares)} pares)")
+    print(f"{'variante':<14} {'ms/rostro':>9} {'deriva media':>12} {'deriva máx':>10} "
+          f"{'acuerdo':>8} {'exactitud':>9}")
+
+    referencia = None
+    for variante in variantes_disponibles(ARC_MODEL):
+        sesion = fabrica.crear(ARC_MODEL, variante)
+        ms = latencia_ms(lambda: run_arcface_batch(sesion, rostros[:1]))
+
+        emb = normalizar(run_arcface_batch(sesion, rostros))
+        decisiones, etiquetas = [], []
+        for a, b, etiqueta in pares:
+            ea, eb = normalizar(run_arcface_batch(sesion, [a, b]))
+            decisiones.append(1.0 - float(ea @ eb) < UMBRAL_RECONOCIDO)
+            etiquetas.append(etiqueta)
+        decisiones = np.array(decisiones, dtype=bool)
+
+        if referencia is None:
+            referencia = (emb, decisiones)
+        deriva = np.maximum(1.0 - np.sum(emb * referencia[0], axis=1), 0.0)
+        acuerdo = f"{np.mean(decisiones == referencia[1]):.1%}" if len(pares) else "-"
+        con_etiqueta = [(d, e) for d, e in zip(decisiones, etiquetas) if e is not None]
+        exactitud = f"{np.mean([d == bool(e) for d, e in con_etiqueta]):.1%}" if con_etiqueta else "-"
+
+        print(f"{variante:<14} {ms:9.2f} {deriva.mean():12.5f} {deriva.max():10.5f} "
+              f"{acuerdo:>8} {exactitud:>9}")
+
+
+def validar_yolo(fabrica, frames):
+    print(f"\n== YOLO ({len(frames)} frames)")
+    print(f"{'variante':<14} {'ms/frame':>9} {'IoU media':>9} {'mismas detecciones':>18}")
+
+    referencia = None
+    for variante in variantes_disponibles(YOLO_MODEL):
+        pipeline = FacePipeline(arc_model=None, fabrica=fabrica, yolo_variante=variante)
+        ms = latencia_ms(lambda: pipeline.detect(frames[0]))
+        cajas = [pipeline.detect(f)[2] for f in frames]
+
+        if referencia is None:
+            referencia = cajas
+        ious, iguales = [], 0
+        for caja, ref in zip(cajas, referencia):
+            iguales += (caja is None) == (ref is None)
+            if caja is not None and ref is not None:
+                ious.append(iou(caja, ref))
+        iou_media = f"{np.mean(ious):.3f}" if ious else "-"
+        print(f"{variante:<14} {ms:9.2f} {iou_media:>9} {iguales / len(frames):>18.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rostros", help="directorio con recortes de rostro")
+    parser.add_argument("--pares", help="lista de pares (rutas relativas a --rostros)")
+    parser.add_argument("--frames", help="directorio con frames de cámara")
+    args = parser.parse_args()
+
+    fabrica = FabricaSesiones(concurrencia=1)
+    rng = np.random.default_rng(0)
+
+    rostros = leer_imagenes(args.rostros) if args.rostros else []
+    if not rostros:
+        print("⚠ Sin --rostros: se usan recortes aleatorios (la deriva no es representativa)")
+        rostros = [rng.integers(0, 255, (140, 120, 3), dtype=np.uint8) for _ in range(32)]
+    pares = leer_pares(args.pares, args.rostros or ".") if args.pares else []
+    validar_arcface(fabrica, rostros, pares)
+
+    frames = leer_imagenes(args.frames) if args.frames else []
+    if not frames:
+        print("\n⚠ Sin --frames: se usan frames aleatorios")
+        frames = [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8) for _ in range(16)]
+    validar_yolo(fabrica, frames)
+
+
+if __name__ == "__main__":
+    main()
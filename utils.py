@@ -21,6 +21,35 @@ def preprocess_arcface(face):
 
     return face
 
+def preprocess_arcface_batch(faces):
+    # Lote (N,112,112,3) HWC con la misma normalización que preprocess_arcface
+    batch = np.empty((len(faces), 112, 112, 3), dtype=np.float32)
+
+    for i, face in enumerate(faces):
+        face = cv2.resize(face, (112, 112))
+        batch[i] = cv2.cvtColor(face, cv2.COLOR_BGR2RGB)
+
+    batch -= 127.5
+    batch /= 128.0
+
+    return batch
+
+def run_arcface_batch(session, faces):
+    # Embeddings (N,512) de varios rostros en una sola llamada a ArcFace.
+    # Si el modelo exportado tiene batch fijo = 1 se corre de a uno
+    # (ver tools/batch_dinamico.py para convertirlo a batch dinámico).
+    if len(faces) == 0:
+        return np.empty((0, 512), dtype=np.float32)
+
+    inp = session.get_inputs()[0]
+    batch = preprocess_arcface_batch(faces)
+
+    if inp.shape[0] == 1 and len(faces) > 1:
+        return np.concatenate([session.run(None, {inp.name: batch[i:i + 1]})[0]
+                               for i in range(len(batch))])
+
+    return session.run(None, {inp.name: batch})[0]
+
 def cosine_similarity(a, b):
     a = a / np.linalg.norm(a)
     b = b / np.linalg.norm(b)